@@ -1,23 +1,58 @@
+import time
+START_TIME = time.perf_counter()  # для замера времени до появления окна
+
 import tkinter as tk
 from tkinter import messagebox, Menu
 from tkinter import ttk
 from tkinter.scrolledtext import ScrolledText
-import threading
-from PIL import Image, ImageTk
+import importlib
 import itertools
-import json
 
-# Импорт функционала из других модулей
-from parser_v4_0 import master_parser as parser_main
-from analyzer_v2_0 import analyze as analyzer_main
+# Импорт функционала из других модулей. Лёгкие модули импортируются сразу; тяжёлые
+# (парсеры с requests_html/bs4/spaCy, анализатор со spaCy, pandas) — при первом действии, см. ниже
 from purifier_v1_2 import purify as purifier_main
 from datascavenger_v1_0 import scavenge as datascavenger_main
 from watcher_v2_0 import watch_gui as watcher_main
 from lite_v1_1 import watch_gui as drug_watch_gui
-from scholar_v1_1 import get_side_effects_info_from_file
-from organizer_v1_1 import build_side_effects_database
 from detective_v1_0 import create_source_lookup_tab
-from filter_v1_2 import filter_side_effects
+from filter_v1_2 import filter_with_suggestions
+from conductor_v1_0 import run_pipeline
+from dispatcher_v1_0 import JobRunner, create_jobs_panel
+from viewer_v1_0 import LazyTree, PagedText
+
+# ===== Отложенный импорт тяжёлых модулей =====
+def parser_main(drug_name, sources):
+    from parser_v4_0 import master_parser
+    return master_parser(drug_name, sources)
+
+def analyzer_main(filename):
+    # Анализ выполняется в тёплом процессе analyst_v1_0 (запускается при первом анализе), модель не грузится в GUI
+    from analyst_v1_0 import analyze
+    return analyze(filename)
+
+def get_side_effects_info_from_file(drug_name, request_date):
+    from scholar_v1_1 import get_side_effects_info_from_file as side_effects_info
+    return side_effects_info(drug_name, request_date)
+
+def build_side_effects_database():
+    from organizer_v1_1 import build_side_effects_database as build_database
+    return build_database()
+
+def drug_signals_gui(drug_name):
+    from signal_v1_0 import signals_gui
+    return signals_gui(drug_name)
+
+# Модули, которые заранее подгружаются в фоне при открытии вкладки, чтобы первое действие не ждало импорта
+TAB_PRELOAD = {
+    "Анализ": ("scholar_v1_1",),
+    "Очистка": ("organizer_v1_1",),
+    "Препарат": ("signal_v1_0",),
+}
+
+def preload_tab_modules(event):
+    tab_text = notebook.tab(notebook.select(), "text")
+    for module_name in TAB_PRELOAD.pop(tab_text, ()):
+        job_runner.executor.submit(importlib.import_module, module_name)
 
 # ===== Цветовая схема =====
 BG_COLOR = "#F1F1F1"       # фон основного окна
@@ -50,16 +85,19 @@ class LoadingManager:
         self.frames = []
         self.current_frame = 0
         self.is_playing = False
-        self.load_animation()
+        self.loaded = False
 
     def load_animation(self):
+        # Кадры GIF декодируются один раз, при первом показе анимации
+        self.loaded = True
         try:
+            from PIL import Image, ImageTk
             image = Image.open(LOADING_GIF_PATH)
             self.frames = []
             for frame in itertools.count():
                 try:
                     image.seek(frame)
-                    frame_image = image.copy().resize((LOADING_WIDTH, LOADING_HEIGHT), Image.ANTIALIAS)
+                    frame_image = image.copy().resize((LOADING_WIDTH, LOADING_HEIGHT), Image.LANCZOS)
                     self.frames.append(ImageTk.PhotoImage(frame_image))
                 except EOFError:
                     break
@@ -68,6 +106,8 @@ class LoadingManager:
             messagebox.showerror("Error", f"Failed to load animation: {str(e)}")
 
     def show_loading(self, button):
+        if not self.loaded:
+            self.load_animation()
         if not self.frames:
             return
         self.button_reference = button
@@ -78,7 +118,8 @@ class LoadingManager:
 
     def hide_loading(self):
         self.is_playing = False
-        self.loading_label.grid_remove()
+        if self.loading_label is not None:
+            self.loading_label.grid_remove()
         if self.button_reference:
             self.button_reference.grid()
 
@@ -95,10 +136,13 @@ def log_message(message):
     log_text.configure(state="disabled")
     log_text.yview_moveto(1.0)
 
-def safe_log(message):
-    root.after(0, lambda: log_message(message))
+def show_text(text_widget, text):
+    text_widget.configure(state="normal")
+    text_widget.delete(1.0, tk.END)
+    text_widget.insert(tk.END, text)
+    text_widget.configure(state="disabled")
 
-# ===== Обёртки для выполнения задач в отдельных потоках =====
+# ===== Действия GUI: тяжёлая работа выполняется в пуле job_runner, виджеты обновляются в главном потоке =====
 
 # --- Парсинг ---
 def run_parser():
@@ -113,16 +157,17 @@ def run_parser():
         return
 
     loading_manager.show_loading(search_button)
-    threading.Thread(target=run_parser_task, args=(drug_name, sources), daemon=True).start()
 
-def run_parser_task(drug_name, sources):
-    try:
-        output_path = parser_main(drug_name, sources)
-        safe_log(f"Парсинг завершён! Результат: {output_path}")
-    except Exception as e:
-        safe_log(f"Ошибка парсера: {str(e)}")
-    finally:
-        root.after(0, loading_manager.hide_loading)
+    def done(output_path):
+        loading_manager.hide_loading()
+        log_message(f"Парсинг завершён! Результат: {output_path}")
+
+    def failed(error):
+        loading_manager.hide_loading()
+        log_message(f"Ошибка парсера: {str(error)}")
+
+    job_runner.submit(f"Парсинг: {drug_name}", parser_main, drug_name, sources, on_done=done, on_error=failed,
+                      on_cancel=loading_manager.hide_loading)
 
 def create_parser_tab(parent):
     frame = tk.Frame(parent, bg=TAB_BG_COLOR)
@@ -151,68 +196,54 @@ def create_parser_tab(parent):
     return frame
 
 # --- Очистка и сбор ---
-def run_purifier_task():
-    safe_log("Очистка...")
-    try:
-        purifier_main()
-        safe_log("Очистка завершена")
-    except Exception as e:
-        safe_log("Ошибка очистки: " + str(e))
-
 def run_purifier():
-    threading.Thread(target=run_purifier_task, daemon=True).start()
-
-def run_datascavenger_task():
-    safe_log("Сбор данных...")
-    try:
-        datascavenger_main()
-        safe_log("Сбор завершён")
-    except Exception as e:
-        safe_log("Ошибка сбора: " + str(e))
+    log_message("Очистка...")
+    job_runner.submit("Очистка", purifier_main,
+                      on_done=lambda _: log_message("Очистка завершена"),
+                      on_error=lambda e: log_message("Ошибка очистки: " + str(e)))
 
 def run_datascavenger():
-    threading.Thread(target=run_datascavenger_task, daemon=True).start()
+    log_message("Сбор данных...")
+    job_runner.submit("Сбор данных", datascavenger_main,
+                      on_done=lambda _: log_message("Сбор завершён"),
+                      on_error=lambda e: log_message("Ошибка сбора: " + str(e)))
 
 def run_source_db_builder():
-    try:
-        result_db = build_side_effects_database()
-        json_str = json.dumps(result_db, ensure_ascii=False, indent=4)
-    except Exception as e:
-        json_str = f"Ошибка БД: {e}"
-    source_db_text.configure(state="normal")
-    source_db_text.delete(1.0, tk.END)
-    source_db_text.insert(tk.END, json_str)
-    source_db_text.configure(state="disabled")
+    # База показывается деревом эффект -> препарат -> ID: узлы создаются страницами и при раскрытии
+    job_runner.submit("БД источников", build_side_effects_database,
+                      on_done=source_db_view.show,
+                      on_error=lambda e: source_db_view.show_message(f"Ошибка БД: {e}"))
+
+# --- Конвейер: перезапуск только устаревших этапов ---
+def run_pipeline_task(job):
+    return run_pipeline(log=job.log, progress=job.report, cancelled=job.cancelled)
+
+def pipeline_done(summary):
+    if summary["failed"]:
+        log_message("Конвейер завершён с ошибками: " + ", ".join(summary["failed"]))
+    else:
+        log_message("Конвейер завершён")
+
+def run_pipeline_update():
+    log_message("Обновление конвейера...")
+    job_runner.submit("Обновить всё", run_pipeline_task, pass_job=True, on_done=pipeline_done,
+                      on_error=lambda e: log_message("Ошибка конвейера: " + str(e)))
 
 # --- Отслеживание ---
-def run_watcher_task(date_input):
-    safe_log("Отслеживание...")
-    try:
-        result = watcher_main(date_input)
-        watcher_text.configure(state="normal")
-        watcher_text.delete(1.0, tk.END)
-        watcher_text.insert(tk.END, result)
-        watcher_text.configure(state="disabled")
-        safe_log("Отслеживание завершено")
-    except Exception as e:
-        safe_log("Ошибка Watcher: " + str(e))
+def watcher_done(result):
+    watcher_text.show(result)
+    log_message("Отслеживание завершено")
 
 def run_watcher():
     date_input = watcher_date_entry.get().strip()
     if not date_input:
         messagebox.showerror("Ошибка", "Введите дату")
         return
-    threading.Thread(target=run_watcher_task, args=(date_input,), daemon=True).start()
+    log_message("Отслеживание...")
+    job_runner.submit(f"Отслеживание: {date_input}", watcher_main, date_input, on_done=watcher_done,
+                      on_error=lambda e: log_message("Ошибка Watcher: " + str(e)))
 
 # --- Анализ (оригинальный) ---
-def run_analyzer_task(filename):
-    safe_log("Анализ...")
-    try:
-        analyzer_main(filename)
-        safe_log("Анализ завершён")
-    except Exception as e:
-        safe_log("Ошибка анализа: " + str(e))
-
 def run_analyzer():
     drug_name = analyzer_drug_entry.get().strip()
     date_str = analyzer_date_entry.get().strip()
@@ -220,7 +251,10 @@ def run_analyzer():
         messagebox.showerror("Ошибка", "Введите препарат и дату")
         return
     filename = f"{drug_name.lower()}_{date_str}.json"
-    threading.Thread(target=run_analyzer_task, args=(filename,), daemon=True).start()
+    log_message("Анализ...")
+    job_runner.submit(f"Анализ: {filename}", analyzer_main, filename,
+                      on_done=lambda _: log_message("Анализ завершён"),
+                      on_error=lambda e: log_message("Ошибка анализа: " + str(e)))
 
 # --- Анализ побочных эффектов ---
 def run_side_effects_analyzer():
@@ -229,29 +263,26 @@ def run_side_effects_analyzer():
     if not drug_name or not req_date:
         messagebox.showerror("Ошибка", "Введите препарат и дату")
         return
-    try:
-        result = get_side_effects_info_from_file(drug_name, req_date)
-    except Exception as e:
-        result = f"Ошибка: {str(e)}"
-    analysis_text.configure(state="normal")
-    analysis_text.delete(1.0, tk.END)
-    analysis_text.insert(tk.END, result)
-    analysis_text.configure(state="disabled")
+    job_runner.submit(f"Побочные эффекты: {drug_name} {req_date}", get_side_effects_info_from_file,
+                      drug_name, req_date,
+                      on_done=analysis_text.show,
+                      on_error=lambda e: analysis_text.show(f"Ошибка: {str(e)}"))
 
 # --- Препарат ---
 def run_drug_watch(drug_name, text_widget):
     if not drug_name:
         messagebox.showerror("Ошибка", "Введите препарат")
         return
+    job_runner.submit(f"Препарат: {drug_name}", drug_watch_gui, drug_name,
+                      on_done=lambda result: show_text(text_widget, result))
 
-    def task():
-        result = drug_watch_gui(drug_name)
-        text_widget.configure(state="normal")
-        text_widget.delete(1.0, tk.END)
-        text_widget.insert(tk.END, result)
-        text_widget.configure(state="disabled")
-
-    threading.Thread(target=task, daemon=True).start()
+def run_drug_signals(drug_name, text_widget):
+    if not drug_name:
+        messagebox.showerror("Ошибка", "Введите препарат")
+        return
+    job_runner.submit(f"Сигналы: {drug_name}", drug_signals_gui, drug_name,
+                      on_done=lambda result: show_text(text_widget, result),
+                      on_error=lambda e: show_text(text_widget, f"Ошибка: {str(e)}"))
 
 def create_drug_tab(parent):
     frame = tk.Frame(parent, bg=TAB_BG_COLOR)
@@ -264,7 +295,10 @@ def create_drug_tab(parent):
     drug_text.grid(row=2, column=0, columnspan=2, padx=10, pady=10)
     tk.Button(frame, text="Инфо", width=15, bg=BUTTON_BG_COLOR, fg=BUTTON_FG_COLOR,
               command=lambda: run_drug_watch(drug_entry.get().strip(), drug_text)) \
-        .grid(row=1, column=0, columnspan=2, padx=10, pady=10)
+        .grid(row=1, column=0, padx=10, pady=10, sticky="e")
+    tk.Button(frame, text="Сигналы", width=15, bg=BUTTON_BG_COLOR, fg=BUTTON_FG_COLOR,
+              command=lambda: run_drug_signals(drug_entry.get().strip(), drug_text)) \
+        .grid(row=1, column=1, padx=10, pady=10, sticky="w")
     return frame
 
 # --- Фильтр побочных эффектов (новая вкладка) ---
@@ -297,14 +331,15 @@ def create_filter_tab(parent):
     tk.Label(frame, text="Найденные ID источников:", bg=TAB_BG_COLOR, fg=LABEL_FG_COLOR, font=default_font) \
         .grid(row=4, column=0, columnspan=2, padx=10, pady=(10, 0), sticky="w")
     global filter_ids_text
-    filter_ids_text = ScrolledText(frame, width=80, height=5, bg=LOG_BG_COLOR, fg=LOG_FG_COLOR, font=id_font)
+    filter_ids_text = PagedText(frame, width=80, height=5, bg=LOG_BG_COLOR, fg=LOG_FG_COLOR, font=id_font)
     filter_ids_text.grid(row=5, column=0, columnspan=2, padx=10, pady=5)
 
     # Текстовое поле для вывода побочных эффектов (важная информация – крупный шрифт)
     tk.Label(frame, text="Побочные эффекты:", bg=TAB_BG_COLOR, fg=LABEL_FG_COLOR, font=default_font) \
         .grid(row=6, column=0, columnspan=2, padx=10, pady=(10, 0), sticky="w")
     global filter_effects_text
-    filter_effects_text = ScrolledText(frame, width=80, height=10, bg=LOG_BG_COLOR, fg=LOG_FG_COLOR, font=important_font)
+    filter_effects_text = PagedText(frame, width=80, height=10, bg=LOG_BG_COLOR, fg=LOG_FG_COLOR,
+                                    font=important_font)
     filter_effects_text.grid(row=7, column=0, columnspan=2, padx=10, pady=5)
 
     return frame
@@ -315,21 +350,22 @@ def run_filter():
     if not keyword:
         messagebox.showerror("Ошибка", "Введите ключевое слово")
         return
-    try:
-        found_ids, side_effects = filter_side_effects(keyword, drug)
-    except Exception as e:
-        messagebox.showerror("Ошибка", str(e))
-        return
-    filter_ids_text.delete("1.0", tk.END)
-    filter_effects_text.delete("1.0", tk.END)
+    job_runner.submit(f"Фильтр: {keyword}", filter_with_suggestions, keyword, drug, on_done=show_filter_results,
+                      on_error=lambda e: messagebox.showerror("Ошибка", str(e)))
+
+def show_filter_results(result):
+    found_ids, side_effects, suggestions = result
+    filter_ids_text.clear()
+    filter_effects_text.clear()
     if not found_ids:
-        messagebox.showinfo("Результат", "Записи с указанным ключевым словом не найдены.")
+        hint = "\nВозможно, вы имели в виду: " + ", ".join(suggestions) if suggestions else ""
+        messagebox.showinfo("Результат", "Записи с указанным ключевым словом не найдены." + hint)
         return
-    filter_ids_text.insert(tk.END, "\n".join(found_ids))
+    filter_ids_text.show(found_ids)
     if side_effects:
-        filter_effects_text.insert(tk.END, "\n".join(side_effects))
+        filter_effects_text.show(side_effects)
     else:
-        filter_effects_text.insert(tk.END, "Побочные эффекты не найдены.")
+        filter_effects_text.show("Побочные эффекты не найдены.")
 
 # ===== Создание главного окна =====
 root = tk.Tk()
@@ -338,8 +374,14 @@ root.configure(bg=BG_COLOR)
 root.geometry("1000x800")
 root.resizable(True, True)
 
-loading_manager = LoadingManager(root)
-loading_manager.load_animation()
+# Единый исполнитель фоновых задач: пул потоков и очередь, разбираемая циклом after()
+job_runner = JobRunner(root, workers=4, log=log_message)
+
+def on_close():
+    job_runner.shutdown()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
 
 # Меню навигации
 menu_bar = Menu(root)
@@ -357,6 +399,7 @@ root.config(menu=menu_bar)
 
 notebook = ttk.Notebook(root)
 notebook.pack(fill='both', expand=True, padx=10, pady=10)
+notebook.bind("<<NotebookTabChanged>>", preload_tab_modules)
 
 frame_parser = tk.Frame(notebook, bg=TAB_BG_COLOR)
 frame_analyzer = tk.Frame(notebook, bg=TAB_BG_COLOR)
@@ -398,8 +441,7 @@ tk.Button(frame_analyzer, text="Анализ", width=15, bg=BUTTON_BG_COLOR, fg=
 tk.Button(frame_analyzer, text="Побочные эффекты", width=15, bg=BUTTON_BG_COLOR, fg=BUTTON_FG_COLOR,
           command=run_side_effects_analyzer) \
     .grid(row=3, column=0, columnspan=2, padx=10, pady=5)
-analysis_text = ScrolledText(frame_analyzer, width=80, height=10, state="disabled", bg=LOG_BG_COLOR, fg=LOG_FG_COLOR,
-                             font=default_font)
+analysis_text = PagedText(frame_analyzer, width=80, height=10, bg=LOG_BG_COLOR, fg=LOG_FG_COLOR, font=default_font)
 analysis_text.grid(row=4, column=0, columnspan=2, padx=10, pady=10)
 
 # ===== Вкладка "Очистка" =====
@@ -411,9 +453,11 @@ tk.Button(frame_clearcollect, text="Собрать", width=12, bg=BUTTON_BG_COLO
 tk.Button(frame_clearcollect, text="БД источников", width=12, bg=BUTTON_BG_COLOR, fg=BUTTON_FG_COLOR,
           command=run_source_db_builder) \
     .grid(row=0, column=2, padx=10, pady=10)
-source_db_text = ScrolledText(frame_clearcollect, width=90, height=10, state="disabled", bg=LOG_BG_COLOR,
-                              fg=LOG_FG_COLOR, font=default_font)
-source_db_text.grid(row=1, column=0, columnspan=3, padx=10, pady=10)
+tk.Button(frame_clearcollect, text="Обновить всё", width=12, bg=BUTTON_BG_COLOR, fg=BUTTON_FG_COLOR,
+          command=run_pipeline_update) \
+    .grid(row=0, column=3, padx=10, pady=10)
+source_db_view = LazyTree(frame_clearcollect, height=10, font=default_font)
+source_db_view.grid(row=1, column=0, columnspan=4, padx=10, pady=10)
 
 # ===== Вкладка "Отслеживание" =====
 tk.Label(frame_watcher, text="Дата:", bg=TAB_BG_COLOR, fg=LABEL_FG_COLOR) \
@@ -424,8 +468,7 @@ tk.Button(frame_watcher, text="Отслеживать", width=15, bg=BUTTON_BG_C
     .grid(row=1, column=0, columnspan=2, padx=10, pady=10)
 tk.Label(frame_watcher, text="Результат:", bg=TAB_BG_COLOR, fg=LABEL_FG_COLOR) \
     .grid(row=2, column=0, padx=10, pady=(20, 5), sticky="w")
-watcher_text = ScrolledText(frame_watcher, width=80, height=10, state="disabled", bg=LOG_BG_COLOR, fg=LOG_FG_COLOR,
-                            font=default_font)
+watcher_text = PagedText(frame_watcher, width=80, height=10, bg=LOG_BG_COLOR, fg=LOG_FG_COLOR, font=default_font)
 watcher_text.grid(row=3, column=0, columnspan=2, padx=10, pady=5)
 
 # ===== Окно логов =====
@@ -436,5 +479,10 @@ tk.Label(log_frame, text="Логи:", bg=BG_COLOR, fg=LABEL_FG_COLOR) \
 log_text = ScrolledText(log_frame, width=90, height=8, state="disabled", bg=LOG_BG_COLOR, fg=LOG_FG_COLOR,
                         font=default_font)
 log_text.pack(fill="both", expand=True, padx=5, pady=5)
+tk.Label(log_frame, text="Задачи:", bg=BG_COLOR, fg=LABEL_FG_COLOR) \
+    .pack(anchor="w", padx=5, pady=(5, 0))
+create_jobs_panel(log_frame, job_runner, bg=BG_COLOR, button_bg=BUTTON_BG_COLOR, button_fg=BUTTON_FG_COLOR) \
+    .pack(fill="x", padx=5, pady=(0, 5))
 
+root.after_idle(lambda: log_message(f"Окно готово за {time.perf_counter() - START_TIME:.2f} с"))
 root.mainloop()
@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+import socket
+import struct
+import secrets
+import argparse
+import threading
+import subprocess
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, Listener, answer_challenge, deliver_challenge
+
+# Долгоживущий процесс анализа: модель en_core_sci_sm загружается один раз при старте,
+# после чего задания analyze(<снимок>.json) принимаются через локальный сокет
+# (multiprocessing.connection с ключом из index/analyst.key). GUI и конвейер отправляют
+# задания сюда; если процесса нет, клиент запускает его сам или анализирует в своём процессе
+HOST = "127.0.0.1"
+# Порт задаётся переменной окружения BIOLOCK_ANALYST_PORT; по умолчанию — редко занятый порт
+# (6010 — порт пересылки X11 по SSH на серверах без экрана)
+PORT = int(os.environ.get("BIOLOCK_ANALYST_PORT", "47631"))
+# Ожидание подключения и рукопожатия: чужая программа на порту не должна вешать клиента
+CONNECT_TIMEOUT = 10
+KEY_PATH = os.path.join("index", "analyst.key")
+LOG_PATH = os.path.join("index", "analyst.log")
+START_TIMEOUT = 180  # загрузка модели scispaCy может занимать минуты на медленных машинах
+
+
+def project_dir():
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def auth_key():
+    # Общий секрет клиента и процесса анализа; создаётся при первом обращении
+    path = os.path.join(project_dir(), KEY_PATH)
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        key = secrets.token_bytes(32)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return auth_key()  # Ключ только что создал другой процесс
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        return key
+
+
+def socket_timeout(sock, timeout):
+    # Тайм-аут приёма и отправки для блокирующего сокета (0 — без тайм-аута); settimeout не подходит:
+    # он переводит сокет в неблокирующий режим, с которым Connection не работает
+    if os.name == "nt":
+        value = struct.pack("L", int(timeout * 1000))
+    else:
+        value = struct.pack("ll", int(timeout), int(timeout % 1 * 1000000))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, value)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, value)
+
+
+def connect(port=PORT, timeout=CONNECT_TIMEOUT):
+    # Аналог multiprocessing.connection.Client с тайм-аутом на подключение и рукопожатие.
+    # TimeoutError — на порту отвечает не процесс анализа; AuthenticationError — процесс с другим ключом
+    with socket.create_connection((HOST, port), timeout=timeout) as sock:
+        sock.settimeout(None)
+        socket_timeout(sock, timeout)
+        connection = Connection(sock.dup().detach())
+        try:
+            key = auth_key()
+            answer_challenge(connection, key)
+            deliver_challenge(connection, key)
+        except BlockingIOError:
+            connection.close()
+            raise TimeoutError("Процесс анализа не ответил на рукопожатие")
+        except BaseException:
+            connection.close()
+            raise
+        # Само задание (анализ снимка) может идти минуты: тайм-аут действует только на рукопожатие
+        socket_timeout(sock, 0)
+    return connection
+
+
+def request(message, port=PORT, timeout=None):
+    # Одно задание на соединение; ConnectionRefusedError — процесс анализа не запущен
+    with connect(port) as connection:
+        connection.send(message)
+        if timeout is not None and not connection.poll(timeout):
+            raise TimeoutError("Процесс анализа не ответил вовремя")
+        status, payload = connection.recv()
+    if status == "error":
+        raise RuntimeError(payload)
+    return payload
+
+
+def is_running(port=PORT):
+    try:
+        request(("ping",), port, timeout=5)
+        return True
+    except (ConnectionRefusedError, OSError, EOFError, TimeoutError, AuthenticationError):
+        return False
+
+
+def start_worker(port=PORT, timeout=START_TIMEOUT):
+    # Запуск процесса анализа в фоне и ожидание, пока он загрузит модель и начнёт принимать задания
+    os.makedirs(os.path.join(project_dir(), "index"), exist_ok=True)
+    log_file = open(os.path.join(project_dir(), LOG_PATH), "a", encoding="utf-8")
+    options = {"start_new_session": True} if os.name != "nt" else \
+        {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS}
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--port", str(port)],
+                               cwd=project_dir(), stdout=log_file, stderr=subprocess.STDOUT,
+                               stdin=subprocess.DEVNULL, **options)
+    log_file.close()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if is_running(port):
+            return True
+        if process.poll() is not None:
+            return False
+        time.sleep(0.2)
+    return False
+
+
+def analyze(filename, autostart=True, port=PORT):
+    # Анализ снимка drug_data/<filename>: в тёплом процессе, если он доступен, иначе локально.
+    # Возвращает путь к таблице reports/ или None, как analyzer_v2_0.analyze
+    try:
+        return request(("analyze", filename), port)
+    except (ConnectionRefusedError, OSError, EOFError, TimeoutError, AuthenticationError):
+        pass
+    if autostart and start_worker(port):
+        try:
+            return request(("analyze", filename), port)
+        except (ConnectionRefusedError, OSError, EOFError, TimeoutError, AuthenticationError):
+            pass
+    from analyzer_v2_0 import analyze as analyze_local
+    return analyze_local(filename)
+
+
+def serve(port=PORT):
+    started = time.perf_counter()
+    import analyzer_v2_0
+    if analyzer_v2_0.nlp is None:
+        print("Модель en_core_sci_sm не загружена: NER и семантический анализ будут пустыми", flush=True)
+    print(f"Модель загружена за {time.perf_counter() - started:.1f} с", flush=True)
+
+    # Модель одна на процесс: задания выполняются по очереди, соединения обслуживаются потоками
+    analysis_lock = threading.Lock()
+
+    def handle(connection):
+        with connection:
+            try:
+                message = connection.recv()
+            except EOFError:
+                return
+            command = message[0]
+            try:
+                if command == "ping":
+                    connection.send(("ok", os.getpid()))
+                elif command == "analyze":
+                    with analysis_lock:
+                        job_started = time.perf_counter()
+                        table_path = analyzer_v2_0.analyze(message[1])
+                        print(f"{message[1]}: {time.perf_counter() - job_started:.2f} с", flush=True)
+                    connection.send(("ok", table_path))
+                elif command == "shutdown":
+                    connection.send(("ok", None))
+                    with analysis_lock:  # Дожидаемся текущего задания
+                        os._exit(0)
+                else:
+                    connection.send(("error", f"Неизвестная команда {command}"))
+            except Exception as e:
+                connection.send(("error", str(e)))
+
+    with Listener((HOST, port), authkey=auth_key()) as listener:
+        print(f"Процесс анализа слушает {HOST}:{port}", flush=True)
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                # Неверный ключ или оборванное рукопожатие не должны останавливать процесс
+                print(f"Отклонено соединение: {e}", flush=True)
+                continue
+            threading.Thread(target=handle, args=(connection,), daemon=True).start()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Тёплый процесс анализа BIOLock (модель scispaCy загружена заранее)")
+    arg_parser.add_argument("files", nargs="*", help="снимки drug_data для анализа через процесс (клиентский режим)")
+    arg_parser.add_argument("--port", type=int, default=PORT, help="локальный порт процесса анализа")
+    arg_parser.add_argument("--stop", action="store_true", help="остановить запущенный процесс анализа")
+    args = arg_parser.parse_args()
+
+    if args.stop:
+        request(("shutdown",), args.port)
+        print("Процесс анализа остановлен.")
+    elif args.files:
+        for filename in args.files:
+            print(f"{filename}: {analyze(filename, port=args.port)}")
+    else:
+        serve(args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-import json
 import re
 import pandas as pd
 import os
 import spacy
+from tables_v1_0 import REPORT_LIST_COLUMNS, table_path as new_table_path, write_frame
+from archive_v1_0 import load_snapshot, resolve_snapshot, snapshot_base
+from twins_v1_0 import article_text, lookup_analysis, signature, store_analysis
 from spacy.matcher import PhraseMatcher
 
 # Попытка загрузить модель scispaCy. Нужна en_core_sci_sm.
@@ -13,6 +15,12 @@ except Exception as e:
     nlp = None
 
 
+def model_name():
+    # Ключ кэша результатов NLP: результаты другой модели или версии не переиспользуются
+    meta = getattr(nlp, "meta", {}) or {}
+    return f"{meta.get('name', 'unknown')}-{meta.get('version', '')}"
+
+
 def extract_specific_side_effects(article):
     keywords = [
         # Базовые симптомы
@@ -149,14 +157,26 @@ def extract_research_method(methods_text):
     return " | ".join(result) if result else None
 
 
-def extract_medical_entities(article):
-    if not nlp:
-        return None
+def nlp_text(article):
+    # Текст статьи, который анализирует модель
     combined_text = ""
     for key in ["methods", "results", "figures_tables"]:
         if article.get(key):
             combined_text += article.get(key) + " "
-    doc = nlp(combined_text)
+    return combined_text
+
+
+def merge_values(*values):
+    # Объединение списков через запятую без повторов (порядок первого появления)
+    items = [item.strip() for value in values if value for item in value.split(",")]
+    items = list(dict.fromkeys(item for item in items if item))
+    return ", ".join(items) if items else None
+
+
+def extract_medical_entities(article):
+    if not nlp:
+        return None
+    doc = nlp(nlp_text(article))
     entities = [ent.text for ent in doc.ents]
     # Remove duplicates while preserving order
     entities = list(dict.fromkeys(entities))
@@ -166,11 +186,7 @@ def extract_medical_entities(article):
 def semantic_rule_based_analysis(article):
     if not nlp:
         return None
-    combined_text = ""
-    for key in ["methods", "results", "figures_tables"]:
-        if article.get(key):
-            combined_text += article.get(key) + " "
-    doc = nlp(combined_text)
+    doc = nlp(nlp_text(article))
 
     matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
     # Phrases characteristic of significant clinical outcomes
@@ -217,8 +233,8 @@ def analyze(filename):
     script_dir = os.path.dirname(os.path.abspath(__file__))
     # Формируем путь к папке drug_data
     drug_data_dir = os.path.join(script_dir, "drug_data")
-    # Формируем полный путь к файлу
-    file_path = os.path.join(drug_data_dir, filename)
+    # Формируем полный путь к файлу; снимок может быть сохранён сжатым (.json.gz, .json.zst)
+    file_path = resolve_snapshot(os.path.join(drug_data_dir, filename))
 
     # Проверяем существование файла (замените эту часть в вашем коде)
     if not os.path.isfile(file_path):
@@ -230,20 +246,45 @@ def analyze(filename):
         return
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            articles = json.load(f)
+        articles = load_snapshot(file_path)
     except Exception as e:
         print(f"Error opening file {file_path}: {e}")
         return
 
     table_data = []
+    model = model_name() if nlp else None
+    reused = duplicates = 0
 
     for article in articles:
         specific_side_effects = extract_specific_side_effects(article)
         sample_size = extract_sample_size(article.get("methods"))
         research_method = extract_research_method(article.get("methods"))
-        ner_entities = extract_medical_entities(article)
-        semantic_analysis = semantic_rule_based_analysis(article)
+        # Модель не запускается для статьи, уже проанализированной в другом снимке; для близкого
+        # дубликата (склейка отзывов с новым article_id, twins_v1_0) — запускается только на новых
+        # участках текста, и результаты объединяются с результатами дубликата
+        article_id = article.get("article_id")
+        twin_id = None
+        cached = None
+        if nlp:
+            text = nlp_text(article)
+            sig = signature(article_text(article))
+            cached = lookup_analysis(article_id, sig, model, text)
+        if cached:
+            ner_entities, semantic_analysis, twin_id, new_text = cached
+            reused += 1
+            if twin_id:
+                duplicates += 1
+            if new_text is not None:
+                if new_text:
+                    new_part = {"results": new_text}
+                    ner_entities = merge_values(ner_entities, extract_medical_entities(new_part))
+                    semantic_analysis = merge_values(semantic_analysis, semantic_rule_based_analysis(new_part))
+                store_analysis(article_id, sig, model, ner_entities, semantic_analysis, text, twin_id)
+        else:
+            ner_entities = extract_medical_entities(article)
+            semantic_analysis = semantic_rule_based_analysis(article)
+            if nlp:
+                store_analysis(article_id, sig, model, ner_entities, semantic_analysis, text)
 
         # Формируем словарь и гарантируем, что все значения скалярные
         row = {
@@ -253,28 +294,31 @@ def analyze(filename):
             "Sample Size": safe_convert(sample_size),
             "Research Method": safe_convert(research_method),
             "NER Entities": safe_convert(ner_entities),
-            "Semantic Analysis": safe_convert(semantic_analysis)
+            "Semantic Analysis": safe_convert(semantic_analysis),
+            "Near Duplicate Of": safe_convert(twin_id)
         }
         table_data.append(row)
 
     df = pd.DataFrame(table_data)
+    if reused:
+        print(f"NLP results reused for {reused} of {len(articles)} articles ({duplicates} near duplicates)")
     print("Extracted Data Table:")
     print(df.to_string(index=False))
 
-    base_name = os.path.splitext(filename)[0]
-    table_filename = f"{base_name}_table.csv"
+    base_name = snapshot_base(filename) or os.path.splitext(filename)[0]
 
     # Создаем папку reports (если ее нет)
     script_dir = os.path.dirname(os.path.abspath(__file__))
     reports_dir = os.path.join(script_dir, "reports")
     os.makedirs(reports_dir, exist_ok=True)  # exist_ok=True игнорирует ошибку, если папка уже существует
 
-    # Формируем полный путь для сохранения
-    table_path = os.path.join(reports_dir, table_filename)
+    # Формируем полный путь для сохранения: CSV или Parquet в зависимости от BIOLOCK_TABLE_FORMAT
+    table_path = new_table_path(reports_dir, f"{base_name}_table")
 
-    # Сохраняем CSV в папку reports
-    df.to_csv(table_path, sep=';', index=False, encoding="utf-8")
+    # Сохраняем таблицу в папку reports (атомарно, под блокировкой)
+    write_frame(table_path, df, REPORT_LIST_COLUMNS)
     print(f"\nData saved to file {table_path}")
+    return table_path
 
 
 if __name__ == "__main__":
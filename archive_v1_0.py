@@ -0,0 +1,315 @@
+import io
+import os
+import re
+import gzip
+import json
+import contextlib
+
+from keeper_v1_0 import atomic_write
+
+# Хранилище статей с адресацией по article_id: articles/<первые 2 символа>/<article_id>.json.
+# Снимок drug_data/{drug}_{date}.json хранит только манифест — список ID и параметры запроса,
+# поэтому одна и та же статья из ежедневных снимков и разных препаратов лежит на диске один раз
+ARTICLES_DIR = "articles"
+DRUG_DATA_DIR = "drug_data"
+MANIFEST_FORMAT = "biolock-manifest-1"
+
+# Снимки могут храниться сжатыми: {drug}_{date}.json.gz (gzip) или .json.zst (zstd, нужен пакет
+# zstandard). Сжатие новых снимков задаётся переменной окружения BIOLOCK_SNAPSHOT_COMPRESSION=gzip|zstd
+# (по умолчанию без сжатия). Читатели получают снимок по имени без расширения в любом формате,
+# а распаковка идёт потоком при чтении, без промежуточных файлов
+SNAPSHOT_EXT = ".json"
+CODEC_EXTS = {"gzip": ".gz", "zstd": ".zst"}
+SNAPSHOT_EXTS = (SNAPSHOT_EXT,) + tuple(SNAPSHOT_EXT + ext for ext in CODEC_EXTS.values())
+COMPRESSION_ENV = "BIOLOCK_SNAPSHOT_COMPRESSION"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+_warned = False
+
+# Поля, которые относятся к конкретному запросу, а не к статье
+QUERY_FIELDS = ("query_date",)
+
+
+def article_path(article_id):
+    return os.path.join(ARTICLES_DIR, article_id[:2], article_id + ".json")
+
+
+def store_article(record):
+    # Статья неизменяема: если объект с таким ID уже есть, повторно не пишем
+    article_id = record["article_id"]
+    path = article_path(article_id)
+    if os.path.exists(path):
+        return False
+    article = {key: value for key, value in record.items() if key not in QUERY_FIELDS}
+    # Блокировка не нужна: параллельные писатели кладут одинаковое содержимое
+    with atomic_write(path, lock=False) as f:
+        json.dump(article, f, ensure_ascii=False)
+    return True
+
+
+def load_article(article_id):
+    with open(article_path(article_id), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def zstd_available():
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def snapshot_compression():
+    # Кодек для новых снимков: "gzip", "zstd" или None
+    global _warned
+    codec = os.environ.get(COMPRESSION_ENV, "").strip().lower()
+    if codec in ("", "none", "json"):
+        return None
+    if codec == "zstd" and not zstd_available():
+        if not _warned:
+            print(f"{COMPRESSION_ENV}=zstd, но пакет zstandard не установлен: снимки сжимаются gzip")
+            _warned = True
+        return "gzip"
+    if codec not in CODEC_EXTS:
+        if not _warned:
+            print(f"{COMPRESSION_ENV}={codec}: неизвестный кодек, снимки сохраняются без сжатия")
+            _warned = True
+        return None
+    return codec
+
+
+def snapshot_codec(path):
+    for codec, ext in CODEC_EXTS.items():
+        if path.lower().endswith(SNAPSHOT_EXT + ext):
+            return codec
+    return None
+
+
+def snapshot_base(filename):
+    # "aspirin_17_02_2025.json.gz" -> "aspirin_17_02_2025"; None, если файл не снимок
+    name = os.path.basename(filename)
+    for ext in sorted(SNAPSHOT_EXTS, key=len, reverse=True):
+        if name.lower().endswith(ext):
+            return name[:-len(ext)]
+    return None
+
+
+def snapshot_path(directory, base, codec=None):
+    # Путь для нового снимка с текущим сжатием (или явно заданным codec)
+    codec = codec or snapshot_compression()
+    return os.path.join(directory, base + SNAPSHOT_EXT + (CODEC_EXTS[codec] if codec else ""))
+
+
+def find_snapshot(directory, base):
+    # Путь к существующему снимку base в любом формате (более новый файл) или None
+    found = None
+    for ext in SNAPSHOT_EXTS:
+        path = os.path.join(directory, base + ext)
+        if os.path.isfile(path) and (found is None or os.path.getmtime(path) > os.path.getmtime(found)):
+            found = path
+    return found
+
+
+def list_snapshots(directory=DRUG_DATA_DIR):
+    # Имя снимка -> путь; если снимок есть в нескольких форматах, берётся более новый файл
+    snapshots = {}
+    try:
+        filenames = os.listdir(directory)
+    except FileNotFoundError:
+        return snapshots
+    for filename in sorted(filenames):
+        base = snapshot_base(filename)
+        if base is None:
+            continue
+        path = os.path.join(directory, filename)
+        if base in snapshots and os.path.getmtime(snapshots[base]) >= os.path.getmtime(path):
+            continue
+        snapshots[base] = path
+    return snapshots
+
+
+def resolve_snapshot(path):
+    # Снимок по пути с любым расширением: "drug_data/aspirin_17_02_2025.json" найдёт и .json.gz
+    if os.path.isfile(path):
+        return path
+    base = snapshot_base(path)
+    if base is None:
+        return path
+    return find_snapshot(os.path.dirname(path), base) or path
+
+
+@contextlib.contextmanager
+def open_snapshot(path):
+    # Текстовый поток снимка; сжатые файлы распаковываются по мере чтения
+    codec = snapshot_codec(path)
+    with open(path, "rb") as raw:
+        if codec == "gzip":
+            stream = gzip.GzipFile(fileobj=raw, mode="rb")
+        elif codec == "zstd":
+            import zstandard
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            stream = raw
+        with io.TextIOWrapper(stream, encoding="utf-8") as text:
+            yield text
+
+
+@contextlib.contextmanager
+def create_snapshot(path):
+    # Атомарная запись снимка; данные сжимаются потоком по мере записи
+    codec = snapshot_codec(path)
+    if codec is None:
+        with atomic_write(path) as f:
+            yield f
+        return
+    with atomic_write(path, mode="wb") as raw:
+        if codec == "gzip":
+            stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            import zstandard
+            stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+        # Закрытие обёртки дописывает хвост сжатого потока; сам файл закрывает atomic_write
+        with io.TextIOWrapper(stream, encoding="utf-8") as text:
+            yield text
+
+
+def remove_other_formats(path):
+    # Снимок с тем же именем в другом формате устарел: удаляем, чтобы читатели не видели дубль
+    base = snapshot_base(path)
+    for ext in SNAPSHOT_EXTS:
+        other = os.path.join(os.path.dirname(path), base + ext)
+        if other != path:
+            try:
+                os.remove(other)
+            except FileNotFoundError:
+                pass
+
+
+def read_snapshot_data(path):
+    with open_snapshot(resolve_snapshot(path)) as f:
+        return json.load(f)
+
+
+def is_manifest(data):
+    return isinstance(data, dict) and data.get("format") == MANIFEST_FORMAT
+
+
+def write_snapshot(path, records, drug=None, sources=None, query_date=None):
+    # Сохраняет статьи в хранилище и записывает на место снимка лёгкий манифест
+    entries = []
+    for record in records:
+        if not record.get("article_id"):
+            # Без ID адресовать нечего — запись остаётся в манифесте целиком
+            entries.append({"record": record})
+            continue
+        store_article(record)
+        entry = {"article_id": record["article_id"]}
+        for key in QUERY_FIELDS:
+            if key in record:
+                entry[key] = record[key]
+        entries.append(entry)
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "drug": drug,
+        "query_date": query_date,
+        "sources": sources,
+        "articles": entries,
+    }
+    with create_snapshot(path) as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    remove_other_formats(path)
+    return path
+
+
+def expand_manifest(manifest):
+    records = []
+    for entry in manifest.get("articles", []):
+        if "record" in entry:
+            records.append(entry["record"])
+            continue
+        try:
+            record = load_article(entry["article_id"])
+        except FileNotFoundError:
+            print(f"Статья {entry['article_id']} не найдена в хранилище {ARTICLES_DIR}")
+            continue
+        for key in QUERY_FIELDS:
+            if key in entry:
+                record[key] = entry[key]
+        records.append(record)
+    return records
+
+
+def load_snapshot(path):
+    # Единая точка чтения снимков: возвращает тот же список статей, что и старый формат.
+    # path может указывать на .json, даже если снимок сохранён сжатым
+    data = read_snapshot_data(path)
+    if is_manifest(data):
+        return expand_manifest(data)
+    return data
+
+
+def snapshot_article_ids(path):
+    # ID статей снимка без чтения самих статей
+    data = read_snapshot_data(path)
+    if is_manifest(data):
+        return [entry.get("article_id") or entry["record"].get("article_id") for entry in data.get("articles", [])]
+    return [record.get("article_id") for record in data]
+
+
+def migrate(drug_data_dir=DRUG_DATA_DIR):
+    # Перевод старых снимков (полные статьи в каждом файле) в манифесты
+    converted = 0
+    for base, path in list_snapshots(drug_data_dir).items():
+        try:
+            data = read_snapshot_data(path)
+        except Exception as e:
+            print(f"Ошибка чтения {path}: {e}")
+            continue
+        if is_manifest(data) or not isinstance(data, list):
+            continue
+        match = re.match(r"^(.*?)_(\d{2}_\d{2}_\d{4})$", base)
+        drug, query_date = (match.group(1).replace("_", " "), match.group(2)) if match else (None, None)
+        write_snapshot(path, data, drug=drug, query_date=query_date)
+        converted += 1
+        print(f"Преобразован: {path}")
+    return converted
+
+
+def recompress(codec, drug_data_dir=DRUG_DATA_DIR):
+    # Перепаковка существующих снимков в заданный кодек (None — без сжатия); содержимое не меняется
+    converted = 0
+    for base, path in list_snapshots(drug_data_dir).items():
+        target = snapshot_path(drug_data_dir, base, codec) if codec else os.path.join(drug_data_dir, base + SNAPSHOT_EXT)
+        if target == path:
+            continue
+        with open_snapshot(path) as source, create_snapshot(target) as f:
+            while True:
+                chunk = source.read(1 << 20)
+                if not chunk:
+                    break
+                f.write(chunk)
+        remove_other_formats(target)
+        converted += 1
+        print(f"{path} -> {target}")
+    return converted
+
+
+if __name__ == "__main__":
+    import sys
+    # python archive_v1_0.py — перевод старых снимков в манифесты;
+    # python archive_v1_0.py --compress gzip|zstd|none — перепаковка снимков drug_data
+    if "--compress" in sys.argv:
+        position = sys.argv.index("--compress") + 1
+        target_codec = sys.argv[position].lower() if position < len(sys.argv) else "gzip"
+        target_codec = None if target_codec == "none" else target_codec
+        if target_codec not in (None,) + tuple(CODEC_EXTS):
+            raise SystemExit(f"Неизвестный кодек {target_codec}: gzip, zstd или none")
+        if target_codec == "zstd" and not zstd_available():
+            raise SystemExit("Для zstd нужен пакет zstandard: pip install zstandard")
+        print(f"Снимков перепаковано: {recompress(target_codec)}")
+    else:
+        count = migrate()
+        print(f"Снимков преобразовано: {count}")
@@ -0,0 +1,251 @@
+import os
+import re
+import json
+import argparse
+
+from keeper_v1_0 import atomic_write, file_lock
+from tables_v1_0 import REFINED_LIST_COLUMNS, find_table, list_tables, read_rows, table_path, write_rows
+from sieve_v1_0 import file_signature, get_column_field
+
+# Этап нормализации эффектов между очисткой (refined/) и сборкой баз (scavenge, organize).
+# Каждое написание эффекта из чистовой таблицы приводится к каноническому термину по таблице,
+# скомпилированной один раз при импорте: регистр и пробелы, британское написание, множественное
+# число, слова-степени ("mild", "severe"), синонимы ("skin rash" -> "rash"). Заглушки вроде
+# "nothing" и "side effects" удаляются. Результат — таблица canonical/<имя>_table с каноническими
+# эффектами и исходными написаниями в столбце "raw side effects"; соответствие
+# "исходное написание -> термин" по каждой таблице хранится в canonical/mapping.json
+REFINED_DIR = "refined"
+CANONICAL_DIR = "canonical"
+MAPPING_PATH = os.path.join(CANONICAL_DIR, "mapping.json")
+# Увеличивается при изменении таблиц ниже: все канонические таблицы пересобираются
+CANON_VERSION = 1
+
+# Не эффекты: заглушки очистки и общие слова, которые NER принимает за эффект
+PLACEHOLDERS = {
+    "nothing", "none", "n/a", "побочные эффекты",
+    "side effect", "side effects", "adverse effect", "adverse effects", "adverse reaction", "adverse reactions",
+    "adverse event", "adverse events", "adverse drug reaction", "adverse drug reactions",
+    "undesirable effect", "undesirable effects", "serious adverse reaction", "serious adverse reactions",
+    "serious adverse event", "serious adverse events", "drug-induced", "toxicity",
+}
+
+# Канонический термин -> другие написания
+SYNONYMS = {
+    "rash": ["skin rash", "skin rashes", "skin eruption", "eruption"],
+    "hypertension": ["systolic hypertension", "diastolic hypertension", "arterial hypertension",
+                     "high blood pressure", "elevated blood pressure"],
+    "hypotension": ["low blood pressure", "systolic hypotension"],
+    "headache": ["head ache", "cephalalgia"],
+    "vomiting": ["emesis"],
+    "pruritus": ["itching", "itch", "itchiness"],
+    "dyspnea": ["shortness of breath", "breathlessness"],
+    "fatigue": ["tiredness"],
+    "somnolence": ["drowsiness", "sleepiness"],
+    "arrhythmia": ["cardiac arrhythmia", "cardiac arrhythmias", "heart rhythm disorder"],
+    "seizure": ["convulsion", "convulsions"],
+    "hepatotoxicity": ["liver toxicity", "hepatic toxicity", "liver injury", "drug-induced liver injury"],
+    "nephrotoxicity": ["renal toxicity", "kidney toxicity"],
+    "bleeding": ["hemorrhage", "haemorrhage"],
+    "syncope": ["fainting"],
+    "pyrexia": ["fever"],
+    "urticaria": ["hives"],
+    "myalgia": ["muscle pain"],
+    "arthralgia": ["joint pain"],
+    "urinary tract infection": ["uti"],
+    # Термины без синонимов: нужны, чтобы "nauseas" или "mild nausea" сводились к ним
+    "nausea": [], "diarrhea": [], "constipation": [], "dizziness": [], "insomnia": [], "edema": [],
+    "anemia": [], "anxiety": [], "depression": [], "weight gain": [], "weight loss": [], "hair loss": [],
+    "abdominal pain": [], "dry mouth": [], "cough": [], "tremor": [], "palpitation": [], "tachycardia": [],
+}
+
+# Британское написание -> американское (подстроки)
+SPELLING = {"haem": "hem", "oedema": "edema", "diarrhoea": "diarrhea", "anaemia": "anemia", "oesophag": "esophag",
+            "dyspnoea": "dyspnea", "leukaem": "leukem"}
+
+MODIFIERS = re.compile(r"^(?:mild|moderate|severe|transient|occasional|frequent|persistent|recurrent)\s+")
+SPACES = re.compile(r"\s+")
+EDGE_PUNCTUATION = " \t\"'`.;:!?()[]{}"
+
+
+def compile_lookup():
+    lookup = {term: None for term in PLACEHOLDERS}
+    for canonical, variants in SYNONYMS.items():
+        lookup[canonical] = canonical
+        for variant in variants:
+            lookup[variant] = canonical
+    return lookup
+
+
+LOOKUP = compile_lookup()
+_cache = {}
+_mapping_checked = None  # подпись mapping.json, для которой уже проверена версия
+
+
+def clean(raw):
+    text = SPACES.sub(" ", str(raw).lower()).strip(EDGE_PUNCTUATION)
+    for british, american in SPELLING.items():
+        if british in text:
+            text = text.replace(british, american)
+    return text
+
+
+def singular(text):
+    # "headaches" -> "headache"; слова на -ss/-us/-is ("dizziness", "pruritus") не меняются
+    if len(text) > 4 and text.endswith("s") and not text.endswith(("ss", "us", "is")):
+        return text[:-1]
+    return text
+
+
+def canonical(raw):
+    # Канонический термин для исходного написания; None — не эффект (заглушка).
+    # Множественное число и слова-степени убираются, только если получается известный термин:
+    # "diabetes" или "severe combined immunodeficiency" остаются как есть
+    if raw in _cache:
+        return _cache[raw]
+    text = clean(raw)
+    result = text or None
+    stripped = MODIFIERS.sub("", text)
+    for form in (text, singular(text), stripped, singular(stripped)):
+        if form in LOOKUP:
+            result = LOOKUP[form]
+            break
+    _cache[raw] = result
+    return result
+
+
+def canonical_effects(effects):
+    # Список канонических эффектов без повторов (порядок первого появления) и соответствие написаний
+    result = []
+    mapping = {}
+    for raw in effects:
+        raw = raw.strip()
+        if not raw:
+            continue
+        term = canonical(raw)
+        mapping[raw] = term
+        if term and term not in result:
+            result.append(term)
+    return result, mapping
+
+
+def canonical_table(base):
+    # Существующая каноническая таблица или путь в текущем формате
+    return find_table(CANONICAL_DIR, base) or table_path(CANONICAL_DIR, base)
+
+
+def canonize_table(input_path, output_path):
+    fieldnames, rows = read_rows(input_path)
+    effects_field = get_column_field(fieldnames, "side effects")
+    out_fields = list(fieldnames) + ["raw side effects"]
+    mapping = {}
+    out_rows = []
+    for row in rows:
+        raw_effects = (row.get(effects_field) or "") if effects_field else ""
+        effects, row_mapping = canonical_effects(raw_effects.split(","))
+        mapping.update(row_mapping)
+        out_row = dict(row)
+        if effects_field:
+            out_row[effects_field] = ", ".join(effects)
+        out_row["raw side effects"] = raw_effects
+        out_rows.append(out_row)
+    write_rows(output_path, out_fields, out_rows, REFINED_LIST_COLUMNS + ("raw side effects",))
+    return mapping
+
+
+def read_mapping():
+    try:
+        with open(MAPPING_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"version": CANON_VERSION, "tables": {}}
+    if data.get("version") != CANON_VERSION:
+        return {"version": CANON_VERSION, "tables": {}}
+    return data
+
+
+def update_mapping(tables=None, removed=()):
+    # Соответствие по таблицам обновляется под блокировкой: задачи конвейера пишут его параллельно
+    with file_lock(MAPPING_PATH + ".update"):
+        data = read_mapping()
+        data["tables"].update(tables or {})
+        for base in removed:
+            data["tables"].pop(base, None)
+        terms = {}
+        for table_mapping in data["tables"].values():
+            terms.update(table_mapping)
+        data["terms"] = dict(sorted(terms.items()))
+        with atomic_write(MAPPING_PATH) as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+
+def canonize_file(base):
+    # Нормализация одной чистовой таблицы refined/<base>; возвращает путь канонической таблицы
+    input_path = find_table(REFINED_DIR, base)
+    if input_path is None:
+        raise FileNotFoundError(f"Таблица {base} не найдена в папке {REFINED_DIR}")
+    output_path = table_path(CANONICAL_DIR, base)
+    mapping = canonize_table(input_path, output_path)
+    update_mapping({base: mapping})
+    return output_path
+
+
+def mapping_current():
+    # Совпадает ли версия mapping.json с CANON_VERSION; файл перечитывается только после изменения
+    global _mapping_checked
+    signature = file_signature(MAPPING_PATH)
+    if signature is None:
+        return False
+    if _mapping_checked != signature:
+        try:
+            with open(MAPPING_PATH, "r", encoding="utf-8") as f:
+                version = json.load(f).get("version")
+        except (FileNotFoundError, ValueError):
+            return False
+        if version != CANON_VERSION:
+            return False
+        _mapping_checked = signature
+    return True
+
+
+def is_current(base, input_path):
+    output_path = find_table(CANONICAL_DIR, base)
+    return output_path is not None and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+
+def canonize(force=False):
+    # Инкрементальная нормализация всех таблиц refined/: пересобираются только таблицы новее
+    # канонических (и все — при смене CANON_VERSION); лишние канонические таблицы удаляются.
+    # Возвращает число пересобранных таблиц
+    refined = list_tables(REFINED_DIR)
+    force = force or (bool(refined) and not mapping_current())
+    tables = {}
+    for base, input_path in refined.items():
+        if not force and is_current(base, input_path):
+            continue
+        tables[base] = canonize_table(input_path, table_path(CANONICAL_DIR, base))
+    removed = []
+    for base, path in list_tables(CANONICAL_DIR).items():
+        if base not in refined:
+            os.remove(path)
+            removed.append(base)
+    if tables or removed:
+        update_mapping(tables, removed)
+    return len(tables)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Нормализация побочных эффектов чистовых таблиц BIOLock")
+    arg_parser.add_argument("--force", action="store_true", help="пересобрать все канонические таблицы")
+    arg_parser.add_argument("--workdir", default=".", help="папка проекта с refined/")
+    args = arg_parser.parse_args()
+    os.chdir(args.workdir)
+
+    print(f"Пересобрано таблиц: {canonize(args.force)}")
+    terms = read_mapping().get("terms", {})
+    canonical_terms = {term for term in terms.values() if term}
+    dropped = sum(1 for term in terms.values() if term is None)
+    print(f"Написаний: {len(terms)}, канонических терминов: {len(canonical_terms)}, удалено заглушек: {dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import os
+import sqlite3
+import argparse
+import threading
+from datetime import date, datetime, timedelta
+
+from canon_v1_0 import CANONICAL_DIR
+from tables_v1_0 import list_tables, read_rows
+from sieve_v1_0 import clean_id, get_column_field
+from conductor_v1_0 import split_snapshot_name
+
+# Хранилище временных рядов упоминаний эффектов по таблицам canonical/ (нормализованные refined/).
+# Каждая строка mentions — упоминание эффекта в статье одного снимка: препарат, дата снимка,
+# ID статьи, эффект и месяц публикации (из столбца "last mention"). Ряды строятся по двум осям:
+#   snapshot    — по дате снимка (когда упоминание было собрано),
+#   publication — по месяцу публикации статьи.
+# Значение за период — число различных статей (пар препарат + статья), поэтому статья из
+# нескольких снимков одного периода считается один раз. Периоды: week (с понедельника), month, year;
+# ключ периода — дата его начала в формате ISO. Таблицы перечитываются, только если у файла
+# изменились размер или время изменения; удалённые таблицы убираются из хранилища.
+# Таблицы canonical/ только читаются: их пересобирают этап canon конвейера, scavenge и organize
+INDEX_PATH = os.path.join("index", "chronicle.sqlite")
+PERIODS = ("week", "month", "year")
+AXES = ("snapshot", "publication")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (file TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS mentions (
+    file TEXT NOT NULL,
+    drug TEXT NOT NULL,
+    snapshot TEXT NOT NULL,
+    article_id TEXT NOT NULL,
+    effect TEXT NOT NULL,
+    pub_month TEXT
+);
+CREATE INDEX IF NOT EXISTS mentions_by_file ON mentions (file);
+CREATE INDEX IF NOT EXISTS mentions_by_snapshot ON mentions (drug, effect, snapshot);
+CREATE INDEX IF NOT EXISTS mentions_by_publication ON mentions (drug, effect, pub_month);
+CREATE INDEX IF NOT EXISTS mentions_by_effect ON mentions (effect, snapshot);
+"""
+
+# Начало периода для даты ISO в SQL
+PERIOD_SQL = {
+    "week": "date({column}, '-6 days', 'weekday 1')",
+    "month": "substr({column}, 1, 7) || '-01'",
+    "year": "substr({column}, 1, 4) || '-01-01'",
+}
+
+_local = threading.local()
+
+
+def connect():
+    # Одно соединение на поток, как в ledger_v1_0
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        connection = sqlite3.connect(INDEX_PATH, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+    return connection
+
+
+def snapshot_info(base):
+    # "Aspirin_17_02_2025_table" -> ("aspirin", "2025-02-17"); (None, None), если имя не по шаблону.
+    # Препарат — в нижнем регистре, как в запросах и в librarian_v1_0
+    drug, date_str = split_snapshot_name(base[:-len("_table")] if base.endswith("_table") else base)
+    if drug is None:
+        return None, None
+    try:
+        return drug.lower(), datetime.strptime(date_str, "%d_%m_%Y").date().isoformat()
+    except ValueError:
+        return None, None
+
+
+def publication_month(value):
+    # "2020-01-15" / "2020-01" -> "2020-01-01"; только год -> январь этого года; иначе None
+    value = (value or "").strip()
+    if len(value) >= 7 and value[:4].isdigit() and value[4] == "-" and value[5:7].isdigit():
+        return value[:7] + "-01"
+    if len(value) == 4 and value.isdigit():
+        return value + "-01-01"
+    return None
+
+
+def table_mentions(path, file, drug, snapshot):
+    fieldnames, rows = read_rows(path, columns=["last mention", "article id", "side effects"])
+    effects_field = get_column_field(fieldnames, "side effects")
+    id_field = get_column_field(fieldnames, "article id")
+    date_field = get_column_field(fieldnames, "last mention")
+    if not effects_field or not id_field:
+        return []
+    mentions = set()
+    for row in rows:
+        article_id = clean_id(row.get(id_field) or "")
+        if not article_id:
+            continue
+        pub_month = publication_month(row.get(date_field)) if date_field else None
+        for effect in (row.get(effects_field) or "").split(","):
+            effect = effect.strip().lower()
+            if effect:
+                mentions.add((file, drug, snapshot, article_id, effect, pub_month))
+    return sorted(mentions, key=lambda mention: (mention[3], mention[4]))
+
+
+def refresh(force=False):
+    # Инкрементальное обновление; возвращает число переиндексированных таблиц
+    connection = connect()
+    tables = list_tables(CANONICAL_DIR)
+    changed = 0
+    with connection:
+        known = {file: (size, mtime_ns) for file, size, mtime_ns in connection.execute("SELECT * FROM files")}
+        seen = set()
+        for base, path in tables.items():
+            drug, snapshot = snapshot_info(base)
+            if drug is None:
+                continue
+            seen.add(path)
+            stat = os.stat(path)
+            if not force and known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            connection.execute("DELETE FROM mentions WHERE file = ?", (path,))
+            try:
+                rows = table_mentions(path, path, drug, snapshot)
+            except Exception as e:
+                print(f"Ошибка чтения файла {path}: {e}")
+                rows = []
+            connection.executemany("INSERT INTO mentions VALUES (?, ?, ?, ?, ?, ?)", rows)
+            connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (path, stat.st_size, stat.st_mtime_ns))
+            changed += 1
+        for path in set(known) - seen:
+            connection.execute("DELETE FROM mentions WHERE file = ?", (path,))
+            connection.execute("DELETE FROM files WHERE file = ?", (path,))
+            changed += 1
+    return changed
+
+
+def period_start(day, period):
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def next_period(day, period):
+    if period == "week":
+        return day + timedelta(days=7)
+    if period == "month":
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return date(day.year + 1, 1, 1)
+
+
+def check_options(by, period):
+    if by not in AXES:
+        raise ValueError(f"Неизвестная ось {by}: {', '.join(AXES)}")
+    if period not in PERIODS:
+        raise ValueError(f"Неизвестный период {period}: {', '.join(PERIODS)}")
+
+
+def counts(drug=None, effect=None, by="snapshot", period="month", start=None, end=None, group=True):
+    # {(препарат, эффект): {начало периода: число статей}}; при group=False — все пары вместе под ключом (drug, effect).
+    # start/end — даты ISO (включительно) по выбранной оси
+    check_options(by, period)
+    refresh()
+    column = "snapshot" if by == "snapshot" else "pub_month"
+    key = PERIOD_SQL[period].format(column=column)
+    conditions, params = [f"{column} IS NOT NULL"], []
+    if drug:
+        conditions.append("drug = ?")
+        params.append(drug.strip().lower().replace("_", " "))
+    if effect:
+        conditions.append("effect = ?")
+        params.append(effect.strip().lower())
+    if start:
+        conditions.append(f"{column} >= ?")
+        params.append(start)
+    if end:
+        conditions.append(f"{column} <= ?")
+        params.append(end)
+    names = "drug, effect, " if group else ""
+    sql = (f"SELECT {names}{key} AS period, COUNT(DISTINCT drug || '|' || article_id) FROM mentions "
+           f"WHERE {' AND '.join(conditions)} GROUP BY {names}period ORDER BY {names}period")
+    result = {}
+    for row in connect().execute(sql, params):
+        series_key = (row[0], row[1]) if group else (drug, effect)
+        result.setdefault(series_key, {})[row[-2]] = row[-1]
+    return result
+
+
+def fill_series(values, period, start=None, end=None):
+    # Непрерывный ряд [(начало периода, число)] с нулями для пропущенных периодов
+    if not values:
+        return []
+    first = date.fromisoformat(start) if start else date.fromisoformat(min(values))
+    last = date.fromisoformat(end) if end else date.fromisoformat(max(values))
+    day = period_start(first, period)
+    series = []
+    while day <= last:
+        key = day.isoformat()
+        series.append((key, values.get(key, 0)))
+        day = next_period(day, period)
+    return series
+
+
+def series(drug=None, effect=None, by="snapshot", period="month", start=None, end=None):
+    # Свёрнутый ряд для препарата и/или эффекта (без них — по всей базе)
+    values = counts(drug, effect, by, period, start, end, group=False).get((drug, effect), {})
+    return fill_series(values, period, start, end)
+
+
+def spikes(drug=None, effect=None, by="snapshot", period="month", window=6, threshold=3.0, min_count=3,
+           start=None, end=None):
+    # Всплески: период, в котором число статей не меньше min_count и превышает среднее за предыдущие
+    # window периодов больше чем на threshold стандартных отклонений (не меньше 1, чтобы редкие
+    # эффекты не давали всплеск от единичного упоминания). Результат отсортирован по силе всплеска
+    if window < 1:
+        raise ValueError("Базовая линия должна содержать хотя бы один период")
+    found = []
+    for (series_drug, series_effect), values in counts(drug, effect, by, period, None, end).items():
+        points = fill_series(values, period, None, end)
+        history = [value for _, value in points]
+        for position in range(window, len(points)):
+            key, value = points[position]
+            if value < min_count or (start and key < period_start(date.fromisoformat(start), period).isoformat()):
+                continue
+            previous = history[position - window:position]
+            mean = sum(previous) / window
+            deviation = max((sum((item - mean) ** 2 for item in previous) / window) ** 0.5, 1.0)
+            score = (value - mean) / deviation
+            if score > threshold:
+                found.append({"drug": series_drug, "effect": series_effect, "period": key, "count": value,
+                              "baseline": round(mean, 2), "score": round(score, 2)})
+    found.sort(key=lambda spike: (-spike["score"], spike["period"], spike["drug"], spike["effect"]))
+    return found
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Динамика упоминаний побочных эффектов по снимкам BIOLock")
+    arg_parser.add_argument("--drug", help="препарат (по умолчанию все)")
+    arg_parser.add_argument("--effect", help="побочный эффект (по умолчанию все)")
+    arg_parser.add_argument("--by", choices=AXES, default="snapshot", help="ось времени: дата снимка или публикации")
+    arg_parser.add_argument("--period", choices=PERIODS, default="month", help="шаг свёртки")
+    arg_parser.add_argument("--from", dest="start", help="начало диапазона, YYYY-MM-DD")
+    arg_parser.add_argument("--to", dest="end", help="конец диапазона, YYYY-MM-DD")
+    arg_parser.add_argument("--spikes", action="store_true", help="найти всплески вместо вывода ряда")
+    arg_parser.add_argument("--window", type=int, default=6, help="периодов в базовой линии для всплесков")
+    arg_parser.add_argument("--threshold", type=float, default=3.0, help="порог всплеска в стандартных отклонениях")
+    arg_parser.add_argument("--min-count", type=int, default=3, help="минимум статей в периоде всплеска")
+    arg_parser.add_argument("--workdir", default=".", help="папка проекта с canonical/")
+    args = arg_parser.parse_args()
+    if args.window < 1:
+        arg_parser.error("--window должен быть не меньше 1")
+    os.chdir(args.workdir)
+
+    print(f"Переиндексировано таблиц: {refresh()}")
+    if args.spikes:
+        found = spikes(args.drug, args.effect, args.by, args.period, args.window, args.threshold, args.min_count,
+                       args.start, args.end)
+        if not found:
+            print("Всплесков не найдено.")
+        for spike in found:
+            print(f"{spike['period']} {spike['drug']} — {spike['effect']}: {spike['count']} "
+                  f"(база {spike['baseline']}, {spike['score']} σ)")
+        return
+    for key, value in series(args.drug, args.effect, args.by, args.period, args.start, args.end):
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
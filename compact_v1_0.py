@@ -0,0 +1,252 @@
+import os
+import re
+import sys
+import mmap
+import struct
+import threading
+from array import array
+
+from keeper_v1_0 import atomic_write
+
+# Компактный двоичный снимок source_database.json (эффект -> препарат -> ID статей), который
+# читается через mmap без разбора JSON: строки эффектов и препаратов хранятся один раз
+# (интернированы), ID статей — по 16 байт (md5 в двоичном виде), связи — массивами смещений.
+# Файл строится рядом с JSON в build_side_effects_database; по нему отвечают запросы
+# recall_v1_0, пока JSON не изменился (в заголовке записаны его размер и время изменения).
+#
+# Раскладка (числа uint32 в порядке байтов машины, где файл записан; все секции выровнены на 4):
+#   заголовок          HEADER
+#   string_offsets     [n_strings + 1]  границы строк в string_blob
+#   string_blob        UTF-8 строки подряд
+#   effect_names       [n_effects]      номер строки эффекта, эффекты отсортированы по имени
+#   effect_pairs       [n_effects + 1]  границы пар (эффект, препарат) эффекта
+#   pair_drug          [n_pairs]        номер препарата пары
+#   pair_ids           [n_pairs + 1]    границы ID пары в секции ids
+#   drug_names         [n_drugs]        номер строки препарата, препараты отсортированы по имени
+#   drug_pairs_start   [n_drugs + 1]    границы списка пар препарата в drug_pairs
+#   drug_pairs         [n_pairs]        номера пар, сгруппированные по препаратам
+#   pair_effect        [n_pairs]        номер эффекта пары
+#   id_flags           [n_ids бит]      1 — ID не md5: в ids лежит номер строки с ID
+#   ids                [n_ids * 16]
+COMPACT_PATH = os.path.join("index", "source_database.bin")
+SOURCE_DB = "source_database.json"
+MAGIC = b"BLSRC001"
+HEADER = struct.Struct("<8s8sIIIIIqq")
+ID_SIZE = 16
+BYTE_ORDER = sys.byteorder.encode("ascii").ljust(8, b"\0")
+MD5_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def json_signature(path=SOURCE_DB):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def pad4(data):
+    return data + b"\0" * (-len(data) % 4)
+
+
+def pack_id(article_id):
+    # md5-ID (32 строчных шестнадцатеричных символа) -> 16 байт; прочие ID -> None.
+    # bytes.fromhex пропускает пробелы и заглавные буквы: такие ID не восстановились бы из байтов
+    if MD5_ID.fullmatch(article_id):
+        return bytes.fromhex(article_id)
+    return None
+
+
+def write_compact(source_db, path=COMPACT_PATH, json_path=SOURCE_DB):
+    strings = {}
+    blob = bytearray()
+    string_offsets = array("I", [0])
+
+    def intern(text):
+        if text not in strings:
+            strings[text] = len(strings)
+            blob.extend(text.encode("utf-8"))
+            string_offsets.append(len(blob))
+        return strings[text]
+
+    effects = sorted(source_db)
+    drugs = sorted({drug for drug_ids in source_db.values() for drug in drug_ids})
+    drug_numbers = {drug: number for number, drug in enumerate(drugs)}
+
+    effect_names = array("I", (intern(effect) for effect in effects))
+    drug_names = array("I", (intern(drug) for drug in drugs))
+    effect_pairs = array("I", [0])
+    pair_drug = array("I")
+    pair_effect = array("I")
+    pair_ids = array("I", [0])
+    ids = bytearray()
+    flags = bytearray()
+    pairs_by_drug = [[] for _ in drugs]
+    n_ids = 0
+    for effect_number, effect in enumerate(effects):
+        for drug in sorted(source_db[effect]):
+            pairs_by_drug[drug_numbers[drug]].append(len(pair_drug))
+            pair_drug.append(drug_numbers[drug])
+            pair_effect.append(effect_number)
+            for article_id in source_db[effect][drug]:
+                packed = pack_id(article_id)
+                if packed is None:
+                    packed = struct.pack("<I", intern(article_id)).ljust(ID_SIZE, b"\0")
+                    if n_ids // 8 >= len(flags):
+                        flags.extend(b"\0" * (n_ids // 8 - len(flags) + 1))
+                    flags[n_ids // 8] |= 1 << (n_ids % 8)
+                ids.extend(packed)
+                n_ids += 1
+            pair_ids.append(n_ids)
+        effect_pairs.append(len(pair_drug))
+    flags.extend(b"\0" * (-(-n_ids // 8) - len(flags)))
+
+    drug_pairs_start = array("I", [0])
+    drug_pairs = array("I")
+    for pairs in pairs_by_drug:
+        drug_pairs.extend(pairs)
+        drug_pairs_start.append(len(drug_pairs))
+
+    signature = json_signature(json_path) or (0, 0)
+    header = HEADER.pack(MAGIC, BYTE_ORDER, len(strings), len(effects), len(drugs), len(pair_drug), n_ids,
+                         signature[0], signature[1])
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with atomic_write(path, mode="wb") as f:
+        f.write(header)
+        for section in (string_offsets.tobytes(), bytes(blob), effect_names.tobytes(), effect_pairs.tobytes(),
+                        pair_drug.tobytes(), pair_ids.tobytes(), drug_names.tobytes(),
+                        drug_pairs_start.tobytes(), drug_pairs.tobytes(), pair_effect.tobytes(),
+                        bytes(flags), bytes(ids)):
+            f.write(pad4(section))
+    return path
+
+
+class CompactSources:
+    # Запросы к снимку без загрузки его в память: массивы — memoryview поверх mmap,
+    # строки и ID декодируются только для найденных записей
+    def __init__(self, path=COMPACT_PATH):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.map)
+        (magic, byte_order, self.n_strings, self.n_effects, self.n_drugs, self.n_pairs, self.n_ids,
+         json_size, json_mtime) = HEADER.unpack_from(view)
+        if magic != MAGIC or byte_order != BYTE_ORDER:
+            view.release()
+            self.map.close()
+            raise ValueError(f"{path}: неподдерживаемый формат снимка")
+        self.json_signature = (json_size, json_mtime)
+        self.view = view
+        self.position = HEADER.size
+        self.string_offsets = self.section_uint32(self.n_strings + 1)
+        self.blob = self.section(self.string_offsets[-1])
+        self.effect_names = self.section_uint32(self.n_effects)
+        self.effect_pairs = self.section_uint32(self.n_effects + 1)
+        self.pair_drug = self.section_uint32(self.n_pairs)
+        self.pair_ids = self.section_uint32(self.n_pairs + 1)
+        self.drug_names = self.section_uint32(self.n_drugs)
+        self.drug_pairs_start = self.section_uint32(self.n_drugs + 1)
+        self.drug_pairs = self.section_uint32(self.n_pairs)
+        self.pair_effect = self.section_uint32(self.n_pairs)
+        self.id_flags = self.section(-(-self.n_ids // 8))
+        self.ids = self.section(self.n_ids * ID_SIZE)
+
+    def section(self, size):
+        part = self.view[self.position:self.position + size]
+        self.position += size + (-size % 4)
+        return part
+
+    def section_uint32(self, count):
+        return self.section(count * 4).cast("I")
+
+    def close(self):
+        for name in ("string_offsets", "blob", "effect_names", "effect_pairs", "pair_drug", "pair_ids",
+                     "drug_names", "drug_pairs_start", "drug_pairs", "pair_effect", "id_flags", "ids", "view"):
+            getattr(self, name).release()
+        self.map.close()
+
+    def string(self, number):
+        return str(self.blob[self.string_offsets[number]:self.string_offsets[number + 1]], "utf-8")
+
+    def find(self, names, count, name):
+        # Двоичный поиск по отсортированной таблице имён; -1, если имени нет
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(names[middle]) < name:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < count and self.string(names[low]) == name else -1
+
+    def article_id(self, number):
+        packed = self.ids[number * ID_SIZE:(number + 1) * ID_SIZE]
+        if self.id_flags[number // 8] & (1 << (number % 8)):
+            return self.string(struct.unpack_from("<I", packed)[0])
+        return packed.hex()
+
+    def pair_article_ids(self, pair):
+        return [self.article_id(number) for number in range(self.pair_ids[pair], self.pair_ids[pair + 1])]
+
+    def effects(self):
+        return [self.string(self.effect_names[number]) for number in range(self.n_effects)]
+
+    def drugs(self):
+        return [self.string(self.drug_names[number]) for number in range(self.n_drugs)]
+
+    def effect_sources(self, effect):
+        # препарат -> ID источников для эффекта (как source_database.json[effect])
+        number = self.find(self.effect_names, self.n_effects, effect)
+        if number < 0:
+            return {}
+        return {self.string(self.drug_names[self.pair_drug[pair]]): self.pair_article_ids(pair)
+                for pair in range(self.effect_pairs[number], self.effect_pairs[number + 1])}
+
+    def drug_sources(self, drug):
+        # эффект -> ID источников для препарата (имя препарата — как в базе)
+        number = self.find(self.drug_names, self.n_drugs, drug)
+        if number < 0:
+            return {}
+        pairs = self.drug_pairs[self.drug_pairs_start[number]:self.drug_pairs_start[number + 1]]
+        return {self.string(self.effect_names[self.pair_effect[pair]]): self.pair_article_ids(pair)
+                for pair in pairs}
+
+    def ids_for(self, effect, drug):
+        return self.effect_sources(effect).get(drug, [])
+
+
+_opened = {}
+_opened_lock = threading.Lock()
+
+
+def load_compact(path=COMPACT_PATH, json_path=SOURCE_DB):
+    # Открытый снимок или None, если его нет, он повреждён или построен по другой версии JSON.
+    # Открытые снимки кэшируются: повторный вызов не отображает файл заново
+    signature = json_signature(json_path)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = os.path.abspath(path)
+    with _opened_lock:
+        cached = _opened.get(key)
+        if cached and cached[0] == (stat.st_size, stat.st_mtime_ns) and cached[1].json_signature == signature:
+            return cached[1]
+        try:
+            compact = CompactSources(path)
+        except (OSError, ValueError, struct.error, TypeError) as e:
+            print(f"Снимок {path} не прочитан: {e}")
+            return None
+        if compact.json_signature != signature:
+            compact.close()
+            return None
+        # Старый снимок не закрываем: его ещё могут читать другие потоки
+        _opened[key] = ((stat.st_size, stat.st_mtime_ns), compact)
+        return compact
+
+
+if __name__ == "__main__":
+    import json
+    # python compact_v1_0.py — построить снимок по существующему source_database.json
+    with open(SOURCE_DB, "r", encoding="utf-8") as f:
+        database = json.load(f)
+    print(f"Снимок сохранён в {write_compact(database)} ({os.path.getsize(COMPACT_PATH)} байт)")
@@ -0,0 +1,204 @@
+import os
+import json
+import argparse
+import threading
+from itertools import combinations
+
+import numpy as np
+
+from canon_v1_0 import CANONICAL_DIR
+from keeper_v1_0 import atomic_write
+from tables_v1_0 import list_tables, read_rows
+from sieve_v1_0 import clean_id, file_signature, get_column_field
+from conductor_v1_0 import split_snapshot_name
+
+# Совместная встречаемость побочных эффектов по таблицам canonical/ (нормализованные refined/, CSV или Parquet).
+# Корзина — набор эффектов одной статьи; статья, попавшая в несколько снимков препарата,
+# учитывается один раз (эффекты объединяются), в общей матрице — один раз для всех препаратов.
+# Для каждого препарата и для всей базы строится разреженная симметричная матрица эффект × эффект
+# (CSR: indptr/indices/counts), по которой ищутся связанные эффекты:
+#   lift = n(a, b) · N / (n(a) · n(b)),  PMI = log2(lift)
+# Разобранные таблицы хранятся в index/cooccurrence.json; при обновлении перечитываются только
+# таблицы с изменившимися размером или временем изменения, а матрицы пересчитываются только
+# для затронутых препаратов. Таблицы canonical/ только читаются: их пересобирают этап canon
+# конвейера, scavenge и organize
+INDEX_PATH = os.path.join("index", "cooccurrence.json")
+MEASURES = ("lift", "pmi", "count")
+GLOBAL_KEY = None
+
+
+def table_drug(base):
+    # "Vitamin_C_20_02_2025_table" -> "vitamin c" (нижний регистр — ключ матрицы препарата)
+    drug, _ = split_snapshot_name(base[:-len("_table")] if base.endswith("_table") else base)
+    return drug.lower() if drug else None
+
+
+def parse_table(path):
+    # ID статьи -> отсортированный список эффектов (нижний регистр, без повторов)
+    fieldnames, rows = read_rows(path, columns=["article id", "side effects"])
+    effects_field = get_column_field(fieldnames, "side effects")
+    id_field = get_column_field(fieldnames, "article id")
+    if not effects_field or not id_field:
+        return {}
+    baskets = {}
+    for row in rows:
+        article_id = clean_id(row.get(id_field) or "")
+        if not article_id:
+            continue
+        effects = {effect.strip().lower() for effect in (row.get(effects_field) or "").split(",")}
+        effects.discard("")
+        if effects:
+            baskets.setdefault(article_id, set()).update(effects)
+    return {article_id: sorted(effects) for article_id, effects in baskets.items()}
+
+
+class CooccurrenceMatrix:
+    def __init__(self, baskets):
+        # baskets — итерируемое по наборам эффектов
+        baskets = [basket for basket in baskets if basket]
+        self.vocabulary = sorted({effect for basket in baskets for effect in basket})
+        self.numbers = {effect: number for number, effect in enumerate(self.vocabulary)}
+        size = len(self.vocabulary)
+        self.baskets = len(baskets)
+
+        codes = [sorted(self.numbers[effect] for effect in basket) for basket in baskets]
+        self.occurrences = np.bincount(np.fromiter((code for basket in codes for code in basket), dtype=np.int64),
+                                       minlength=size)
+        pairs = np.fromiter((first * size + second for basket in codes for first, second in combinations(basket, 2)),
+                            dtype=np.int64)
+        keys, counts = np.unique(pairs, return_counts=True)
+        rows, cols = keys // max(size, 1), keys % max(size, 1)
+        # Матрица симметрична: храним обе половины, чтобы строка эффекта содержала всех соседей
+        rows, cols = np.concatenate([rows, cols]), np.concatenate([cols, rows])
+        counts = np.concatenate([counts, counts])
+        order = np.lexsort((cols, rows))
+        self.indices = cols[order]
+        self.counts = counts[order]
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=size), out=self.indptr[1:])
+
+    def related(self, effect, top=10, measure="lift", min_count=1):
+        # [(эффект, совместных статей, lift, PMI)] по убыванию выбранной меры
+        number = self.numbers.get(effect.strip().lower())
+        if number is None:
+            return []
+        start, end = self.indptr[number], self.indptr[number + 1]
+        neighbours = self.indices[start:end]
+        together = self.counts[start:end]
+        keep = together >= min_count
+        neighbours, together = neighbours[keep], together[keep]
+        lift = together * self.baskets / (self.occurrences[number] * self.occurrences[neighbours])
+        pmi = np.log2(lift)
+        score = {"lift": lift, "pmi": pmi, "count": together}[measure]
+        order = np.lexsort((-together, -score))[:top] if top else np.lexsort((-together, -score))
+        return [(self.vocabulary[neighbours[i]], int(together[i]), float(lift[i]), float(pmi[i])) for i in order]
+
+
+class CompanionIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.files = {}     # имя таблицы -> {"signature", "drug", "baskets"}
+        self.matrices = {}  # препарат (или GLOBAL_KEY) -> CooccurrenceMatrix
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def refresh(self):
+        # Инкрементальное обновление; возвращает множество препаратов с изменившимися данными
+        tables = list_tables(CANONICAL_DIR)
+        with self.lock:
+            changed = set()
+            for base, path in tables.items():
+                signature = file_signature(path)
+                record = self.files.get(base)
+                if record and record["signature"] == signature:
+                    continue
+                drug = table_drug(base)
+                if drug is None:
+                    continue
+                try:
+                    baskets = parse_table(path)
+                except Exception as e:
+                    print(f"Ошибка чтения файла {path}: {e}")
+                    baskets = {}
+                if record:
+                    changed.add(record["drug"])
+                self.files[base] = {"signature": signature, "drug": drug, "baskets": baskets}
+                changed.add(drug)
+            for base in set(self.files) - set(tables):
+                changed.add(self.files.pop(base)["drug"])
+            if changed:
+                for drug in changed:
+                    self.matrices.pop(drug, None)
+                self.matrices.pop(GLOBAL_KEY, None)
+                with atomic_write(self.path) as f:
+                    json.dump({"files": self.files}, f, ensure_ascii=False)
+            return changed
+
+    def drugs(self):
+        with self.lock:
+            return sorted({record["drug"] for record in self.files.values()})
+
+    def matrix(self, drug=None):
+        # Матрица препарата (без учёта регистра) или общая матрица при drug=None
+        self.refresh()
+        key = drug.strip().lower().replace("_", " ") if drug else GLOBAL_KEY
+        with self.lock:
+            if key not in self.matrices:
+                merged = {}
+                for record in self.files.values():
+                    if key is not GLOBAL_KEY and record["drug"] != key:
+                        continue
+                    for article_id, effects in record["baskets"].items():
+                        merged.setdefault(article_id, set()).update(effects)
+                self.matrices[key] = CooccurrenceMatrix(merged.values())
+            return self.matrices[key]
+
+    def related(self, effect, drug=None, top=10, measure="lift", min_count=1):
+        if measure not in MEASURES:
+            raise ValueError(f"Неизвестная мера {measure}: {', '.join(MEASURES)}")
+        return self.matrix(drug).related(effect, top, measure, min_count)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_companion_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CompanionIndex()
+        return _index
+
+
+def related_effects(effect, drug=None, top=10, measure="lift", min_count=1):
+    return get_companion_index().related(effect, drug, top, measure, min_count)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Эффекты, которые чаще встречаются вместе с заданным")
+    arg_parser.add_argument("effect", help="побочный эффект, например headache")
+    arg_parser.add_argument("--drug", help="только статьи этого препарата (по умолчанию вся база)")
+    arg_parser.add_argument("--top", type=int, default=10, help="сколько эффектов вывести (0 — все)")
+    arg_parser.add_argument("--by", choices=MEASURES, default="lift", help="мера связи")
+    arg_parser.add_argument("--min-count", type=int, default=2, help="минимум совместных статей")
+    arg_parser.add_argument("--workdir", default=".", help="папка проекта с canonical/")
+    args = arg_parser.parse_args()
+    os.chdir(args.workdir)
+
+    index = get_companion_index()
+    matrix = index.matrix(args.drug)
+    print(f"Статей: {matrix.baskets}, эффектов: {len(matrix.vocabulary)}, пар: {len(matrix.counts) // 2}")
+    results = index.related(args.effect, args.drug, args.top, args.by, args.min_count)
+    if not results:
+        print(f"Для эффекта '{args.effect}' связанных эффектов не найдено.")
+    for effect, together, lift, pmi in results:
+        print(f"{effect}: вместе {together}, lift {lift:.2f}, PMI {pmi:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from archive_v1_0 import find_snapshot, list_snapshots as list_snapshot_files, snapshot_path
+from keeper_v1_0 import atomic_write, file_lock
+from tables_v1_0 import find_table, list_tables, table_path
+
+# Папки и файлы конвейера (относительно рабочей папки проекта, как и в остальных модулях)
+DRUG_DATA_DIR = "drug_data"
+REPORTS_DIR = "reports"
+REFINED_DIR = "refined"
+CANONICAL_DIR = "canonical"
+SIDE_EFFECTS_DB = "side_effects_database.json"
+SOURCE_DB = "source_database.json"
+STATE_DIR = "index"
+STATE_FILE = os.path.join(STATE_DIR, "pipeline_state.json")
+
+# Этапы конвейера; граф зависимостей: parse → analyze → purify → canon → (scavenge, organize)
+STAGES = ["parse", "analyze", "purify", "canon", "scavenge", "organize"]
+
+SNAPSHOT_PATTERN = re.compile(r"^(.*?)_(\d{2}_\d{2}_\d{4})$")
+
+
+def split_snapshot_name(base):
+    # "vitamin_c_20_02_2025" -> ("vitamin c", "20_02_2025")
+    match = SNAPSHOT_PATTERN.match(base)
+    if not match:
+        return None, None
+    return match.group(1).replace("_", " "), match.group(2)
+
+
+class PipelineState:
+    # Хранит отпечатки файлов и входов/выходов каждой выполненной задачи
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.files = {}
+        self.tasks = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.tasks = data.get("tasks", {})
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def fingerprint(self, path):
+        # Хэш содержимого; пересчитывается только если изменились размер или время изменения
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            cached = self.files.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        with self.lock:
+            self.files[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprints(self, paths):
+        return {path: self.fingerprint(path) for path in sorted(paths)}
+
+    def is_stale(self, task_key, inputs, outputs):
+        record = self.tasks.get(task_key)
+        if not record:
+            return True
+        if record.get("inputs") != self.fingerprints(inputs):
+            return True
+        current_outputs = self.fingerprints(outputs)
+        if any(digest is None for digest in current_outputs.values()):
+            return True
+        return record.get("outputs") != current_outputs
+
+    def mark_done(self, task_key, inputs, outputs):
+        record = {"inputs": self.fingerprints(inputs), "outputs": self.fingerprints(outputs),
+                  "finished": datetime.now().strftime("%d_%m_%Y %H:%M:%S")}
+        with self.lock:
+            self.tasks[task_key] = record
+
+    def save(self):
+        # Под блокировкой сливаем своё состояние с записанным другими процессами конвейера
+        with file_lock(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                data = {}
+            with self.lock:
+                data["files"] = {**data.get("files", {}), **self.files}
+                data["tasks"] = {**data.get("tasks", {}), **self.tasks}
+            with atomic_write(self.path, lock=False) as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+
+
+# ===== Задачи этапов =====
+# Тяжёлые модули (spaCy, pandas, парсеры) импортируются только при реальном запуске этапа
+
+def run_parse(drug_name, sources):
+    from parser_v4_0 import master_parser
+    return master_parser(drug_name, sources)
+
+
+def run_analyze(base):
+    # Через тёплый процесс анализа (analyst_v1_0), если он запущен; иначе модель грузится здесь
+    from analyst_v1_0 import analyze
+    analyze(base + ".json", autostart=False)  # сжатый снимок анализатор найдёт сам
+
+
+def run_purify(base):
+    from purifier_v1_2 import process_file
+    os.makedirs(REFINED_DIR, exist_ok=True)
+    process_file(report_table(base), table_path(REFINED_DIR, base + "_table"))
+
+
+def run_canon(base):
+    from canon_v1_0 import canonize_file
+    canonize_file(base + "_table")
+
+
+# Таблицы reports/, refined/ и canonical/ могут быть в CSV или Parquet: берём существующую,
+# а если её ещё нет — путь в текущем формате (tables_v1_0)
+def report_table(base):
+    return find_table(REPORTS_DIR, base + "_table") or table_path(REPORTS_DIR, base + "_table")
+
+
+def refined_table(base):
+    return find_table(REFINED_DIR, base + "_table") or table_path(REFINED_DIR, base + "_table")
+
+
+def canonical_table(base):
+    return find_table(CANONICAL_DIR, base + "_table") or table_path(CANONICAL_DIR, base + "_table")
+
+
+def snapshot_file(base):
+    # Снимок drug_data в любом формате (.json, .json.gz, .json.zst) или путь в текущем формате
+    return find_snapshot(DRUG_DATA_DIR, base) or snapshot_path(DRUG_DATA_DIR, base)
+
+
+def run_scavenge():
+    from datascavenger_v1_0 import scavenge
+    scavenge()
+
+
+def run_organize():
+    from organizer_v1_1 import build_side_effects_database
+    build_side_effects_database()
+
+
+class Task:
+    # Узел графа: этап, функция, входы/выходы (вычисляются в момент запуска) и зависимости.
+    # strict=False — задача запускается, даже если часть зависимостей завершилась с ошибкой
+    def __init__(self, stage, key, func, inputs, outputs, deps=(), strict=True):
+        self.stage = stage
+        self.key = key
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = list(deps)
+        self.strict = strict
+
+
+def list_snapshots(drugs=None):
+    wanted = {drug.strip().lower().replace("_", " ") for drug in drugs} if drugs else None
+    result = []
+    for base in list_snapshot_files(DRUG_DATA_DIR):
+        drug, _ = split_snapshot_name(base)
+        if drug is None:
+            continue
+        if wanted is not None and drug.lower() not in wanted:
+            continue
+        result.append(base)
+    return result
+
+
+def build_graph(drugs=None, parse_sources=None, snapshots=None):
+    # Строит граф задач: по цепочке analyze → purify → canon на каждый снимок и общие scavenge/organize
+    tasks = {}
+    bases = list(snapshots) if snapshots is not None else list_snapshots(drugs)
+
+    if parse_sources and drugs:
+        today = datetime.now().strftime("%d_%m_%Y")
+        for drug in drugs:
+            base = f"{drug.replace(' ', '_')}_{today}"
+            tasks[f"parse:{base}"] = Task("parse", f"parse:{base}",
+                                          lambda drug=drug: run_parse(drug, parse_sources),
+                                          lambda: [], lambda base=base: [snapshot_file(base)])
+            if base not in bases:
+                bases.append(base)
+
+    canon_keys = []
+    for base in bases:
+        parse_key = f"parse:{base}"
+        tasks[f"analyze:{base}"] = Task("analyze", f"analyze:{base}", lambda base=base: run_analyze(base),
+                                        lambda base=base: [snapshot_file(base)],
+                                        lambda base=base: [report_table(base)],
+                                        [parse_key] if parse_key in tasks else [])
+        tasks[f"purify:{base}"] = Task("purify", f"purify:{base}", lambda base=base: run_purify(base),
+                                       lambda base=base: [report_table(base), snapshot_file(base)],
+                                       lambda base=base: [refined_table(base)],
+                                       [f"analyze:{base}"])
+        tasks[f"canon:{base}"] = Task("canon", f"canon:{base}", lambda base=base: run_canon(base),
+                                      lambda base=base: [refined_table(base)],
+                                      lambda base=base: [canonical_table(base)],
+                                      [f"purify:{base}"])
+        canon_keys.append(f"canon:{base}")
+
+    tasks["scavenge"] = Task("scavenge", "scavenge", run_scavenge,
+                             lambda: sorted(path for base, path in list_tables(CANONICAL_DIR).items()
+                                            if base.endswith("_table")),
+                             lambda: [SIDE_EFFECTS_DB], canon_keys, strict=False)
+    tasks["organize"] = Task("organize", "organize", run_organize,
+                             lambda: sorted(list_tables(CANONICAL_DIR).values()),
+                             lambda: [SOURCE_DB], canon_keys, strict=False)
+    return tasks
+
+
+def run_pipeline(drugs=None, parse_sources=None, stages=None, workers=4, force=False, dry_run=False,
+                 snapshots=None, log=print, progress=None, cancelled=None):
+    # Запускает только устаревшие этапы и только для затронутых снимков; независимые
+    # снимки обрабатываются параллельно. Возвращает словарь: этап -> список выполненных
+    # (или устаревших при dry_run) задач, а также список ошибок под ключом "failed".
+    # progress(готово, всего) вызывается после каждой задачи; если cancelled() вернёт True,
+    # новые задачи не запускаются, уже запущенные дорабатывают
+    stages = set(stages or STAGES)
+    state = PipelineState()
+    tasks = build_graph(drugs, parse_sources, snapshots)
+    summary = {stage: [] for stage in STAGES}
+    summary["failed"] = []
+    status = {}
+    cond = threading.Condition()
+
+    def execute(task):
+        if task.stage not in stages:
+            return True
+        inputs = task.inputs()
+        outputs = task.outputs()
+        if task.stage == "parse":
+            stale = force or any(state.fingerprint(path) is None for path in outputs)
+        else:
+            stale = force or state.is_stale(task.key, inputs, outputs)
+        if not stale:
+            return True
+        summary[task.stage].append(task.key)
+        if dry_run:
+            log(f"[устарело] {task.key}")
+            return True
+        log(f"[запуск] {task.key}")
+        try:
+            task.func()
+        except Exception as e:
+            log(f"[ошибка] {task.key}: {e}")
+            return False
+        if any(state.fingerprint(path) is None for path in outputs):
+            log(f"[ошибка] {task.key}: не создан {', '.join(outputs)}")
+            return False
+        state.mark_done(task.key, inputs, outputs)
+        return True
+
+    def finish(key, ok):
+        with cond:
+            status[key] = ok
+            if not ok:
+                summary["failed"].append(key)
+            cond.notify_all()
+        if progress:
+            progress(len(status), len(tasks))
+
+    def worker(task):
+        try:
+            ok = execute(task)
+        except Exception as e:
+            log(f"[ошибка] {task.key}: {e}")
+            ok = False
+        finish(task.key, ok)
+
+    # Простой планировщик: задача уходит в пул, когда все её зависимости завершились
+    pending = dict(tasks)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        with cond:
+            while pending or len(status) < len(tasks):
+                if pending and cancelled and cancelled():
+                    for key in pending:
+                        log(f"[отмена] {key}")
+                        status[key] = False
+                    pending.clear()
+                for key, task in list(pending.items()):
+                    if not all(dep in status for dep in task.deps):
+                        continue
+                    del pending[key]
+                    if not task.strict or all(status[dep] for dep in task.deps):
+                        pool.submit(worker, task)
+                    else:
+                        log(f"[пропуск] {key}: не выполнены зависимости")
+                        status[key] = False
+                        summary["failed"].append(key)
+                if pending or len(status) < len(tasks):
+                    cond.wait()
+
+    if not dry_run:
+        state.save()
+    return summary
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Конвейер BIOLock: parse → analyze → purify → canon → scavenge/organize")
+    arg_parser.add_argument("drugs", nargs="*", help="препараты (по умолчанию все снимки в drug_data)")
+    arg_parser.add_argument("--parse", metavar="SOURCES",
+                            help="сначала собрать свежие данные из источников, например pubmed,amazon")
+    arg_parser.add_argument("--stages", help="ограничить этапы, например analyze,purify")
+    arg_parser.add_argument("--workers", type=int, default=4, help="число параллельных задач")
+    arg_parser.add_argument("--force", action="store_true", help="перезапустить этапы без проверки отпечатков")
+    arg_parser.add_argument("--dry-run", action="store_true", help="только показать устаревшие этапы")
+    arg_parser.add_argument("--workdir", default=os.path.dirname(os.path.abspath(__file__)),
+                            help="папка проекта с drug_data/, reports/, refined/ и canonical/")
+    args = arg_parser.parse_args()
+
+    os.chdir(args.workdir)
+    sources = [s.strip() for s in args.parse.split(",") if s.strip()] if args.parse else None
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()] if args.stages else None
+    summary = run_pipeline(args.drugs or None, sources, stages, args.workers, args.force, args.dry_run)
+
+    for stage in STAGES:
+        print(f"{stage}: {len(summary[stage])}")
+    if summary["failed"]:
+        print("Ошибки: " + ", ".join(summary["failed"]))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
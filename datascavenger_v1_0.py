@@ -1,13 +1,17 @@
-import os
-import csv
 import json
 from datetime import datetime
 
+from canon_v1_0 import CANONICAL_DIR, canonize
+from keeper_v1_0 import atomic_write
+from shelf_v1_0 import write_side_effect_shards
+from tables_v1_0 import list_tables, normalize_column, read_rows, table_base
+
 
 def extract_info_from_filename(filename):
-    if not filename.endswith('_table.csv'):
+    base = table_base(filename)  # например "aspirin_17_02_2025_table" (CSV или Parquet)
+    if not base or not base.endswith('_table'):
         return None, None, None
-    base = filename[:-10]  # удаляем "_table.csv"
+    base = base[:-6]  # удаляем "_table"
     parts = base.split('_')
     if len(parts) < 4:
         return None, None, None
@@ -25,42 +29,39 @@ def extract_info_from_filename(filename):
 
 
 def scavenge():
-    # Путь к папке refined, где расположены CSV файлы
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    refined_folder = os.path.join(script_dir, 'refined')
+    # Таблицы с нормализованными эффектами (canonical/, CSV или Parquet) обновляются по refined/.
+    # Обе папки, как и итоговая база, берутся относительно рабочей папки проекта
+    canonize()
 
     # Структура: drug -> { side_effect: (date_str, date_obj) }
     drug_effects = {}
 
-    for filename in os.listdir(refined_folder):
-        if filename.endswith('_table.csv'):
-            drug, date_str, date_obj = extract_info_from_filename(filename)
-            if drug is None or date_obj is None:
+    for file_path in list_tables(CANONICAL_DIR).values():
+        drug, date_str, date_obj = extract_info_from_filename(file_path)
+        if drug is None or date_obj is None:
+            continue
+        # Читаем только столбец побочных эффектов (строка заголовка данными не считается)
+        fieldnames, rows = read_rows(file_path, columns=["side effects"])
+        effects_field = next((name for name in fieldnames if normalize_column(name) == "sideeffects"), None)
+        if effects_field is None:
+            continue
+        for row in rows:
+            effects_str = (row.get(effects_field) or "").strip()
+            if not effects_str:
                 continue
-            file_path = os.path.join(refined_folder, filename)
-            with open(file_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile, delimiter=';')
-                # Если CSV содержит заголовок, раскомментируйте следующую строку:
-                # next(reader, None)
-                for row in reader:
-                    if len(row) < 3:
-                        continue
-                    effects_str = row[2].strip()
-                    if not effects_str:
-                        continue
-                    # Разбиваем строку по запятой, удаляем лишние пробелы и приводим к нижнему регистру
-                    effects = [effect.strip().lower() for effect in effects_str.split(',') if effect.strip()]
-                    # Инициализируем запись для препарата, если её ещё нет
-                    if drug not in drug_effects:
-                        drug_effects[drug] = {}
-                    for effect in effects:
-                        # Если эффект уже встречался, обновляем дату, если новая раньше
-                        if effect in drug_effects[drug]:
-                            _, stored_date_obj = drug_effects[drug][effect]
-                            if date_obj < stored_date_obj:
-                                drug_effects[drug][effect] = (date_str, date_obj)
-                        else:
-                            drug_effects[drug][effect] = (date_str, date_obj)
+            # Разбиваем строку по запятой, удаляем лишние пробелы и приводим к нижнему регистру
+            effects = [effect.strip().lower() for effect in effects_str.split(',') if effect.strip()]
+            # Инициализируем запись для препарата, если её ещё нет
+            if drug not in drug_effects:
+                drug_effects[drug] = {}
+            for effect in effects:
+                # Если эффект уже встречался, обновляем дату, если новая раньше
+                if effect in drug_effects[drug]:
+                    _, stored_date_obj = drug_effects[drug][effect]
+                    if date_obj < stored_date_obj:
+                        drug_effects[drug][effect] = (date_str, date_obj)
+                else:
+                    drug_effects[drug][effect] = (date_str, date_obj)
 
     # Формируем итоговую базу данных
     output = {}
@@ -74,10 +75,13 @@ def scavenge():
             "first met": first_met_list
         }]
 
-    # Записываем итоговую базу данных в JSON-файл
-    with open("side_effects_database.json", "w", encoding="utf-8") as jsonfile:
+    # Записываем итоговую базу данных в JSON-файл (атомарно, под блокировкой)
+    with atomic_write("side_effects_database.json") as jsonfile:
         json.dump(output, jsonfile, ensure_ascii=False, indent=4)
 
+    # Шарды по препаратам для частичной загрузки (lite, вкладка "Препарат")
+    write_side_effect_shards(output)
+
 
 if __name__ == "__main__":
     scavenge()
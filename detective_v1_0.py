@@ -1,9 +1,8 @@
-import os
-import glob
-import json
 import tkinter as tk
 from tkinter import messagebox
 
+from ledger_v1_0 import find_article
+
 
 def create_source_lookup_tab(parent):
     frame = tk.Frame(parent, bg="#B8D5FD")
@@ -24,49 +23,21 @@ def create_source_lookup_tab(parent):
             messagebox.showerror("Ошибка", "Введите ID источника")
             return
 
-        found = False
-        # Перебор всех файлов .json в папке drug_data
-        for file_path in glob.glob(os.path.join("drug_data", "*.json")):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception:
-                continue  # Пропускаем файлы, которые не удалось прочитать
-
-            # Поиск источника с указанным ID
-            for source in data:
-                if source.get("article_id") == user_id:
-                    title = source.get("title", "Неизвестно")
-                    source_type = source.get("source", "Неизвестно")
-                    pub_date = source.get("pub_date", "Неизвестно")
-
-                    # Извлечение названия препарата и даты отчёта из имени файла
-                    base = os.path.basename(file_path)
-                    name_without_ext = os.path.splitext(base)[0]  # например, "ibuprofen_20_02_2025"
-                    parts = name_without_ext.split("_")
-                    if len(parts) >= 2:
-                        drug_name = parts[0]
-                        report_date = "_".join(parts[1:])
-                    else:
-                        drug_name = "Неизвестно"
-                        report_date = "Неизвестно"
+        # Поиск по постоянному индексу article_id вместо перебора всех файлов drug_data
+        source = find_article(user_id)
 
-                    # Вывод результата
-                    result_text.delete("1.0", tk.END)
-                    result_text.insert(tk.END, f"ID: {user_id}\n")
-                    result_text.insert(tk.END, f"Название источника: {title}\n")
-                    result_text.insert(tk.END, f"Тип источника: {source_type}\n")
-                    result_text.insert(tk.END, f"Дата публикации: {pub_date}\n")
-                    result_text.insert(tk.END, f"Препарат: {drug_name}\n")
-                    result_text.insert(tk.END, f"Дата отчёта: {report_date}\n")
-                    found = True
-                    break
-            if found:
-                break
-
-        if not found:
-            result_text.delete("1.0", tk.END)
+        result_text.delete("1.0", tk.END)
+        if source is None:
             result_text.insert(tk.END, "Источник с указанным ID не найден")
+            return
+
+        # Вывод результата
+        result_text.insert(tk.END, f"ID: {user_id}\n")
+        result_text.insert(tk.END, f"Название источника: {source['title']}\n")
+        result_text.insert(tk.END, f"Тип источника: {source['source']}\n")
+        result_text.insert(tk.END, f"Дата публикации: {source['pub_date']}\n")
+        result_text.insert(tk.END, f"Препарат: {source['drug']}\n")
+        result_text.insert(tk.END, f"Дата отчёта: {source['report_date']}\n")
 
     # Кнопка для запуска поиска
     search_button = tk.Button(frame, text="Поиск", width=15, bg="#C13E70", fg="#CDDBF5", command=lookup_source)
@@ -0,0 +1,208 @@
+import queue
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Исполнитель фоновых задач GUI. Каждое действие выполняется в пуле потоков, а всё, что должно
+# попасть в окно (результат, ошибка, прогресс, строки лога), передаётся через очередь, которую
+# разбирает единственный цикл after() в главном потоке Tk. Рабочие потоки не трогают виджеты.
+
+PENDING = "в очереди"
+RUNNING = "выполняется"
+DONE = "готово"
+FAILED = "ошибка"
+CANCELLED = "отменено"
+
+
+class Job:
+    def __init__(self, runner, job_id, name):
+        self.runner = runner
+        self.id = job_id
+        self.name = name
+        self.state = PENDING
+        self.progress = None  # доля 0..1 или None, если прогресс неизвестен
+        self.message = ""
+        self.future = None
+        self.on_cancel = None
+        self.cancel_event = threading.Event()
+
+    def cancelled(self):
+        # Задачи проверяют флаг между шагами; остановить уже идущий шаг нельзя
+        return self.cancel_event.is_set()
+
+    def report(self, done, total=None, message=None):
+        # Прогресс из рабочего потока: report(0.5), report(3, 10) или report(3, 10, "текст")
+        fraction = done / total if total else done
+        self.runner.post(self.runner.update_job, self, RUNNING, fraction, message)
+
+    def log(self, message):
+        self.runner.log(message)
+
+
+class JobRunner:
+    def __init__(self, widget, workers=4, interval=50, log=None):
+        self.widget = widget
+        self.interval = interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gui-job")
+        self.queue = queue.Queue()
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.log_callback = log
+        self.listeners = []
+        self.widget.after(self.interval, self.pump)
+
+    # --- вызывается из любых потоков ---
+    def post(self, callback, *args):
+        self.queue.put((callback, args))
+
+    def log(self, message):
+        if self.log_callback:
+            self.post(self.log_callback, message)
+
+    # --- вызывается только в главном потоке ---
+    def pump(self):
+        # Разбор очереди ограничен числом сообщений за тик, чтобы окно не подвисало на всплесках
+        for _ in range(500):
+            try:
+                callback, args = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                if self.log_callback:
+                    self.log_callback(f"Ошибка обновления интерфейса: {e}")
+        self.widget.after(self.interval, self.pump)
+
+    def submit(self, name, func, *args, on_done=None, on_error=None, on_cancel=None, pass_job=False):
+        # func(*args) (или func(job, *args) при pass_job=True) выполняется в пуле;
+        # on_done(result), on_error(exception) и on_cancel() вызываются в главном потоке
+        job = Job(self, next(self.ids), name)
+        job.on_cancel = on_cancel
+        self.jobs[job.id] = job
+        call_args = (job,) + args if pass_job else args
+
+        def run():
+            if job.cancelled():
+                self.post(self.update_job, job, CANCELLED, None, None)
+                return
+            self.post(self.update_job, job, RUNNING, None, None)
+            try:
+                result = func(*call_args)
+            except Exception as e:
+                self.post(self.finish_job, job, FAILED, None, e, on_error)
+                return
+            # Результат отменённой задачи в окно не попадает
+            state = CANCELLED if job.cancelled() else DONE
+            self.post(self.finish_job, job, state, result, None, on_done)
+
+        job.future = self.executor.submit(run)
+        self.notify(job)
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job or job.state in (DONE, FAILED, CANCELLED):
+            return False
+        job.cancel_event.set()
+        if job.future.cancel():
+            self.update_job(job, CANCELLED, None, None)
+        else:
+            job.message = "отмена..."
+            self.notify(job)
+        return True
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def update_job(self, job, state, progress, message):
+        if job.state in (DONE, FAILED, CANCELLED):
+            return
+        job.state = state
+        if progress is not None:
+            job.progress = progress
+        if message is not None:
+            job.message = message
+        if state == CANCELLED and job.on_cancel:
+            job.on_cancel()
+        self.notify(job)
+
+    def finish_job(self, job, state, result, error, callback):
+        job.state = state
+        if state == DONE:
+            job.progress = 1.0
+            job.message = ""
+            if callback:
+                callback(result)
+        elif state == FAILED:
+            job.message = str(error)
+            if callback:
+                callback(error)
+            elif self.log_callback:
+                self.log_callback(f"Ошибка задачи '{job.name}': {error}")
+        elif state == CANCELLED and job.on_cancel:
+            job.on_cancel()
+        self.notify(job)
+
+    def subscribe(self, listener):
+        # listener(job) вызывается в главном потоке при каждом изменении задачи
+        self.listeners.append(listener)
+
+    def notify(self, job):
+        for listener in self.listeners:
+            listener(job)
+
+    def forget_finished(self):
+        for job_id, job in list(self.jobs.items()):
+            if job.state in (DONE, FAILED, CANCELLED):
+                del self.jobs[job_id]
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_jobs_panel(parent, runner, bg=None, button_bg=None, button_fg=None):
+    # Панель задач: название, состояние, прогресс; кнопки отмены выбранной и очистки завершённых
+    import tkinter as tk
+    from tkinter import ttk
+
+    frame = tk.Frame(parent, bg=bg)
+    tree = ttk.Treeview(frame, columns=("state", "progress", "message"), height=4)
+    tree.heading("#0", text="Задача")
+    tree.heading("state", text="Состояние")
+    tree.heading("progress", text="Прогресс")
+    tree.heading("message", text="Сообщение")
+    tree.column("#0", width=220)
+    tree.column("state", width=110)
+    tree.column("progress", width=80, anchor="center")
+    tree.column("message", width=380)
+    tree.grid(row=0, column=0, rowspan=2, sticky="nsew", padx=5, pady=5)
+    frame.columnconfigure(0, weight=1)
+
+    def on_change(job):
+        progress = "" if job.progress is None else f"{job.progress:.0%}"
+        values = (job.state, progress, job.message)
+        item = str(job.id)
+        if tree.exists(item):
+            tree.item(item, values=values)
+        else:
+            tree.insert("", 0, iid=item, text=job.name, values=values)
+
+    def cancel_selected():
+        for item in tree.selection():
+            runner.cancel(int(item))
+
+    def clear_finished():
+        runner.forget_finished()
+        for item in tree.get_children():
+            if int(item) not in runner.jobs:
+                tree.delete(item)
+
+    runner.subscribe(on_change)
+    tk.Button(frame, text="Отменить", width=12, bg=button_bg, fg=button_fg, command=cancel_selected) \
+        .grid(row=0, column=1, padx=5, pady=5, sticky="n")
+    tk.Button(frame, text="Очистить", width=12, bg=button_bg, fg=button_fg, command=clear_finished) \
+        .grid(row=1, column=1, padx=5, pady=5, sticky="n")
+    return frame
@@ -1,13 +1,7 @@
 import csv
 import os
 
-
-def get_column_field(fieldnames, target):
-    target_norm = target.lower().replace(" ", "")
-    for field in fieldnames:
-        if target_norm in field.lower().replace(" ", ""):
-            return field
-    return None
+from sieve_v1_0 import get_column_field, get_ner_index
 
 
 def filter_side_effects_legacy(keyword, drug=""):
@@ -80,93 +74,21 @@ def filter_side_effects_legacy(keyword, drug=""):
 
 
 def filter_side_effects(keyword, drug=""):
-    keyword_lower = keyword.lower()
-    reports_dir = os.path.join(os.getcwd(), "reports")
-    refined_dir = os.path.join(os.getcwd(), "refined")
-
-    global_found_ids = []
-    global_side_effects = []
-
-    try:
-        reports_files = [f for f in os.listdir(reports_dir) if f.lower().endswith(".csv")]
-    except Exception as e:
-        raise Exception("Не удалось открыть папку reports: " + str(e))
-
-    if not reports_files:
-        raise Exception("CSV файлы не найдены в папке reports")
-
-    for filename in reports_files:
-        # Если задан препарат, фильтруем файлы по его названию.
-        if drug:
-            base_name = os.path.splitext(filename)[0].replace("_", " ")
-            if drug.lower() not in base_name.lower():
-                continue
-
-        filepath = os.path.join(reports_dir, filename)
-        matched_ids = set()
-        file_matches = False
-
-        try:
-            with open(filepath, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                if not reader.fieldnames:
-                    continue
-                ner_field = get_column_field(reader.fieldnames, "NER Entities")
-                id_field = get_column_field(reader.fieldnames, "Article ID")
-                if not ner_field or not id_field:
-                    continue
-                for row in reader:
-                    ner_value = row.get(ner_field, "")
-                    # Разбиваем строку на сущности по запятой
-                    entities = [entity.strip().lower() for entity in ner_value.split(",")]
-                    for ent in entities:
-                        if keyword_lower in ent:
-                            raw_source_id = row.get(id_field, "").strip()
-                            # Разделяем строку по ';' и берем первый элемент (чистый ID)
-                            source_id = raw_source_id.split(';')[0].strip().lower()
-                            if source_id:
-                                matched_ids.add(source_id)  # Теперь matched_ids содержит только ID
-                            file_matches = True
-                            break  # Если найдено совпадение, переходим к следующей строке
-        except Exception:
-            continue  # Пропускаем файлы с ошибками чтения
-
-        # Если для данного файла найдены совпадения, обрабатываем соответствующий refined-файл
-        if file_matches and matched_ids:
-            # Добавляем найденные id в общий список
-            global_found_ids.extend(list(matched_ids))
-            refined_filepath = os.path.join(refined_dir, filename)
-            if not os.path.exists(refined_filepath):
-                raise Exception(f"Файл {filename} не найден в папке refined")
-            try:
-                with open(refined_filepath, newline='', encoding='utf-8') as refined_file:
-                    reader = csv.DictReader(refined_file, delimiter=";")
-                    if not reader.fieldnames:
-                        raise Exception(f"Файл {filename} из папки refined не содержит заголовков")
-                    effects_field = get_column_field(reader.fieldnames, "Side Effects")
-                    refined_id_field = get_column_field(reader.fieldnames, "Article ID")
-                    if not effects_field or not refined_id_field:
-                        raise Exception(
-                            f"В файле {filename} отсутствуют необходимые столбцы ('Побочные эффекты' и/или 'ID источника')")
-                    for row in reader:
-                        raw_row_id = row.get(refined_id_field, "").strip()
-                        row_id = raw_row_id.split(';')[0].strip()
-
-                        if row_id in matched_ids:
-                            effect = row.get(effects_field, "").strip()
-                            if effect:
-                                global_side_effects.append(effect)
-            except Exception as e:
-                raise Exception(f"Ошибка при чтении файла {filename} из папки refined: {e}")
-
-    # Удаляем дубликаты
-    unique_found_ids = list(dict.fromkeys(global_found_ids))
-    unique_side_effects = list(dict.fromkeys(global_side_effects))
+    # Поиск по инвертированному индексу NER-сущностей (sieve_v1_0): индекс обновляется
+    # по новым и изменённым отчётам, соединение с refined/ уже выполнено при индексации
+    unique_found_ids, unique_side_effects = get_ner_index().search(keyword, drug)
     print(unique_side_effects)
 
     return unique_found_ids, unique_side_effects
 
 
+def filter_with_suggestions(keyword, drug=""):
+    # Для GUI: (ID, эффекты, варианты написания ключевого слова, если ничего не найдено)
+    unique_found_ids, unique_side_effects = filter_side_effects(keyword, drug)
+    suggestions = [] if unique_found_ids else get_ner_index().suggest(keyword)
+    return unique_found_ids, unique_side_effects, suggestions
+
+
 if __name__ == "__main__":
     try:
         ids, effects = filter_side_effects("adolescents", "imcivree")
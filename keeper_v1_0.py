@@ -0,0 +1,115 @@
+import os
+import time
+import tempfile
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+LOCK_SUFFIX = ".lock"
+REPLACE_RETRIES = 20
+REPLACE_DELAY = 0.05
+
+# POSIX-блокировки принадлежат процессу, поэтому потоки одного процесса
+# дополнительно упорядочиваются обычными блокировками
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    key = os.path.abspath(path)
+    with _thread_locks_guard:
+        if key not in _thread_locks:
+            _thread_locks[key] = threading.Lock()
+        return _thread_locks[key]
+
+
+@contextlib.contextmanager
+def file_lock(path, timeout=None, poll=0.05):
+    # Рекомендательная блокировка на отдельном файле "<path>.lock".
+    # fcntl.lockf использует POSIX-блокировки, которые работают и на сетевых ФС (NFS);
+    # на Windows используется msvcrt.locking. Блокировка действует между процессами
+    lock_path = path + LOCK_SUFFIX
+    directory = os.path.dirname(os.path.abspath(lock_path))
+    os.makedirs(directory, exist_ok=True)
+    thread_lock = _thread_lock(path)
+    if not thread_lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise TimeoutError(f"Не удалось заблокировать {path} за {timeout} с")
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        handle = open(lock_path, "a+b")
+    except BaseException:
+        thread_lock.release()
+        raise
+    try:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.lockf(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                elif msvcrt is not None:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"Не удалось заблокировать {path} за {timeout} с")
+                time.sleep(poll)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.lockf(handle.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        handle.close()
+        thread_lock.release()
+
+
+def replace_file(source, target):
+    # На Windows os.replace не срабатывает, пока файл открыт читателем, поэтому повторяем
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(REPLACE_DELAY)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w", encoding="utf-8", newline=None, lock=True):
+    # Запись во временный файл в той же папке и атомарное переименование поверх path.
+    # Читатели видят либо старую, либо новую версию файла, но никогда не обрезанную
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with file_lock(path) if lock else contextlib.nullcontext():
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            if "b" in mode:
+                handle = os.fdopen(fd, mode)
+            else:
+                handle = os.fdopen(fd, mode, encoding=encoding, newline=newline)
+            with handle:
+                yield handle
+                handle.flush()
+                os.fsync(handle.fileno())
+            try:
+                os.chmod(tmp_path, os.stat(path).st_mode)
+            except FileNotFoundError:
+                os.chmod(tmp_path, 0o644)
+            replace_file(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import threading
+
+from archive_v1_0 import load_snapshot, snapshot_base
+from conductor_v1_0 import DRUG_DATA_DIR, split_snapshot_name
+
+# Постоянный индекс article_id -> (файл снимка, название, источник, дата публикации, препарат, дата отчёта).
+# Обновляется инкрементально: перечитываются только новые и изменённые снимки, а сама проверка
+# запускается, только если изменилось время модификации папки drug_data (новые файлы появляются
+# в ней атомарным переименованием, которое его обновляет)
+INDEX_PATH = os.path.join("index", "article_index.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (file TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS articles (
+    article_id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    title TEXT,
+    source TEXT,
+    pub_date TEXT,
+    drug TEXT,
+    report_date TEXT,
+    PRIMARY KEY (article_id, file)
+);
+CREATE INDEX IF NOT EXISTS articles_by_file ON articles (file);
+"""
+
+_local = threading.local()
+
+
+def connect():
+    # Одно соединение на поток; WAL позволяет читать индекс, пока другой процесс его обновляет
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        connection = sqlite3.connect(INDEX_PATH, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+    return connection
+
+
+def report_info(file_path):
+    # Название препарата и дата отчёта из имени файла, например "ibuprofen_20_02_2025.json(.gz)"
+    name_without_ext = snapshot_base(file_path) or os.path.splitext(os.path.basename(file_path))[0]
+    drug_name, report_date = split_snapshot_name(name_without_ext)
+    if drug_name is not None:
+        return drug_name, report_date
+    parts = name_without_ext.split("_")
+    if len(parts) >= 2:
+        return parts[0], "_".join(parts[1:])
+    return "Неизвестно", "Неизвестно"
+
+
+def index_file(connection, file_path, stat):
+    connection.execute("DELETE FROM articles WHERE file = ?", (file_path,))
+    try:
+        data = load_snapshot(file_path)
+    except Exception:
+        data = []  # Файлы, которые не удалось прочитать, пропускаются, как и раньше
+    drug_name, report_date = report_info(file_path)
+    rows = [(record.get("article_id"), file_path, record.get("title", "Неизвестно"),
+             record.get("source", "Неизвестно"), record.get("pub_date", "Неизвестно"), drug_name, report_date)
+            for record in data if isinstance(record, dict) and record.get("article_id")]
+    connection.executemany("INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (file_path, stat.st_size, stat.st_mtime_ns))
+    return len(rows)
+
+
+def refresh(force=False):
+    # Инкрементальное обновление индекса; возвращает число переиндексированных файлов
+    connection = connect()
+    try:
+        dir_mtime = str(os.stat(DRUG_DATA_DIR).st_mtime_ns)
+    except FileNotFoundError:
+        return 0
+    row = connection.execute("SELECT value FROM meta WHERE key = 'dir_mtime'").fetchone()
+    if not force and row and row[0] == dir_mtime:
+        return 0
+
+    with connection:
+        known = {file: (size, mtime_ns) for file, size, mtime_ns in connection.execute("SELECT * FROM files")}
+        seen = set()
+        changed = 0
+        with os.scandir(DRUG_DATA_DIR) as entries:
+            for entry in entries:
+                if not entry.is_file() or snapshot_base(entry.name) is None:
+                    continue
+                file_path = os.path.join(DRUG_DATA_DIR, entry.name)
+                seen.add(file_path)
+                stat = entry.stat()
+                if known.get(file_path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                index_file(connection, file_path, stat)
+                changed += 1
+        for file_path in set(known) - seen:
+            connection.execute("DELETE FROM articles WHERE file = ?", (file_path,))
+            connection.execute("DELETE FROM files WHERE file = ?", (file_path,))
+            changed += 1
+        connection.execute("INSERT OR REPLACE INTO meta VALUES ('dir_mtime', ?)", (dir_mtime,))
+    return changed
+
+
+def find_article(article_id):
+    # Поиск по первичному ключу; None — источник не найден
+    refresh()
+    row = connect().execute(
+        "SELECT title, source, pub_date, drug, report_date, file FROM articles "
+        "WHERE article_id = ? ORDER BY file LIMIT 1", (article_id,)).fetchone()
+    if row is None:
+        return None
+    keys = ("title", "source", "pub_date", "drug", "report_date", "file")
+    return dict(zip(keys, row))
+
+
+if __name__ == "__main__":
+    print(f"Переиндексировано файлов: {refresh(force=True)}")
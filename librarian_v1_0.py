@@ -0,0 +1,256 @@
+import os
+import re
+import time
+import sqlite3
+import argparse
+import threading
+
+from archive_v1_0 import QUERY_FIELDS, is_manifest, load_article, read_snapshot_data, snapshot_base
+from conductor_v1_0 import DRUG_DATA_DIR, split_snapshot_name
+
+# Полнотекстовый поиск по статьям всех снимков drug_data (название, методы, результаты, таблицы).
+# Инвертированный индекс с позициями слов — таблица SQLite FTS5 в index/fulltext.sqlite, ранжирование BM25
+# (название весит больше остальных полей). Статья хранится один раз на article_id, сколько бы снимков
+# и препаратов её ни содержали; связь статья — препарат — снимок лежит в occurrences и нужна для
+# поиска в пределах препарата. Обновление инкрементальное, как в ledger_v1_0: проверка запускается,
+# только если изменилась папка drug_data, перечитываются новые и изменённые снимки, а текст читается
+# только для статей, которых ещё нет в индексе. Статьи, не оставшиеся ни в одном снимке, удаляются.
+# Запрос: слова (все должны встретиться), фразы в кавычках ("skin rash"), префиксы (hepat*)
+INDEX_PATH = os.path.join("index", "fulltext.sqlite")
+TEXT_FIELDS = ("title", "methods", "results", "figures_tables")
+# Веса полей для bm25() в порядке TEXT_FIELDS
+FIELD_WEIGHTS = (3.0, 1.0, 1.0, 0.5)
+# После добавления стольких статей сегменты индекса сливаются в один (запросы по частым словам быстрее на треть)
+OPTIMIZE_AFTER = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (file TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    article_id TEXT NOT NULL UNIQUE,
+    source TEXT,
+    pub_date TEXT
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    file TEXT NOT NULL,
+    article_id TEXT NOT NULL,
+    drug TEXT NOT NULL,
+    report_date TEXT,
+    PRIMARY KEY (file, article_id)
+);
+CREATE INDEX IF NOT EXISTS occurrences_by_article ON occurrences (article_id);
+CREATE INDEX IF NOT EXISTS occurrences_by_drug ON occurrences (drug, article_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS texts USING fts5(
+    title, methods, results, figures_tables,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+"""
+
+QUERY_TOKEN = re.compile(r'"([^"]*)"|(\w+)(\*?)')
+
+_local = threading.local()
+
+
+def connect():
+    # Одно соединение на поток; WAL позволяет искать, пока другой процесс обновляет индекс
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        connection = sqlite3.connect(INDEX_PATH, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+    return connection
+
+
+def field_text(value):
+    # Поля статьи бывают строкой, списком (таблицы, рисунки) или отсутствуют
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return " ".join(field_text(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(field_text(item) for item in value)
+    return str(value)
+
+
+def snapshot_records(connection, file_path):
+    # (article_id, статья или None) для каждой статьи снимка; текст загружается только для статей,
+    # которых нет в индексе (в манифесте без чтения хранилища articles/)
+    data = read_snapshot_data(file_path)
+    if not is_manifest(data):
+        return [(record.get("article_id"), record) for record in data if isinstance(record, dict)]
+    result = []
+    for entry in data.get("articles", []):
+        if "record" in entry:
+            result.append((entry["record"].get("article_id"), entry["record"]))
+            continue
+        article_id = entry.get("article_id")
+        if connection.execute("SELECT 1 FROM documents WHERE article_id = ?", (article_id,)).fetchone():
+            result.append((article_id, None))
+            continue
+        try:
+            record = load_article(article_id)
+        except FileNotFoundError:
+            continue
+        for key in QUERY_FIELDS:
+            record.pop(key, None)
+        result.append((article_id, record))
+    return result
+
+
+def index_file(connection, file_path, stat):
+    # Возвращает число статей, впервые добавленных в индекс
+    added = 0
+    connection.execute("DELETE FROM occurrences WHERE file = ?", (file_path,))
+    drug, report_date = split_snapshot_name(snapshot_base(file_path) or "")
+    try:
+        records = snapshot_records(connection, file_path) if drug is not None else []
+    except Exception as e:
+        print(f"Ошибка чтения файла {file_path}: {e}")
+        records = []
+    for article_id, record in records:
+        if not article_id:
+            continue  # Без ID статью нельзя отличить от повторов
+        connection.execute("INSERT OR IGNORE INTO occurrences VALUES (?, ?, ?, ?)",
+                           (file_path, article_id, drug.lower(), report_date))
+        if record is None:
+            continue
+        cursor = connection.execute("INSERT OR IGNORE INTO documents (article_id, source, pub_date) VALUES (?, ?, ?)",
+                                    (article_id, record.get("source"), record.get("pub_date")))
+        if cursor.rowcount:
+            connection.execute("INSERT INTO texts (rowid, title, methods, results, figures_tables) VALUES (?, ?, ?, ?, ?)",
+                               (cursor.lastrowid, *(field_text(record.get(name)) for name in TEXT_FIELDS)))
+            added += 1
+    connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (file_path, stat.st_size, stat.st_mtime_ns))
+    return added
+
+
+def remove_orphans(connection):
+    orphans = [row[0] for row in connection.execute(
+        "SELECT id FROM documents WHERE article_id NOT IN (SELECT article_id FROM occurrences)")]
+    connection.executemany("DELETE FROM texts WHERE rowid = ?", ((number,) for number in orphans))
+    connection.executemany("DELETE FROM documents WHERE id = ?", ((number,) for number in orphans))
+    return len(orphans)
+
+
+def refresh(force=False):
+    # Инкрементальное обновление индекса; возвращает число переиндексированных снимков
+    connection = connect()
+    try:
+        dir_mtime = str(os.stat(DRUG_DATA_DIR).st_mtime_ns)
+    except FileNotFoundError:
+        return 0
+    row = connection.execute("SELECT value FROM meta WHERE key = 'dir_mtime'").fetchone()
+    if not force and row and row[0] == dir_mtime:
+        return 0
+
+    with connection:
+        known = {file: (size, mtime_ns) for file, size, mtime_ns in connection.execute("SELECT * FROM files")}
+        seen = set()
+        changed = 0
+        added = 0
+        with os.scandir(DRUG_DATA_DIR) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if not entry.is_file() or snapshot_base(entry.name) is None:
+                    continue
+                file_path = os.path.join(DRUG_DATA_DIR, entry.name)
+                seen.add(file_path)
+                stat = entry.stat()
+                if not force and known.get(file_path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                added += index_file(connection, file_path, stat)
+                changed += 1
+        for file_path in set(known) - seen:
+            connection.execute("DELETE FROM occurrences WHERE file = ?", (file_path,))
+            connection.execute("DELETE FROM files WHERE file = ?", (file_path,))
+            changed += 1
+        if changed:
+            remove_orphans(connection)
+        if added >= OPTIMIZE_AFTER:
+            connection.execute("INSERT INTO texts (texts) VALUES ('optimize')")
+        connection.execute("INSERT OR REPLACE INTO meta VALUES ('dir_mtime', ?)", (dir_mtime,))
+    return changed
+
+
+def fts_query(text):
+    # Запрос пользователя -> запрос FTS5: каждое слово и фраза берутся в кавычки, чтобы знаки
+    # препинания и слова AND/OR/NOT не разбирались как синтаксис FTS5
+    terms = []
+    for phrase, word, prefix in QUERY_TOKEN.findall(text):
+        if phrase.strip():
+            terms.append('"' + phrase.strip() + '"')
+        elif word:
+            terms.append('"' + word + '"' + prefix)
+    return " ".join(terms)
+
+
+def search(query, drug=None, top=10):
+    # [{"article_id", "title", "source", "pub_date", "drugs", "score", "snippet"}] по убыванию BM25
+    match = fts_query(query)
+    if not match:
+        raise ValueError("Пустой поисковый запрос")
+    refresh()
+    return match_hits(match, drug, top)
+
+
+def match_hits(match, drug=None, top=10):
+    # Выполнение готового запроса FTS5 (без обновления индекса)
+    connection = connect()
+    weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS)
+    sql = (f"SELECT d.article_id, texts.title, d.source, d.pub_date, bm25(texts, {weights}) AS rank, "
+           f"snippet(texts, -1, '[', ']', '…', 12) FROM texts JOIN documents d ON d.id = texts.rowid "
+           f"WHERE texts MATCH ?")
+    params = [match]
+    if drug:
+        sql += " AND d.article_id IN (SELECT article_id FROM occurrences WHERE drug = ?)"
+        params.append(drug.strip().lower().replace("_", " "))
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(top)
+    hits = []
+    for article_id, title, source, pub_date, rank, snippet in connection.execute(sql, params):
+        drugs = [row[0] for row in connection.execute(
+            "SELECT DISTINCT drug FROM occurrences WHERE article_id = ? ORDER BY drug", (article_id,))]
+        hits.append({"article_id": article_id, "title": title, "source": source, "pub_date": pub_date,
+                     "drugs": drugs, "score": round(-rank, 3), "snippet": snippet})
+    return hits
+
+
+def stats():
+    connection = connect()
+    documents = connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    occurrences = connection.execute("SELECT COUNT(*) FROM occurrences").fetchone()[0]
+    return documents, occurrences
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Полнотекстовый поиск по статьям снимков drug_data (BM25)")
+    arg_parser.add_argument("query", nargs="?", help='запрос, например: "skin rash" hepat*')
+    arg_parser.add_argument("--drug", help="только статьи этого препарата")
+    arg_parser.add_argument("--top", type=int, default=10, help="сколько статей вывести")
+    arg_parser.add_argument("--rebuild", action="store_true", help="переиндексировать все снимки")
+    arg_parser.add_argument("--workdir", default=".", help="папка проекта с drug_data/")
+    args = arg_parser.parse_args()
+    os.chdir(args.workdir)
+
+    print(f"Переиндексировано снимков: {refresh(args.rebuild)}")
+    documents, occurrences = stats()
+    print(f"Статей: {documents}, вхождений в снимки: {occurrences}")
+    if not args.query:
+        return
+    started = time.perf_counter()
+    try:
+        hits = search(args.query, args.drug, args.top)
+    except ValueError as e:
+        print(e)
+        return
+    print(f"Найдено: {len(hits)} за {(time.perf_counter() - started) * 1000:.1f} мс")
+    for hit in hits:
+        print(f"{hit['score']:.2f}  {hit['article_id']}  {hit['title']} ({hit['source']}, {hit['pub_date']}; "
+              f"{', '.join(hit['drugs'])})")
+        print(f"    {hit['snippet']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,69 @@
-import json
+from recall_v1_0 import get_index
+from speller_v1_0 import correct_drug, suggest_drugs
 
 def main():
     drug_name = input("Введите название препарата: ").strip()
     watch(drug_name)
 
-def watch(drug_name):
-    # Загружаем базу с датами и побочными эффектами
-    try:
-        with open("side_effects_database.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print("Файл side_effects_database.json не найден.")
-        return
-
-    # Загружаем базу источников из прикрепленного файла
-    try:
-        with open("source_database.json", "r", encoding="utf-8") as f:
-            sources_data = json.load(f)
-    except FileNotFoundError:
-        print("Файл source_database.json не найден.")
-        sources_data = {}
-
-    # Ищем препарат без учёта регистра
-    matching_drug = None
-    for key in data:
-        if key.lower() == drug_name.lower():
-            matching_drug = key
-            break
-
-    if not matching_drug:
-        print(f"Препарат '{drug_name}' не найден в базе данных.")
-        return
+def load_drug(drug_name):
+    # Возвращает (название препарата, записи эффектов, эффект -> ID источников для препарата).
+    # Данные берутся из общего индекса процесса: он читает шард препарата или общие базы
+    # и перечитывает их только после изменения файлов. Если препарат не найден, название — None
+    return get_index().drug(drug_name)
 
+def format_effects(matching_drug, entries, drug_sources):
     result_lines = [f"Побочные эффекты для препарата '{matching_drug}':"]
-    entries = data[matching_drug]
-    # Приводим название препарата к нижнему регистру для поиска в источниках
-    drug_key = matching_drug.lower()
     for entry in entries:
         side_effects = entry.get("side effects", [])
         first_met_dates = entry.get("first met", [])
         # Для каждого побочного эффекта выводим дату и соответствующие ID источников (если найдены)
         for effect, date_str in zip(side_effects, first_met_dates):
             # Ищем источник по названию эффекта (без учета регистра)
-            effect_key = effect.lower()
-            source_ids = []
-            if effect_key in sources_data:
-                # Если для данного эффекта присутствует информация по препарату, берём её
-                if drug_key in sources_data[effect_key]:
-                    source_ids = sources_data[effect_key][drug_key]
+            source_ids = drug_sources.get(effect.lower(), [])
             # Если список пустой, выводим Н/Д
             source_ids_str = ", ".join(source_ids) if source_ids else "Н/Д"
             result_lines.append(f"{effect}: {date_str} (ID источников: {source_ids_str})")
+    return "\n".join(result_lines)
 
-    print("\n".join(result_lines))
+def load_drug_fuzzy(drug_name):
+    # Как load_drug, но при опечатке в названии берётся однозначно исправленное название.
+    # Возвращает (название, записи, источники, примечание) или (None, [], {}, текст с вариантами)
+    matching_drug, entries, drug_sources = load_drug(drug_name)
+    if matching_drug:
+        return matching_drug, entries, drug_sources, ""
+    corrected = correct_drug(drug_name)
+    if corrected:
+        matching_drug, entries, drug_sources = load_drug(corrected)
+        return matching_drug, entries, drug_sources, f"Препарат '{drug_name}' не найден, показан '{corrected}'."
+    message = f"Препарат '{drug_name}' не найден в базе данных."
+    suggestions = suggest_drugs(drug_name)
+    if suggestions:
+        message += " Возможно, вы имели в виду: " + ", ".join(suggestions)
+    return None, [], {}, message
 
-def watch_gui(drug_name):
-    # Функция для интеграции с GUI. Принимает название препарата и возвращает результаты в виде строки.
+def watch(drug_name):
     try:
-        with open("side_effects_database.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
+        matching_drug, entries, drug_sources, note = load_drug_fuzzy(drug_name)
     except FileNotFoundError:
-        return "Файл side_effects_database.json не найден."
+        print("Файл side_effects_database.json не найден.")
+        return
 
+    if note:
+        print(note)
+    if matching_drug:
+        print(format_effects(matching_drug, entries, drug_sources))
+
+def watch_gui(drug_name):
+    # Функция для интеграции с GUI. Принимает название препарата и возвращает результаты в виде строки.
     try:
-        with open("source_database.json", "r", encoding="utf-8") as f:
-            sources_data = json.load(f)
+        matching_drug, entries, drug_sources, note = load_drug_fuzzy(drug_name)
     except FileNotFoundError:
-        sources_data = {}
-        # return "Файл source_database.json не найден."
-
-    matching_drug = None
-    for key in data:
-        if key.lower() == drug_name.lower():
-            matching_drug = key
-            break
+        return "Файл side_effects_database.json не найден."
 
     if not matching_drug:
-        return f"Препарат '{drug_name}' не найден в базе данных."
-
-    result_lines = [f"Побочные эффекты для препарата '{matching_drug}':"]
-    drug_key = matching_drug.lower()
-    entries = data[matching_drug]
-    for entry in entries:
-        side_effects = entry.get("side effects", [])
-        first_met_dates = entry.get("first met", [])
-        for effect, date_str in zip(side_effects, first_met_dates):
-            effect_key = effect.lower()
-            source_ids = []
-            if effect_key in sources_data:
-                if drug_key in sources_data[effect_key]:
-                    source_ids = sources_data[effect_key][drug_key]
-            source_ids_str = ", ".join(source_ids) if source_ids else "Н/Д"
-            result_lines.append(f"{effect}: {date_str} (ID источников: {source_ids_str})")
+        return note
 
-    return "\n".join(result_lines)
+    return "\n".join(filter(None, [note, format_effects(matching_drug, entries, drug_sources)]))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,101 @@
+import time
+import asyncio
+import argparse
+from urllib.parse import quote
+
+from server_v1_0 import DEFAULT_HOST, DEFAULT_PORT
+
+# Нагрузочный тест сервиса server_v1_0: --clients параллельных клиентов с постоянными
+# соединениями (keep-alive) по кругу отправляют запросы из списка в течение --duration секунд.
+# В конце выводятся QPS, процентили задержки и число ответов по кодам статуса
+
+
+def build_paths(args):
+    paths = ["/health"]
+    if args.drug:
+        paths.append(f"/drug?name={quote(args.drug)}")
+    if args.date:
+        paths.append(f"/watch?date={quote(args.date)}&ru=1")
+    if args.source:
+        paths.append(f"/source?id={quote(args.source)}")
+    if args.keyword:
+        paths.append(f"/filter?keyword={quote(args.keyword)}&drug={quote(args.drug or '')}")
+    if args.drug and args.date:
+        paths.append(f"/scholar?drug={quote(args.drug)}&date={quote(args.date)}")
+    return paths
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Сервер закрыл соединение")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, paths, offset, deadline, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    index = offset
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run(args):
+    paths = build_paths(args)
+    print("Запросы: " + ", ".join(paths))
+    latencies = []
+    statuses = {}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(client(args.host, args.port, paths, i, deadline, latencies, statuses)
+                           for i in range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Клиентов: {args.clients}, запросов: {len(latencies)}, за {elapsed:.1f} с")
+    print(f"QPS: {len(latencies) / elapsed:.0f}")
+    print("Задержка, мс: p50 {:.2f}, p90 {:.2f}, p99 {:.2f}, max {:.2f}".format(
+        *(percentile(latencies, p) * 1000 for p in (0.5, 0.9, 0.99)), (latencies[-1] if latencies else 0) * 1000))
+    print("Статусы: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Нагрузочный тест сервиса запросов BIOLock")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--clients", type=int, default=50, help="число параллельных клиентов")
+    arg_parser.add_argument("--duration", type=float, default=10.0, help="длительность теста, с")
+    arg_parser.add_argument("--drug", default="", help="препарат для /drug и /scholar")
+    arg_parser.add_argument("--date", default="", help="дата dd_mm_yyyy для /watch и /scholar")
+    arg_parser.add_argument("--source", default="", help="ID статьи для /source")
+    arg_parser.add_argument("--keyword", default="", help="ключевое слово для /filter")
+    asyncio.run(run(arg_parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
 import os
-import glob
 import re
 import pandas as pd
 import json
 
+from canon_v1_0 import CANONICAL_DIR, canonize
+from keeper_v1_0 import atomic_write
+from compact_v1_0 import write_compact
+from shelf_v1_0 import write_source_shards
+from tables_v1_0 import list_tables, read_frame
+
 
 def extract_drug_name(filename):
     base = os.path.basename(filename)
     # Регулярное выражение для извлечения названия препарата и даты в формате ДД_ММ_ГГГГ
-    pattern = r"^(.*?)_\d{2}_\d{2}_\d{4}_table\.csv$"
+    pattern = r"^(.*?)_\d{2}_\d{2}_\d{4}_table\.(?:csv|parquet)$"
     match = re.match(pattern, base)
     if match:
         # Замена подчеркиваний на пробелы в названии препарата
@@ -20,20 +25,23 @@ def extract_drug_name(filename):
 
 def build_side_effects_database():
     side_effects_db = {}
-    csv_files = glob.glob(os.path.join("refined", "*.csv"))
+    # Эффекты берутся из таблиц canonical/ (нормализованные refined/, см. canon_v1_0)
+    canonize()
+    table_files = list(list_tables(CANONICAL_DIR).values())
 
-    if not csv_files:
-        print("В папке refined/ не найдено CSV файлов.")
+    if not table_files:
+        print("В папке canonical/ не найдено таблиц (CSV или Parquet).")
         return side_effects_db
 
-    for file in csv_files:
+    for file in table_files:
         drug_name = extract_drug_name(file)
         if not drug_name:
             print(f"Не удалось извлечь название препарата из файла {file}")
             continue
 
         try:
-            df = pd.read_csv(file, delimiter=';')
+            # Нужны только два столбца: в Parquet остальные не читаются с диска
+            df = read_frame(file, columns=["side effects", "article id"])
         except Exception as e:
             print(f"Ошибка чтения файла {file}: {e}")
             continue
@@ -68,9 +76,11 @@ def build_side_effects_database():
     # Сохраняем базу данных в JSON-файл
     output_file = "source_database.json"
     try:
-        with open(output_file, "w", encoding="utf-8") as f:
+        with atomic_write(output_file) as f:
             json.dump(side_effects_db, f, ensure_ascii=False, indent=4)
         print(f"База данных побочных эффектов сохранена в {output_file}")
+        write_source_shards(side_effects_db)
+        write_compact(side_effects_db, json_path=output_file)
     except Exception as e:
         print(f"Ошибка сохранения базы данных: {e}")
 
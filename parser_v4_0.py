@@ -1,7 +1,7 @@
 import os
-import json
 from datetime import datetime
 
+from archive_v1_0 import snapshot_path, write_snapshot
 from pubmed_parser_v1_0 import parse_pubmed
 from amazon_parser_v1_0 import parse_amazon
 from drugscom_parser_v1_0 import parse_drugscom
@@ -24,13 +24,13 @@ def master_parser(drug_name, sources):
 
     query_date = datetime.now().strftime("%d_%m_%Y")
     safe_drug_name = drug_name.replace(" ", "_")
-    filename = f"{safe_drug_name}_{query_date}.json"
     output_dir = "drug_data"
     os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, filename)
+    # .json или .json.gz/.json.zst в зависимости от BIOLOCK_SNAPSHOT_COMPRESSION
+    output_path = snapshot_path(output_dir, f"{safe_drug_name}_{query_date}")
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    # Статьи уходят в общее хранилище articles/, в drug_data остаётся манифест снимка
+    write_snapshot(output_path, results, drug=drug_name, sources=list(sources), query_date=query_date)
 
     return output_path
 
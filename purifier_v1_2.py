@@ -1,6 +1,7 @@
 import os
-import csv
-import json
+
+from archive_v1_0 import find_snapshot, load_snapshot
+from tables_v1_0 import REFINED_LIST_COLUMNS, list_tables, read_rows, table_path, write_rows
 
 # Создаем список ключевых слов для идентификации побочных эффектов
 SIDE_EFFECT_KEYWORDS = {
@@ -67,84 +68,83 @@ def process_file(input_path, output_path):
     base, _ = os.path.splitext(csv_filename)  # Например, "aspirin_17_02_2025_table"
     json_base = base.replace("_table", "")      # Получим "aspirin_17_02_2025"
     json_filename = json_base + ".json"           # Итог: "aspirin_17_02_2025.json"
-    json_path = os.path.join("drug_data", json_filename)
+    # Снимок может лежать и сжатым: aspirin_17_02_2025.json.gz / .json.zst
+    json_path = find_snapshot("drug_data", json_base) or os.path.join("drug_data", json_filename)
 
     # Загружаем данные из JSON-файла: создаем словарь article_id -> pub_date
     try:
-        with open(json_path, 'r', encoding='utf-8') as json_file:
-            json_data = json.load(json_file)
+        json_data = load_snapshot(json_path)
         article_pub = {entry["article_id"]: entry.get("pub_date", "") for entry in json_data}
     except Exception as e:
         print(f"Ошибка при загрузке JSON-файла {json_path}: {e}")
         article_pub = {}
 
-    # Открываем CSV-файл для чтения и создаем новый CSV для записи с нужными столбцами
-    with open(input_path, 'r', encoding='utf-8') as infile, \
-         open(output_path, 'w', newline='', encoding='utf-8') as outfile:
-
-        reader = csv.DictReader(infile, delimiter=';')
-        fieldnames = ["last mention", "article id", "side effects"]
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames, delimiter=';')
-        writer.writeheader()
-
-        for row in reader:
-            # Гибкое извлечение article_id
-            article_id = ""
-            for key in row.keys():
-                key_normalized = key.strip().lower().replace(' ', '_')
-                if key_normalized == 'article_id':
-                    article_id = row[key].strip()
-                    break
-
-            # Если не нашли, проверяем другие варианты
-            if not article_id:
-                article_id = row.get('article id', '').strip() or row.get('article_id', '').strip()
-
-            print(f"Extracted Article ID: '{article_id}'")
-
-            # Обрабатываем существующие побочные эффекты (удаляем дубликаты без учета регистра)
-            existing = row.get('Side Effects', '')
-            existing_effects = [s.strip() for s in existing.split(',') if s.strip()]
-            unique_effects = []
-            seen_lower = set()
-            for effect in existing_effects:
-                key = effect.lower()
+    # Читаем таблицу отчёта (CSV или Parquet) и собираем новую таблицу с нужными столбцами;
+    # запись атомарная: параллельные читатели refined/ не увидят недописанный файл
+    _, report_rows = read_rows(input_path)
+    fieldnames = ["last mention", "article id", "side effects"]
+    out_rows = []
+
+    for row in report_rows:
+        # Гибкое извлечение article_id
+        article_id = ""
+        for key in row.keys():
+            key_normalized = key.strip().lower().replace(' ', '_')
+            if key_normalized == 'article_id':
+                article_id = row[key].strip()
+                break
+
+        # Если не нашли, проверяем другие варианты
+        if not article_id:
+            article_id = row.get('article id', '').strip() or row.get('article_id', '').strip()
+
+        print(f"Extracted Article ID: '{article_id}'")
+
+        # Обрабатываем существующие побочные эффекты (удаляем дубликаты без учета регистра)
+        existing = row.get('Side Effects', '')
+        existing_effects = [s.strip() for s in existing.split(',') if s.strip()]
+        unique_effects = []
+        seen_lower = set()
+        for effect in existing_effects:
+            key = effect.lower()
+            # Пропускаем термин, если он равен "побочные эффекты"
+            if key == "побочные эффекты":
+                continue
+            if key not in seen_lower:
+                unique_effects.append(effect)
+                seen_lower.add(key)
+
+        # Обрабатываем NER-сущности и добавляем, если они относятся к побочным эффектам
+        ner_entities = row.get('NER Entities', '')
+        if ner_entities:
+            ner_list = [s.strip() for s in ner_entities.split(',') if s.strip()]
+            for entity in ner_list:
                 # Пропускаем термин, если он равен "побочные эффекты"
-                if key == "побочные эффекты":
+                if entity.lower() == "побочные эффекты":
                     continue
-                if key not in seen_lower:
-                    unique_effects.append(effect)
-                    seen_lower.add(key)
-
-            # Обрабатываем NER-сущности и добавляем, если они относятся к побочным эффектам
-            ner_entities = row.get('NER Entities', '')
-            if ner_entities:
-                ner_list = [s.strip() for s in ner_entities.split(',') if s.strip()]
-                for entity in ner_list:
-                    # Пропускаем термин, если он равен "побочные эффекты"
-                    if entity.lower() == "побочные эффекты":
-                        continue
-                    if is_side_effect(entity):
-                        key = entity.lower()
-                        if key not in seen_lower:
-                            unique_effects.append(entity)
-                            seen_lower.add(key)
-
-            # Если побочных эффектов не найдено, ставим "nothing"
-            if unique_effects:
-                side_effects_str = ', '.join(e.lower() for e in unique_effects)
-            else:
-                side_effects_str = "nothing"
-
-            # Получаем дату публикации статьи из JSON (из поля pub_date)
-            last_mention = article_pub.get(article_id, "")
-
-            out_row = {
-                "last mention": last_mention,
-                "article id": article_id,
-                "side effects": side_effects_str
-            }
-            writer.writerow(out_row)
+                if is_side_effect(entity):
+                    key = entity.lower()
+                    if key not in seen_lower:
+                        unique_effects.append(entity)
+                        seen_lower.add(key)
+
+        # Если побочных эффектов не найдено, ставим "nothing"
+        if unique_effects:
+            side_effects_str = ', '.join(e.lower() for e in unique_effects)
+        else:
+            side_effects_str = "nothing"
+
+        # Получаем дату публикации статьи из JSON (из поля pub_date)
+        last_mention = article_pub.get(article_id, "")
+
+        out_row = {
+            "last mention": last_mention,
+            "article id": article_id,
+            "side effects": side_effects_str
+        }
+        out_rows.append(out_row)
+
+    write_rows(output_path, fieldnames, out_rows, REFINED_LIST_COLUMNS)
 
 
 def purify():
@@ -152,13 +152,11 @@ def purify():
     if not os.path.exists("refined"):
         os.makedirs("refined")
 
-    # Обрабатываем каждый CSV-файл из папки reports
-    for filename in os.listdir("reports"):
-        if filename.endswith(".csv"):
-            input_file = os.path.join("reports", filename)
-            output_file = os.path.join("refined", filename)
-            process_file(input_file, output_file)
-            print(f'Processed: {filename}')
+    # Обрабатываем каждую таблицу (CSV или Parquet) из папки reports
+    for base, input_file in list_tables("reports").items():
+        output_file = table_path("refined", base)
+        process_file(input_file, output_file)
+        print(f'Processed: {os.path.basename(input_file)}')
 
 
 if __name__ == '__main__':
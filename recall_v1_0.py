@@ -0,0 +1,131 @@
+import os
+import json
+import threading
+
+from shelf_v1_0 import MANIFEST_PATH, load_drug_shard
+from compact_v1_0 import COMPACT_PATH, load_compact
+
+SIDE_EFFECTS_DB = "side_effects_database.json"
+SOURCE_DB = "source_database.json"
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class QueryIndex:
+    # Индекс запросов, живущий в памяти процесса. Базы читаются один раз и перечитываются,
+    # только когда у файлов меняются размер или время изменения (проверка — один stat на файл)
+    def __init__(self, side_effects_path=SIDE_EFFECTS_DB, source_path=SOURCE_DB):
+        self.side_effects_path = side_effects_path
+        self.source_path = source_path
+        self.lock = threading.RLock()
+        self.signature = None
+        self.reset()
+
+    def reset(self):
+        self.data = None            # side_effects_database.json целиком
+        self.drug_names = None      # препарат (нижний регистр) -> ключ в базе
+        self.sources_by_drug = None  # препарат (нижний регистр) -> эффект -> ID источников
+        self.compact = None         # двоичный снимок source_database.json вместо sources_by_drug
+        self.drug_cache = {}        # результаты запросов по препарату
+        self.derived = {}           # производные индексы других модулей, сбрасываются вместе с базой
+
+    def refresh(self):
+        signature = (file_signature(self.side_effects_path), file_signature(self.source_path),
+                     file_signature(MANIFEST_PATH), file_signature(COMPACT_PATH))
+        with self.lock:
+            if signature != self.signature:
+                self.reset()
+                self.signature = signature
+
+    def load_full(self):
+        # Полная загрузка обеих баз; вызывается под self.lock
+        if self.data is not None:
+            return
+        with open(self.side_effects_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Актуальный двоичный снимок заменяет разбор source_database.json
+        compact = load_compact(json_path=self.source_path)
+        sources_data = {}
+        if compact is None:
+            try:
+                with open(self.source_path, "r", encoding="utf-8") as f:
+                    sources_data = json.load(f)
+            except FileNotFoundError:
+                pass
+
+        drug_names = {}
+        for key in data:
+            # Как и при линейном поиске, при совпадении без учёта регистра побеждает первый ключ
+            drug_names.setdefault(key.lower(), key)
+        sources_by_drug = {}
+        for effect, drugs in sources_data.items():
+            for drug, ids in drugs.items():
+                sources_by_drug.setdefault(drug, {})[effect] = ids
+
+        self.data = data
+        self.drug_names = drug_names
+        self.sources_by_drug = sources_by_drug
+        self.compact = compact
+
+    def drug_sources(self, drug):
+        # эффект -> ID источников для препарата; вызывается под self.lock после load_full
+        if self.compact is not None:
+            return self.compact.drug_sources(drug)
+        return self.sources_by_drug.get(drug, {})
+
+    def side_effects(self):
+        # side_effects_database.json целиком (для запросов по всем препаратам)
+        self.refresh()
+        with self.lock:
+            self.load_full()
+            return self.data
+
+    def drug(self, drug_name):
+        # (название препарата, записи эффектов, эффект -> ID источников); название None — не найден.
+        # Если общая база ещё не загружена, читается только шард препарата
+        self.refresh()
+        key = drug_name.strip().lower()
+        with self.lock:
+            if key in self.drug_cache:
+                return self.drug_cache[key]
+            result = None
+            if self.data is None:
+                result = load_drug_shard(drug_name)
+            if result is None:
+                self.load_full()
+                matching_drug = self.drug_names.get(key)
+                if matching_drug is None:
+                    result = (None, [], {})
+                else:
+                    result = (matching_drug, self.data[matching_drug],
+                              self.drug_sources(matching_drug.lower()))
+            self.drug_cache[key] = result
+            return result
+
+    def cached(self, name, build):
+        # Производный индекс, построенный build(data) по полной базе, с той же инвалидацией по mtime
+        self.refresh()
+        with self.lock:
+            if name not in self.derived:
+                self.load_full()
+                self.derived[name] = build(self.data)
+            return self.derived[name]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    # Общий на процесс индекс: GUI, скрипты и сервисы используют один экземпляр
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = QueryIndex()
+        return _index
@@ -1,6 +1,12 @@
 import os
+import threading
 import pandas as pd
-from collections import Counter
+
+from tables_v1_0 import find_table, read_frame, table_path
+
+# Кэш результатов по файлу refined: путь -> ((размер, время изменения), строки подсчёта)
+_results_cache = {}
+_results_cache_lock = threading.Lock()
 
 
 def complete_date(date_str):
@@ -11,52 +17,96 @@ def complete_date(date_str):
     return date_str
 
 
-def get_side_effects_info(df):
+def complete_dates(dates):
+    # Векторный вариант complete_date для целого столбца
+    lengths = dates.str.len()
+    return dates.mask(lengths == 4, dates + "-01-01").mask(lengths == 7, dates + "-01")
+
+
+def side_effect_counts(df):
+    # Число упоминаний каждого эффекта по (дата, source_id): список словарей
+    # {"date", "effect", "count", "source_id"}; ValueError, если нужных столбцов нет
     # Приводим имена столбцов к единообразному виду
     df.rename(columns=lambda x: x.strip().replace(" ", "_").lower(), inplace=True)
 
-    # Обработка даты: дополняем и преобразуем в datetime
-    if 'last_mention' in df.columns:
-        df['last_mention'] = df['last_mention'].astype(str).apply(complete_date)
-        df['last_mention'] = pd.to_datetime(df['last_mention'], errors='coerce')
-    else:
-        return "Ошибка: нет столбца 'last_mention'"
-
-    # Разбиваем побочные эффекты по запятым
-    if 'side_effects' in df.columns:
-        df['side_effects'] = df['side_effects'].astype(str).str.split(',')
-    else:
-        return "Ошибка: нет столбца 'side_effects'"
+    if 'last_mention' not in df.columns:
+        raise ValueError("Ошибка: нет столбца 'last_mention'")
+    if 'side_effects' not in df.columns:
+        raise ValueError("Ошибка: нет столбца 'side_effects'")
 
     # Если столбца source_id нет, создаём его
     if 'source_id' not in df.columns:
         df['source_id'] = "N/A"
 
-    results = []
-    # Группируем по дате и source_id
-    for (date, source), group in df.groupby(['last_mention', 'source_id']):
-        # Получаем список всех побочных эффектов с удалением лишних пробелов
-        effects = [effect.strip() for sublist in group['side_effects'] for effect in sublist if effect.strip()]
-        effect_counts = Counter(effects)
-        date_str = date.strftime('%Y-%m-%d') if pd.notnull(date) else ''
-        for effect, count in effect_counts.items():
-            results.append(f"{date_str} - {effect} - {count} - {source}")
+    # Сначала сворачиваем одинаковые строки (дата, source_id, строка эффектов) с подсчётом,
+    # чтобы дополнять даты и разбивать эффекты только для уникальных значений
+    df['last_mention'] = df['last_mention'].astype(str)
+    df['side_effects'] = df['side_effects'].astype(str)
+    rows = df.groupby(['last_mention', 'source_id', 'side_effects'], sort=False).size().reset_index(name='count')
 
-    return "\n".join(results)
+    # Обработка даты: дополняем и преобразуем в datetime
+    rows['last_mention'] = pd.to_datetime(complete_dates(rows['last_mention']), errors='coerce')
 
+    # Разбиваем побочные эффекты по запятым: одна строка на упоминание эффекта
+    rows['side_effects'] = rows['side_effects'].str.split(',')
+    effects = rows.explode('side_effects')
+    effects['side_effects'] = effects['side_effects'].str.strip()
+    effects = effects[effects['side_effects'] != ""]
 
-def get_side_effects_info_from_file(drug_name, request_date):
-    filename = os.path.join("refined", f"{drug_name}_{request_date}_table.csv")
-    if not os.path.isfile(filename):
-        return f"Ошибка: файл '{filename}' не найден."
+    # Подсчёт по (дата, source_id, эффект) без цикла по группам; группы идут по возрастанию
+    # даты и source_id, эффекты внутри группы — в порядке первого появления
+    counts = effects.groupby(['last_mention', 'source_id', 'side_effects'], sort=False)['count'].sum().reset_index()
+    counts = counts.sort_values(['last_mention', 'source_id'], kind='stable')
+
+    date_strs = counts['last_mention'].dt.strftime('%Y-%m-%d').fillna("")
+    return [{"date": date_str, "effect": effect, "count": int(count), "source_id": str(source_id)}
+            for date_str, effect, count, source_id in zip(date_strs, counts['side_effects'], counts['count'],
+                                                           counts['source_id'])]
+
+
+def format_side_effects(rows):
+    # Строки вида "дата - эффект - число упоминаний - source_id"
+    return "\n".join(f"{row['date']} - {row['effect']} - {row['count']} - {row['source_id']}" for row in rows)
 
+
+def get_side_effects_info(df):
     try:
-        # Читаем CSV с разделителем ';'
-        df = pd.read_csv(filename, delimiter=';')
+        return format_side_effects(side_effect_counts(df))
+    except ValueError as e:
+        return str(e)
+
+
+def side_effect_counts_from_file(drug_name, request_date):
+    # side_effect_counts для таблицы refined/<препарат>_<дата>_table; FileNotFoundError или ValueError
+    # с текстом ошибки для пользователя
+    filename = find_table("refined", f"{drug_name}_{request_date}_table")
+    if filename is None:
+        raise FileNotFoundError(
+            f"Ошибка: файл '{table_path('refined', f'{drug_name}_{request_date}_table')}' не найден.")
+
+    # Повторный запрос по неизменённому файлу отдаётся из кэша
+    stat = os.stat(filename)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _results_cache_lock:
+        cached = _results_cache.get(filename)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    try:
+        # Читаем таблицу (CSV с разделителем ';' или Parquet) только с нужными столбцами
+        df = read_frame(filename, columns=["last mention", "source id", "side effects"])
     except Exception as e:
-        return f"Ошибка при чтении файла: {str(e)}"
+        raise ValueError(f"Ошибка при чтении файла: {str(e)}")
+
+    rows = side_effect_counts(df)
+    with _results_cache_lock:
+        _results_cache[filename] = (signature, rows)
+    return rows
+
 
-    # Получаем строку с результатами
-    result_string = get_side_effects_info(df)
-    return result_string
+def get_side_effects_info_from_file(drug_name, request_date):
+    try:
+        return format_side_effects(side_effect_counts_from_file(drug_name, request_date))
+    except (FileNotFoundError, ValueError) as e:
+        return str(e)
 
@@ -0,0 +1,183 @@
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import argparse
+from datetime import datetime
+
+from archive_v1_0 import snapshot_base
+from conductor_v1_0 import DRUG_DATA_DIR, run_pipeline, split_snapshot_name
+from ledger_v1_0 import refresh as refresh_article_index
+
+# Флаги inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%d_%m_%Y %H:%M:%S')}] {message}", flush=True)
+
+
+def is_snapshot(filename):
+    base = snapshot_base(filename)
+    if base is None:
+        return False
+    drug, _ = split_snapshot_name(base)
+    return drug is not None
+
+
+class InotifyWatcher:
+    # Наблюдение через inotify: файл считается готовым после закрытия записи или переименования в папку
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    # Запасной вариант: сравнение размеров и времени изменения файлов между опросами.
+    # Файл отдаётся только когда его размер и mtime не менялись в течение одного опроса
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self.known = self.scan()
+        self.changing = {}
+
+    def scan(self):
+        result = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        result[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return result
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval) if timeout is not None else self.interval)
+        current = self.scan()
+        names = []
+        for name, signature in current.items():
+            if self.known.get(name) == signature:
+                continue
+            if self.changing.get(name) == signature:
+                names.append(name)
+                self.known[name] = signature
+                del self.changing[name]
+            else:
+                self.changing[name] = signature
+        return names
+
+    def close(self):
+        pass
+
+
+def create_watcher(directory, polling=False, interval=1.0):
+    if not polling:
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError, TypeError) as e:
+            log(f"inotify недоступен ({e}), используется опрос папки")
+    return PollingWatcher(directory, interval)
+
+
+def process_batch(bases, workers):
+    log(f"Новые снимки: {', '.join(sorted(bases))}")
+    started = time.monotonic()
+    summary = run_pipeline(snapshots=sorted(bases), workers=workers, log=log)
+    # Новые статьи сразу попадают в индекс поиска источника по ID
+    refresh_article_index()
+    elapsed = time.monotonic() - started
+    if summary["failed"]:
+        log(f"Обработка завершена за {elapsed:.1f} с с ошибками: {', '.join(summary['failed'])}")
+    else:
+        log(f"Обработка завершена за {elapsed:.1f} с")
+
+
+def serve(debounce=2.0, workers=4, polling=False, interval=1.0, catch_up=True):
+    os.makedirs(DRUG_DATA_DIR, exist_ok=True)
+    watcher = create_watcher(DRUG_DATA_DIR, polling, interval)
+    log(f"Наблюдение за папкой {DRUG_DATA_DIR} ({type(watcher).__name__})")
+
+    if catch_up:
+        # Догоняем снимки, появившиеся, пока демон был остановлен
+        summary = run_pipeline(workers=workers, log=log)
+        if summary["failed"]:
+            log("Начальная обработка завершена с ошибками: " + ", ".join(summary["failed"]))
+
+    pending = set()
+    last_event = None
+    try:
+        while True:
+            # Пока копится пачка, ждём не дольше окна подавления дребезга
+            timeout = debounce if pending else None
+            names = [name for name in watcher.wait(timeout) if is_snapshot(name)]
+            now = time.monotonic()
+            if names:
+                pending.update(snapshot_base(name) for name in names)
+                last_event = now
+                continue
+            if pending and now - last_event >= debounce:
+                batch, pending = pending, set()
+                try:
+                    process_batch(batch, workers)
+                except Exception as e:
+                    log(f"Ошибка обработки: {e}")
+    except KeyboardInterrupt:
+        log("Остановка демона")
+    finally:
+        watcher.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Демон BIOLock: автоматическая обработка новых снимков drug_data")
+    arg_parser.add_argument("--debounce", type=float, default=2.0,
+                            help="секунд тишины перед обработкой пачки файлов")
+    arg_parser.add_argument("--workers", type=int, default=4, help="размер пула обработчиков")
+    arg_parser.add_argument("--poll", action="store_true", help="опрашивать папку вместо inotify")
+    arg_parser.add_argument("--interval", type=float, default=1.0, help="период опроса, с")
+    arg_parser.add_argument("--no-catch-up", action="store_true", help="не обрабатывать уже имеющиеся снимки при старте")
+    arg_parser.add_argument("--workdir", default=os.path.dirname(os.path.abspath(__file__)),
+                            help="папка проекта с drug_data/, reports/ и refined/")
+    args = arg_parser.parse_args()
+
+    os.chdir(args.workdir)
+    serve(args.debounce, args.workers, args.poll, args.interval, not args.no_catch_up)
+
+
+if __name__ == "__main__":
+    main()
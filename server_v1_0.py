@@ -0,0 +1,321 @@
+import os
+import json
+import asyncio
+import argparse
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+# Локальный HTTP/JSON сервис запросов BIOLock. Все данные держатся в тёплых индексах процесса
+# (recall_v1_0, watcher_v2_0, ledger_v1_0, sieve_v1_0, кэш scholar_v1_1), которые перечитывают
+# файлы только после их изменения. Эндпоинты (GET, параметры в строке запроса):
+#   /drug?name=...                  — побочные эффекты препарата (как вкладка "Препарат")
+#   /watch?date=dd_mm_yyyy[&ru=1]   — эффекты, впервые обнаруженные не ранее даты
+#   /source?id=...                  — сведения об источнике по ID статьи
+#   /filter?keyword=...[&drug=...]  — фильтрация по контексту NER
+#   /scholar?drug=...&date=...      — сводка по чистовой таблице refined/
+#   /related?effect=...[&drug=...&by=lift|pmi|count&top=10&min_count=1] — эффекты, встречающиеся вместе
+#   /trend?[drug=...&effect=...&by=snapshot|publication&period=week|month|year&from=...&to=...&spikes=1]
+#                                   — динамика упоминаний или всплески
+#   /search?q=...[&drug=...&top=10] — полнотекстовый поиск по статьям снимков (BM25)
+#   /similar?id=...[&drug=...&top=10] — близкие дубликаты и похожие статьи
+#   /health                         — проверка работы сервиса
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_HEADER_LINES = 100
+MAX_BODY_SIZE = 64 * 1024  # Тело запроса не используется: большее не читается
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def require(params, name):
+    value = params.get(name, "").strip()
+    if not value:
+        raise QueryError(400, f"Не указан параметр '{name}'")
+    return value
+
+
+def query_drug(params):
+    from recall_v1_0 import get_index
+    drug_name = require(params, "name")
+    try:
+        matching_drug, entries, drug_sources = get_index().drug(drug_name)
+    except FileNotFoundError:
+        raise QueryError(404, "Файл side_effects_database.json не найден.")
+    if not matching_drug:
+        from speller_v1_0 import suggest_drugs
+        suggestions = suggest_drugs(drug_name)
+        hint = " Возможно, вы имели в виду: " + ", ".join(suggestions) if suggestions else ""
+        raise QueryError(404, f"Препарат '{drug_name}' не найден в базе данных." + hint)
+    effects = []
+    for entry in entries:
+        for effect, date_str in zip(entry.get("side effects", []), entry.get("first met", [])):
+            effects.append({"effect": effect, "first_met": date_str,
+                            "sources": drug_sources.get(effect.lower(), [])})
+    return {"drug": matching_drug, "effects": effects}
+
+
+def query_watch(params):
+    from watcher_v2_0 import effects_since
+    user_date_str = require(params, "date")
+    try:
+        user_date = datetime.strptime(user_date_str, "%d_%m_%Y")
+    except ValueError:
+        raise QueryError(400, "Неверный формат даты. Пожалуйста, введите дату в формате dd_mm_yyyy.")
+    try:
+        effects = effects_since(user_date, translated=params.get("ru") == "1")
+    except FileNotFoundError:
+        raise QueryError(404, "Файл side_effects_database.json не найден.")
+    return {"date": user_date_str, "drugs": effects}
+
+
+def query_source(params):
+    from ledger_v1_0 import find_article
+    article_id = require(params, "id")
+    source = find_article(article_id)
+    if source is None:
+        raise QueryError(404, "Источник с указанным ID не найден")
+    return dict(source, id=article_id)
+
+
+def query_filter(params):
+    from sieve_v1_0 import get_ner_index
+    keyword = require(params, "keyword")
+    drug = params.get("drug", "").strip()
+    try:
+        ids, effects = get_ner_index().search(keyword, drug)
+    except Exception as e:
+        raise QueryError(404, str(e))
+    return {"keyword": keyword, "drug": drug, "ids": ids, "side_effects": effects}
+
+
+def query_scholar(params):
+    from scholar_v1_1 import side_effect_counts_from_file
+    drug_name = require(params, "drug")
+    request_date = require(params, "date")
+    try:
+        rows = side_effect_counts_from_file(drug_name, request_date)
+    except (FileNotFoundError, ValueError) as e:
+        raise QueryError(404, str(e))
+    return {"drug": drug_name, "date": request_date, "rows": rows}
+
+
+def query_related(params):
+    from companion_v1_0 import MEASURES, related_effects
+    effect = require(params, "effect")
+    drug = params.get("drug", "").strip() or None
+    measure = params.get("by", "lift")
+    if measure not in MEASURES:
+        raise QueryError(400, f"Параметр 'by' должен быть одним из: {', '.join(MEASURES)}")
+    try:
+        top = int(params.get("top", "10"))
+        min_count = int(params.get("min_count", "1"))
+    except ValueError:
+        raise QueryError(400, "Параметры 'top' и 'min_count' должны быть числами")
+    rows = [{"effect": name, "count": together, "lift": lift, "pmi": pmi}
+            for name, together, lift, pmi in related_effects(effect, drug, top, measure, min_count)]
+    return {"effect": effect, "drug": drug, "by": measure, "related": rows}
+
+
+def query_trend(params):
+    import chronicle_v1_0 as chronicle
+    drug = params.get("drug", "").strip() or None
+    effect = params.get("effect", "").strip() or None
+    by = params.get("by", "snapshot")
+    period = params.get("period", "month")
+    start = params.get("from", "").strip() or None
+    end = params.get("to", "").strip() or None
+    try:
+        chronicle.check_options(by, period)
+        if params.get("spikes") == "1":
+            return {"drug": drug, "effect": effect, "by": by, "period": period,
+                    "spikes": chronicle.spikes(drug, effect, by, period, start=start, end=end)}
+        rows = [{"period": key, "count": value}
+                for key, value in chronicle.series(drug, effect, by, period, start, end)]
+    except ValueError as e:
+        raise QueryError(400, str(e))
+    return {"drug": drug, "effect": effect, "by": by, "period": period, "series": rows}
+
+
+def query_search(params):
+    from librarian_v1_0 import search
+    query = require(params, "q")
+    drug = params.get("drug", "").strip() or None
+    try:
+        top = int(params.get("top", "10"))
+    except ValueError:
+        raise QueryError(400, "Параметр 'top' должен быть числом")
+    try:
+        hits = search(query, drug, top)
+    except ValueError as e:
+        raise QueryError(400, str(e))
+    return {"query": query, "drug": drug, "hits": hits}
+
+
+def query_similar(params):
+    from twins_v1_0 import near_duplicates, similar_articles
+    article_id = require(params, "id")
+    drug = params.get("drug", "").strip() or None
+    try:
+        top = int(params.get("top", "10"))
+    except ValueError:
+        raise QueryError(400, "Параметр 'top' должен быть числом")
+    try:
+        hits = similar_articles(article_id, drug, top)
+    except ValueError as e:
+        raise QueryError(404, str(e))
+    duplicates = [{"article_id": twin_id, "similarity": score} for twin_id, score in near_duplicates(article_id)]
+    return {"article_id": article_id, "duplicates": duplicates, "similar": hits}
+
+
+def query_health(params):
+    return {"status": "ok"}
+
+
+ROUTES = {
+    "/drug": query_drug,
+    "/watch": query_watch,
+    "/source": query_source,
+    "/filter": query_filter,
+    "/scholar": query_scholar,
+    "/related": query_related,
+    "/trend": query_trend,
+    "/search": query_search,
+    "/similar": query_similar,
+    "/health": query_health,
+}
+
+
+def warm_up():
+    # Заранее строим индексы, чтобы первые запросы клиентов не ждали чтения файлов
+    from recall_v1_0 import get_index
+    from watcher_v2_0 import build_first_met_index
+    from ledger_v1_0 import refresh as refresh_article_index
+    from sieve_v1_0 import get_ner_index
+    from companion_v1_0 import get_companion_index
+    from librarian_v1_0 import refresh as refresh_fulltext_index
+    steps = [
+        ("side_effects_database.json", lambda: get_index().cached("first_met", build_first_met_index)),
+        ("индекс статей", refresh_article_index),
+        ("индекс NER", get_ner_index().refresh),
+        ("совместная встречаемость", lambda: get_companion_index().matrix()),
+        ("полнотекстовый индекс", refresh_fulltext_index),
+    ]
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"Индекс '{name}' не построен: {e}")
+
+
+class QueryServer:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=8):
+        self.host = host
+        self.port = port
+        # Запросы выполняются в пуле потоков: цикл событий не блокируется на чтении файлов
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query")
+        self.requests = 0
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Некорректная строка запроса"}, False)
+                    break
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {"error": "Некорректный заголовок Content-Length"}, False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self.respond(writer, 413, {"error": "Слишком большое тело запроса"}, False)
+                    break
+                if length:
+                    await reader.readexactly(length)  # Тело запроса не используется
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, payload = await self.dispatch(method, target)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target):
+        self.requests += 1
+        if method != "GET":
+            return 405, {"error": "Поддерживается только GET"}
+        url = urlsplit(target)
+        handler = ROUTES.get(url.path.rstrip("/") or "/")
+        if handler is None:
+            return 404, {"error": f"Неизвестный запрос {url.path}", "endpoints": sorted(ROUTES)}
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        loop = asyncio.get_running_loop()
+        try:
+            return 200, await loop.run_in_executor(self.executor, handler, params)
+        except QueryError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"Ошибка при выполнении запроса: {e}"}
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, warm_up)
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        print(f"Сервис запросов BIOLock: http://{self.host}:{self.port}/ (эндпоинты: {', '.join(sorted(ROUTES))})",
+              flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Локальный HTTP/JSON сервис запросов BIOLock")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST, help="адрес для прослушивания")
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="порт")
+    arg_parser.add_argument("--workers", type=int, default=8, help="потоков для выполнения запросов")
+    arg_parser.add_argument("--workdir", default=os.path.dirname(os.path.abspath(__file__)),
+                            help="папка проекта с базами, drug_data/, reports/ и refined/")
+    args = arg_parser.parse_args()
+
+    os.chdir(args.workdir)
+    try:
+        asyncio.run(QueryServer(args.host, args.port, args.workers).serve())
+    except KeyboardInterrupt:
+        print("Сервис остановлен.")
+
+
+if __name__ == "__main__":
+    main()
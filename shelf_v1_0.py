@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from keeper_v1_0 import atomic_write, file_lock
+
+# Раскладка по препаратам:
+#   shards/manifest.json               — препарат (нижний регистр) -> имя и файлы шардов
+#   shards/side_effects/<препарат>.json — записи препарата из side_effects_database.json
+#   shards/sources/<препарат>.json      — эффект -> ID источников для препарата из source_database.json
+SHARDS_DIR = "shards"
+MANIFEST_PATH = os.path.join(SHARDS_DIR, "manifest.json")
+SIDE_EFFECTS_PART = "side_effects"
+SOURCES_PART = "sources"
+# Общие базы, из которых построены шарды: если база новее шардов, шарды не используются
+DATABASES = {SIDE_EFFECTS_PART: "side_effects_database.json", SOURCES_PART: "source_database.json"}
+WRITE_WORKERS = 8
+
+
+def shard_filename(drug):
+    # Читаемое имя + короткий хэш, чтобы разные написания не сталкивались после очистки символов
+    key = drug.lower()
+    safe = re.sub(r"[^\w\-]+", "_", key).strip("_") or "drug"
+    return f"{safe}-{hashlib.md5(key.encode('utf-8')).hexdigest()[:8]}.json"
+
+
+def database_signature(part):
+    try:
+        stat = os.stat(DATABASES[part])
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def read_manifest():
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_shard(path, payload):
+    # Перезаписываем шард только при изменении содержимого
+    text = json.dumps(payload, ensure_ascii=False, indent=4)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    with atomic_write(path) as f:
+        f.write(text)
+    return True
+
+
+def write_part(part, shards):
+    # shards: препарат -> содержимое шарда. Шарды пишутся параллельно, затем обновляется манифест
+    part_dir = os.path.join(SHARDS_DIR, part)
+    os.makedirs(part_dir, exist_ok=True)
+    entries = {}
+    jobs = []
+    for drug, payload in shards.items():
+        filename = shard_filename(drug)
+        entries[drug.lower()] = {"name": drug, "file": filename}
+        jobs.append((os.path.join(part_dir, filename), payload))
+
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+        changed = sum(pool.map(lambda job: write_shard(*job), jobs))
+
+    with file_lock(MANIFEST_PATH):
+        manifest = read_manifest() or {}
+        stale = {entry["file"] for entry in manifest.get(part, {}).values()} - \
+                {entry["file"] for entry in entries.values()}
+        manifest[part] = entries
+        manifest.setdefault("databases", {})[part] = database_signature(part)
+        with atomic_write(MANIFEST_PATH, lock=False) as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+    # Шарды исчезнувших препаратов удаляем после того, как манифест перестал на них ссылаться
+    for filename in stale:
+        try:
+            os.remove(os.path.join(part_dir, filename))
+        except FileNotFoundError:
+            pass
+    return changed
+
+
+def write_side_effect_shards(side_effects_db):
+    return write_part(SIDE_EFFECTS_PART, side_effects_db)
+
+
+def write_source_shards(source_db):
+    # source_database.json устроена как эффект -> препарат -> ID; шард нужен по препарату
+    by_drug = {}
+    for effect, drugs in source_db.items():
+        for drug, ids in drugs.items():
+            by_drug.setdefault(drug, {})[effect] = ids
+    return write_part(SOURCES_PART, by_drug)
+
+
+def load_part(manifest, part, drug_key):
+    entry = manifest.get(part, {}).get(drug_key)
+    if not entry:
+        return None, None
+    try:
+        with open(os.path.join(SHARDS_DIR, part, entry["file"]), "r", encoding="utf-8") as f:
+            return entry["name"], json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None, None
+
+
+def load_drug_shard(drug_name):
+    # Возвращает (название препарата, записи эффектов, эффект -> ID источников).
+    # None — шардов нет (старая раскладка) или общая база обновлена в обход шардов,
+    # тогда вызывающий читает общие файлы
+    manifest = read_manifest()
+    if not manifest or SIDE_EFFECTS_PART not in manifest:
+        return None
+    recorded = manifest.get("databases", {})
+    if any(recorded.get(part) != database_signature(part) for part in DATABASES):
+        return None
+    drug_key = drug_name.strip().lower()
+    name, entries = load_part(manifest, SIDE_EFFECTS_PART, drug_key)
+    if name is None:
+        return None, [], {}
+    _, sources = load_part(manifest, SOURCES_PART, drug_key)
+    return name, entries, sources or {}
+
+
+def build_shards_from_databases():
+    # Перевод существующих общих баз в шардированную раскладку
+    with open(DATABASES[SIDE_EFFECTS_PART], "r", encoding="utf-8") as f:
+        write_side_effect_shards(json.load(f))
+    try:
+        with open(DATABASES[SOURCES_PART], "r", encoding="utf-8") as f:
+            write_source_shards(json.load(f))
+    except FileNotFoundError:
+        print(f"Файл {DATABASES[SOURCES_PART]} не найден, шарды источников не созданы.")
+
+
+if __name__ == "__main__":
+    build_shards_from_databases()
+    manifest = read_manifest() or {}
+    print(f"Шардов препаратов: {len(manifest.get(SIDE_EFFECTS_PART, {}))}, "
+          f"шардов источников: {len(manifest.get(SOURCES_PART, {}))}")
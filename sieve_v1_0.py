@@ -0,0 +1,250 @@
+import os
+import json
+import threading
+
+from keeper_v1_0 import atomic_write
+from tables_v1_0 import list_tables, read_rows
+
+# Инвертированный индекс NER-сущностей из таблиц reports/ (CSV или Parquet):
+#   сущность (нижний регистр) -> файл отчёта -> ID статей,
+#   триграмма -> сущности, чтобы поиск подстроки ("adolescents") не перебирал все строки,
+#   пары (ID статьи, побочный эффект) из одноимённого файла refined/ (заранее выполненное соединение).
+# Для каждого отчёта хранится порядок ID по строкам, поэтому результаты поиска выдаются в порядке
+# строк отчёта и чистовой таблицы, как при построчном чтении файлов.
+# Разобранные файлы сохраняются в index/ner_index.json; при обновлении перечитываются только
+# отчёты и чистовые таблицы, у которых изменились размер или время изменения
+REPORTS_DIR = "reports"
+REFINED_DIR = "refined"
+INDEX_PATH = os.path.join("index", "ner_index.json")
+INDEX_FORMAT = 2  # при смене формата записей сохранённый индекс перестраивается
+
+
+def get_column_field(fieldnames, target):
+    target_norm = target.lower().replace(" ", "")
+    for field in fieldnames:
+        if target_norm in field.lower().replace(" ", ""):
+            return field
+    return None
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def clean_id(raw_id):
+    # Разделяем строку по ';' и берем первый элемент (чистый ID)
+    return raw_id.strip().split(';')[0].strip().lower()
+
+
+def parse_report(path):
+    # (сущность -> ID статей, все ID) — в порядке строк отчёта
+    entities = {}
+    ids_order = []
+    fieldnames, rows = read_rows(path, columns=["NER Entities", "Article ID"])
+    if not fieldnames:
+        return entities, ids_order
+    ner_field = get_column_field(fieldnames, "NER Entities")
+    id_field = get_column_field(fieldnames, "Article ID")
+    if not ner_field or not id_field:
+        return entities, ids_order
+    for row in rows:
+        source_id = clean_id(row.get(id_field) or "")
+        if not source_id:
+            continue
+        ids_order.append(source_id)
+        for entity in (row.get(ner_field) or "").split(","):
+            entity = entity.strip().lower()
+            if entity:
+                ids = entities.setdefault(entity, [])
+                if source_id not in ids:
+                    ids.append(source_id)
+    return entities, list(dict.fromkeys(ids_order))
+
+
+def parse_refined(path, filename):
+    # [ID статьи, побочный эффект] в порядке строк; ошибки формата сохраняются и выдаются при поиске, как раньше
+    effects = []
+    fieldnames, rows = read_rows(path, columns=["Side Effects", "Article ID"])
+    if not fieldnames:
+        return None, f"Файл {filename} из папки refined не содержит заголовков"
+    effects_field = get_column_field(fieldnames, "Side Effects")
+    refined_id_field = get_column_field(fieldnames, "Article ID")
+    if not effects_field or not refined_id_field:
+        return None, f"В файле {filename} отсутствуют необходимые столбцы ('Побочные эффекты' и/или 'ID источника')"
+    for row in rows:
+        row_id = clean_id(row.get(refined_id_field) or "")
+        effect = (row.get(effects_field) or "").strip()
+        if row_id and effect:
+            effects.append([row_id, effect])
+    return effects, None
+
+
+class NerIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.files = {}     # файл отчёта -> подписи, сущности и соединение с refined
+        self.postings = {}  # сущность -> {файл отчёта: [ID]}
+        self.grams = {}     # триграмма -> множество сущностей
+        self.speller = None  # поиск сущностей с опечатками, строится при первом обращении
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") == INDEX_FORMAT:
+                self.files = data.get("files", {})
+        except (FileNotFoundError, ValueError):
+            pass
+        for filename, record in self.files.items():
+            self.add_postings(filename, record)
+
+    def add_postings(self, filename, record):
+        for entity, ids in record["entities"].items():
+            if entity not in self.postings:
+                self.postings[entity] = {}
+                for gram in trigrams(entity):
+                    self.grams.setdefault(gram, set()).add(entity)
+            self.postings[entity][filename] = ids
+
+    def remove_postings(self, filename):
+        record = self.files.pop(filename, None)
+        if not record:
+            return
+        for entity in record["entities"]:
+            files = self.postings.get(entity, {})
+            files.pop(filename, None)
+            if not files:
+                self.postings.pop(entity, None)
+                for gram in trigrams(entity):
+                    entities = self.grams.get(gram)
+                    if entities is not None:
+                        entities.discard(entity)
+                        if not entities:
+                            del self.grams[gram]
+
+    def refresh(self):
+        # Инкрементальное обновление по изменившимся отчётам и чистовым таблицам
+        if not os.path.isdir(REPORTS_DIR):
+            raise Exception("Не удалось открыть папку reports: нет папки " + REPORTS_DIR)
+        # Имя файла отчёта -> путь; чистовая таблица ищется по тому же имени таблицы в любом формате
+        report_paths = {os.path.basename(path): path for path in list_tables(REPORTS_DIR).values()}
+        refined_paths = list_tables(REFINED_DIR)
+        reports_files = list(report_paths)
+
+        with self.lock:
+            changed = False
+            for filename in reports_files:
+                report_sig = file_signature(report_paths[filename])
+                refined_path = refined_paths.get(os.path.splitext(filename)[0], os.path.join(REFINED_DIR, filename))
+                refined_sig = file_signature(refined_path)
+                record = self.files.get(filename)
+                if record and record["report"] == report_sig and record["refined"] == refined_sig:
+                    continue
+                try:
+                    entities, ids_order = parse_report(report_paths[filename])
+                except Exception:
+                    entities, ids_order = {}, []  # Пропускаем файлы с ошибками чтения
+                effects, error = [], None
+                if refined_sig is not None:
+                    try:
+                        effects, error = parse_refined(refined_path, filename)
+                    except Exception as e:
+                        effects, error = None, f"Ошибка при чтении файла {filename} из папки refined: {e}"
+                self.remove_postings(filename)
+                record = {"report": report_sig, "refined": refined_sig, "entities": entities, "ids": ids_order,
+                          "effects": effects or [], "error": error}
+                self.files[filename] = record
+                self.add_postings(filename, record)
+                changed = True
+            for filename in set(self.files) - set(reports_files):
+                self.remove_postings(filename)
+                changed = True
+            if changed:
+                self.speller = None
+                with atomic_write(self.path) as f:
+                    json.dump({"format": INDEX_FORMAT, "files": self.files}, f, ensure_ascii=False)
+        return reports_files
+
+    def matching_entities(self, keyword_lower):
+        # Кандидаты по пересечению триграмм, затем точная проверка подстроки
+        grams = trigrams(keyword_lower)
+        if not grams:
+            return sorted(entity for entity in self.postings if keyword_lower in entity)
+        candidates = None
+        for gram in sorted(grams, key=lambda g: len(self.grams.get(g, ()))):
+            entities = self.grams.get(gram)
+            if not entities:
+                return []
+            candidates = set(entities) if candidates is None else candidates & entities
+            if not candidates:
+                return []
+        return sorted(entity for entity in candidates if keyword_lower in entity)
+
+    def search(self, keyword, drug=""):
+        reports_files = self.refresh()
+        if not reports_files:
+            raise Exception("CSV файлы не найдены в папке reports")
+
+        keyword_lower = keyword.lower()
+        with self.lock:
+            matched = {}  # файл отчёта -> множество ID статей
+            for entity in self.matching_entities(keyword_lower):
+                for filename, ids in self.postings[entity].items():
+                    # Если задан препарат, фильтруем файлы по его названию.
+                    if drug:
+                        base_name = os.path.splitext(filename)[0].replace("_", " ")
+                        if drug.lower() not in base_name.lower():
+                            continue
+                    matched.setdefault(filename, set()).update(ids)
+
+            global_found_ids = []
+            global_side_effects = []
+            for filename in reports_files:
+                if filename not in matched:
+                    continue
+                record = self.files[filename]
+                file_ids = matched[filename]
+                # Порядок строк отчёта и чистовой таблицы, а не порядок обхода множеств
+                global_found_ids.extend(article_id for article_id in record["ids"] if article_id in file_ids)
+                if record["refined"] is None:
+                    raise Exception(f"Файл {filename} не найден в папке refined")
+                if record["error"]:
+                    raise Exception(record["error"])
+                global_side_effects.extend(effect for article_id, effect in record["effects"] if article_id in file_ids)
+
+        # Удаляем дубликаты
+        return list(dict.fromkeys(global_found_ids)), list(dict.fromkeys(global_side_effects))
+
+    def suggest(self, keyword, count=5):
+        # Сущности, близкие к keyword с точностью до опечатки (speller_v1_0)
+        from speller_v1_0 import Speller
+        self.refresh()
+        with self.lock:
+            if self.speller is None:
+                self.speller = Speller(self.postings)
+            return [entity for entity, _ in self.speller.suggest(keyword, count=count)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_ner_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NerIndex()
+        return _index
+
+
+if __name__ == "__main__":
+    index = get_ner_index()
+    index.refresh()
+    print(f"Отчётов: {len(index.files)}, сущностей: {len(index.postings)}, триграмм: {len(index.grams)}")
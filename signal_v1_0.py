@@ -0,0 +1,220 @@
+import os
+import argparse
+import threading
+
+import numpy as np
+
+from compact_v1_0 import SOURCE_DB, json_signature, load_compact
+
+# Диспропорциональный анализ (поиск сигналов) по source_database.json.
+# Единица наблюдения — пара (препарат, статья). Для пары препарат i × эффект j таблица 2×2:
+#   a — статьи препарата с эффектом, b — статьи препарата без эффекта,
+#   c — статьи других препаратов с эффектом, d — остальные.
+# Все пары считаются одним векторным проходом по разреженной матрице препарат × эффект (формат COO):
+#   PRR = (a / (a + b)) / (c / (c + d)),  ROR = a·d / (b·c) — с 95% доверительными интервалами;
+#   IC = log2((a + 0.5) / (E + 0.5)), E = (a + b)(a + c) / N — с приближёнными границами IC025/IC975.
+# Критерии сигнала: PRR ≥ 2, χ² ≥ 4 и a ≥ 3 (Evans), нижняя граница ROR > 1, IC025 > 0
+Z = 1.96
+MIN_COUNT = 3
+PRR_THRESHOLD = 2.0
+CHI2_THRESHOLD = 4.0
+SORT_COLUMNS = ("ic025", "ror_low", "prr", "a")
+
+COLUMNS = ["drug", "effect", "a", "b", "c", "d", "expected", "prr", "prr_low", "prr_high", "chi2",
+           "ror", "ror_low", "ror_high", "ic", "ic025", "ic975", "prr_signal", "ror_signal", "ic_signal"]
+
+
+class Counts:
+    # Разреженная матрица препарат × эффект: rows/cols — номера препарата и эффекта, a — число статей
+    def __init__(self, drugs, effects, rows, cols, a, drug_totals):
+        self.drugs = drugs
+        self.effects = effects
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.a = np.asarray(a, dtype=np.float64)
+        # Статьи препарата с любым эффектом (a + b): статья с несколькими эффектами считается один раз
+        self.drug_totals = np.asarray(drug_totals, dtype=np.float64)
+
+
+def counts_from_database(source_db):
+    drugs = sorted({drug for drug_ids in source_db.values() for drug in drug_ids})
+    drug_numbers = {drug: number for number, drug in enumerate(drugs)}
+    effects = sorted(source_db)
+    articles = [set() for _ in drugs]
+    rows, cols, a = [], [], []
+    for effect_number, effect in enumerate(effects):
+        for drug, ids in source_db[effect].items():
+            rows.append(drug_numbers[drug])
+            cols.append(effect_number)
+            a.append(len(set(ids)))
+            articles[drug_numbers[drug]].update(ids)
+    return Counts(drugs, effects, rows, cols, a, [len(ids) for ids in articles])
+
+
+def counts_from_compact(compact):
+    # Те же счётчики напрямую из массивов двоичного снимка (compact_v1_0), без декодирования ID
+    pair_drug = np.frombuffer(compact.pair_drug, dtype=np.uint32).astype(np.int64)
+    pair_ids = np.frombuffer(compact.pair_ids, dtype=np.uint32).astype(np.int64)
+    effect_pairs = np.frombuffer(compact.effect_pairs, dtype=np.uint32).astype(np.int64)
+    a = np.diff(pair_ids)
+    cols = np.repeat(np.arange(compact.n_effects), np.diff(effect_pairs))
+    # Уникальные пары (препарат, статья): ID по 16 байт рассматриваются как два uint64
+    ids = np.frombuffer(compact.ids, dtype=np.uint64).reshape(-1, 2)
+    id_drugs = np.repeat(pair_drug, a)
+    drug_totals = np.zeros(compact.n_drugs)
+    if len(ids):
+        order = np.lexsort((ids[:, 1], ids[:, 0], id_drugs))
+        sorted_ids, sorted_drugs = ids[order], id_drugs[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = ((sorted_drugs[1:] != sorted_drugs[:-1]) | (sorted_ids[1:, 0] != sorted_ids[:-1, 0])
+                     | (sorted_ids[1:, 1] != sorted_ids[:-1, 1]))
+        drug_totals = np.bincount(sorted_drugs[first], minlength=compact.n_drugs)
+    return Counts(compact.drugs(), compact.effects(), pair_drug, cols, a, drug_totals)
+
+
+def load_counts(path=SOURCE_DB):
+    compact = load_compact(json_path=path)
+    if compact is not None:
+        return counts_from_compact(compact)
+    import json
+    with open(path, "r", encoding="utf-8") as f:
+        return counts_from_database(json.load(f))
+
+
+def compute_signals(counts, z=Z):
+    # Статистики для всех ненулевых пар сразу; результат — словарь столбцов numpy
+    a = counts.a
+    effect_totals = np.bincount(counts.cols, weights=a, minlength=len(counts.effects))
+    total = counts.drug_totals.sum()
+    row_totals = counts.drug_totals[counts.rows]
+    col_totals = effect_totals[counts.cols]
+    b = row_totals - a
+    c = col_totals - a
+    d = total - a - b - c
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Поправка Холдейна–Энскомба (+0.5 ко всем ячейкам), если в таблице есть нулевая ячейка
+        zero = (b == 0) | (c == 0) | (d == 0)
+        ca, cb, cc, cd = (np.where(zero, cell + 0.5, cell) for cell in (a, b, c, d))
+
+        prr = (ca / (ca + cb)) / (cc / (cc + cd))
+        prr_se = np.sqrt(1 / ca - 1 / (ca + cb) + 1 / cc - 1 / (cc + cd))
+        ror = ca * cd / (cb * cc)
+        ror_se = np.sqrt(1 / ca + 1 / cb + 1 / cc + 1 / cd)
+
+        # χ² с поправкой Йейтса
+        n = a + b + c + d
+        chi2 = n * np.maximum(np.abs(a * d - b * c) - n / 2, 0) ** 2 / ((a + b) * (c + d) * (a + c) * (b + d))
+        chi2 = np.nan_to_num(chi2, nan=0.0, posinf=0.0)
+
+        expected = row_totals * col_totals / total if total else np.zeros_like(a)
+        shrunk = a + 0.5
+        ic = np.log2(shrunk / (expected + 0.5))
+        # Приближение доверительных границ IC по Норену и др. (2013)
+        ic025 = ic - 3.3 * shrunk ** -0.5 - 2 * shrunk ** -1.5
+        ic975 = ic + 2.4 * shrunk ** -0.5 - 0.5 * shrunk ** -1.5
+
+        result = {
+            "a": a, "b": b, "c": c, "d": d, "expected": expected,
+            "prr": prr, "prr_low": np.exp(np.log(prr) - z * prr_se), "prr_high": np.exp(np.log(prr) + z * prr_se),
+            "chi2": chi2,
+            "ror": ror, "ror_low": np.exp(np.log(ror) - z * ror_se), "ror_high": np.exp(np.log(ror) + z * ror_se),
+            "ic": ic, "ic025": ic025, "ic975": ic975,
+        }
+    result["prr_signal"] = (a >= MIN_COUNT) & (prr >= PRR_THRESHOLD) & (chi2 >= CHI2_THRESHOLD)
+    result["ror_signal"] = np.nan_to_num(result["ror_low"], nan=0.0) > 1
+    result["ic_signal"] = ic025 > 0
+    return result
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_signals(path=SOURCE_DB):
+    # (счётчики, статистики) с кэшем до изменения базы
+    signature = json_signature(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        counts = load_counts(path)
+        value = (counts, compute_signals(counts))
+        _cache[path] = (signature, value)
+        return value
+
+
+def signals_frame(drug=None, effect=None, min_count=1, only_signals=False, sort_by="ic025", path=SOURCE_DB):
+    # Таблица pandas с одной строкой на пару препарат × эффект
+    import pandas as pd
+    counts, stats = get_signals(path)
+    mask = counts.a >= min_count
+    if drug:
+        names = np.array([name.lower() for name in counts.drugs], dtype=object)
+        mask &= names[counts.rows] == drug.strip().lower()
+    if effect:
+        names = np.array([name.lower() for name in counts.effects], dtype=object)
+        mask &= names[counts.cols] == effect.strip().lower()
+    if only_signals:
+        mask &= stats["prr_signal"] | stats["ror_signal"] | stats["ic_signal"]
+    frame = pd.DataFrame({name: values[mask] for name, values in stats.items()})
+    frame.insert(0, "effect", np.array(counts.effects, dtype=object)[counts.cols[mask]])
+    frame.insert(0, "drug", np.array(counts.drugs, dtype=object)[counts.rows[mask]])
+    for name in ("a", "b", "c", "d"):
+        frame[name] = frame[name].astype(np.int64)
+    if sort_by in frame.columns:
+        frame = frame.sort_values([sort_by, "a"], ascending=False, kind="stable")
+    return frame[COLUMNS].reset_index(drop=True)
+
+
+def format_signals(frame, top=None):
+    if top:
+        frame = frame.head(top)
+    lines = []
+    for row in frame.itertuples(index=False):
+        flags = "".join(mark for mark, flag in (("P", row.prr_signal), ("R", row.ror_signal), ("I", row.ic_signal))
+                        if flag)
+        lines.append(f"{row.drug} — {row.effect}: n={row.a}, PRR {row.prr:.2f} [{row.prr_low:.2f}; {row.prr_high:.2f}], "
+                     f"ROR {row.ror:.2f} [{row.ror_low:.2f}; {row.ror_high:.2f}], "
+                     f"IC {row.ic:.2f} [{row.ic025:.2f}; {row.ic975:.2f}]" + (f" сигнал: {flags}" if flags else ""))
+    return lines
+
+
+def signals_gui(drug_name, top=200):
+    # Для GUI: сигналы по препарату в виде строки (сначала пары с наибольшим IC025)
+    try:
+        frame = signals_frame(drug=drug_name)
+    except FileNotFoundError:
+        return "Файл source_database.json не найден."
+    if frame.empty:
+        return f"Препарат '{drug_name}' не найден в базе источников."
+    signals = int((frame["prr_signal"] | frame["ror_signal"] | frame["ic_signal"]).sum())
+    header = [f"Сигналы для препарата '{drug_name}': пар {len(frame)}, с сигналом {signals}",
+              "(P — PRR ≥ 2, χ² ≥ 4, n ≥ 3; R — нижняя граница ROR > 1; I — IC025 > 0)"]
+    return "\n".join(header + format_signals(frame, top))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Поиск сигналов (PRR, ROR, IC) по базе источников BIOLock")
+    arg_parser.add_argument("--drug", help="только пары с этим препаратом")
+    arg_parser.add_argument("--effect", help="только пары с этим эффектом")
+    arg_parser.add_argument("--min-count", type=int, default=1, help="минимальное число статей в паре")
+    arg_parser.add_argument("--all", action="store_true", help="выводить и пары без сигнала")
+    arg_parser.add_argument("--sort", choices=SORT_COLUMNS, default="ic025", help="столбец сортировки")
+    arg_parser.add_argument("--top", type=int, default=50, help="сколько строк вывести (0 — все)")
+    arg_parser.add_argument("--csv", help="сохранить полную таблицу в CSV (разделитель ';')")
+    arg_parser.add_argument("--workdir", default=".", help="папка проекта с source_database.json")
+    args = arg_parser.parse_args()
+    os.chdir(args.workdir)
+
+    frame = signals_frame(args.drug, args.effect, args.min_count, not args.all, args.sort)
+    if args.csv:
+        frame.to_csv(args.csv, sep=";", index=False)
+        print(f"Таблица сохранена в {args.csv}")
+    print(f"Пар: {len(frame)}")
+    for line in format_signals(frame, args.top):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
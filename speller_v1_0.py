@@ -0,0 +1,171 @@
+from recall_v1_0 import get_index
+
+# Поиск названий препаратов и эффектов с опечатками (вставка, удаление, замена или перестановка
+# соседних букв). Два индекса по названиям в нижнем регистре:
+#   удаления — название без одной буквы -> названия: опечатка в одну правку находится несколькими
+#              обращениями к словарю (варианты запроса без одной буквы);
+#   триграммы — слово дополняется пробелами ("  aspirin  "); для двух правок кандидаты — названия,
+#              у которых достаточно общих триграмм (одна правка меняет не больше 4 триграмм), причём
+#              общие триграммы считаются только у названий из списков самых редких триграмм запроса.
+# Кандидаты проверяются бит-параллельным расстоянием Дамерау–Левенштейна.
+# Индексы строятся по side_effects_database.json и перестраиваются вместе с ней (recall_v1_0)
+SUGGESTIONS = 5
+GRAM_SIZE = 3
+EDIT_GRAMS = 4
+
+
+def default_distance(text):
+    # Две правки допускаются только для длинных названий: в коротких это уже другое слово
+    return 1 if len(text) <= 7 else 2
+
+
+def padded_grams(text):
+    padded = " " * (GRAM_SIZE - 1) + text + " " * (GRAM_SIZE - 1)
+    return {padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)}
+
+
+def bit_pattern(text):
+    # Битовые маски позиций каждой буквы запроса для edit_distance
+    masks = {}
+    for position, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    return text, masks
+
+
+def edit_distance(pattern, text, limit):
+    # Дамерау–Левенштейн (перестановка соседних букв — одна правка) между запросом pattern
+    # (результат bit_pattern) и text; limit + 1, если расстояние больше limit.
+    # Бит-параллельный алгоритм Хююрё: столбец матрицы расстояний хранится битами одного целого
+    query, masks = pattern
+    if abs(len(query) - len(text)) > limit:
+        return limit + 1
+    if not query:
+        return len(text) if len(text) <= limit else limit + 1
+    full = (1 << len(query)) - 1
+    last = 1 << (len(query) - 1)
+    vp, vn, d0, previous, score = full, 0, 0, 0, len(query)
+    for char in text:
+        pm = masks.get(char, 0)
+        d0 = ((((~d0) & pm) << 1) & previous | ((pm & vp) + vp) ^ vp | pm | vn) & full
+        hp = (vn | ~(d0 | vp)) & full
+        hn = d0 & vp
+        if hp & last:
+            score += 1
+        elif hn & last:
+            score -= 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = (hn | ~(d0 | hp)) & full
+        vn = hp & d0
+        previous = pm
+    return score if score <= limit else limit + 1
+
+
+def deletions(text):
+    return {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+class Speller:
+    def __init__(self, names):
+        self.names = {}  # название в нижнем регистре -> название как в базе (первое встреченное)
+        for name in names:
+            self.names.setdefault(name.strip().lower(), name)
+        self.keys = list(self.names)
+        self.numbers = {key: number for number, key in enumerate(self.keys)}
+        self.deleted = {}  # название без одной буквы -> номера названий
+        self.grams = {}    # триграмма -> номера названий
+        self.gram_sets = []
+        self.lengths = {}  # длина -> номера названий
+        for number, key in enumerate(self.keys):
+            for variant in deletions(key):
+                self.deleted.setdefault(variant, []).append(number)
+            grams = padded_grams(key)
+            self.gram_sets.append(grams)
+            for gram in grams:
+                self.grams.setdefault(gram, []).append(number)
+            self.lengths.setdefault(len(key), []).append(number)
+
+    def close_candidates(self, query):
+        # Названия не дальше одной правки (и часть названий в двух правках)
+        numbers = set()
+        for variant in deletions(query) | {query}:
+            numbers.update(self.deleted.get(variant, ()))
+            if variant in self.numbers:
+                numbers.add(self.numbers[variant])
+        return numbers
+
+    def candidates(self, query, limit):
+        grams = padded_grams(query)
+        needed = len(grams) - EDIT_GRAMS * limit
+        if needed < 1:
+            return {number for length in range(len(query) - limit, len(query) + limit + 1)
+                    for number in self.lengths.get(length, ())}
+        # Название с needed общими триграммами обязательно содержит одну из len - needed + 1 самых редких
+        rare = sorted(grams, key=lambda gram: len(self.grams.get(gram, ())))[:len(grams) - needed + 1]
+        numbers = set()
+        for gram in rare:
+            numbers.update(self.grams.get(gram, ()))
+        return {number for number in numbers if len(grams & self.gram_sets[number]) >= needed}
+
+    def suggest(self, query, limit=None, count=SUGGESTIONS):
+        # [(название, расстояние)] по возрастанию расстояния, затем по числу общих триграмм
+        query = query.strip().lower()
+        if not query:
+            return []
+        if query in self.names:
+            return [(self.names[query], 0)]
+        limit = default_distance(query) if limit is None else limit
+        found = self.check(query, self.close_candidates(query), limit)
+        # Полный поиск в пределах limit нужен, только если нет вариантов в одну правку
+        if limit > 1 and not any(distance == 1 for distance, _, _ in found):
+            found = self.check(query, self.candidates(query, limit), limit)
+        found.sort()
+        return [(self.names[key], distance) for distance, _, key in found[:count]]
+
+    def check(self, query, numbers, limit):
+        grams = padded_grams(query)
+        pattern = bit_pattern(query)
+        found = []
+        for number in numbers:
+            key = self.keys[number]
+            distance = edit_distance(pattern, key, limit)
+            if distance <= limit:
+                found.append((distance, -len(grams & self.gram_sets[number]), key))
+        return found
+
+    def correct(self, query, limit=None):
+        # Единственное лучшее совпадение или None
+        suggestions = self.suggest(query, limit, count=2)
+        if not suggestions:
+            return None
+        if len(suggestions) > 1 and suggestions[0][1] == suggestions[1][1] and suggestions[0][1] > 0:
+            return None  # Неоднозначно: два варианта на одном расстоянии
+        return suggestions[0][0]
+
+
+def build_drug_speller(data):
+    return Speller(data)
+
+
+def build_effect_speller(data):
+    return Speller(effect for entries in data.values() for entry in entries for effect in entry.get("side effects", []))
+
+
+def suggest_drugs(name, count=SUGGESTIONS):
+    return [drug for drug, _ in get_index().cached("drug_speller", build_drug_speller).suggest(name, count=count)]
+
+
+def correct_drug(name):
+    # Название препарата из базы, если опечатка исправляется однозначно, иначе None
+    return get_index().cached("drug_speller", build_drug_speller).correct(name)
+
+
+def suggest_effects(name, count=SUGGESTIONS):
+    return [effect for effect, _ in get_index().cached("effect_speller", build_effect_speller).suggest(name, count=count)]
+
+
+if __name__ == "__main__":
+    import sys
+    for word in sys.argv[1:] or [input("Введите название: ").strip()]:
+        print(f"{word}: препараты — {', '.join(suggest_drugs(word)) or 'нет'}; "
+              f"эффекты — {', '.join(suggest_effects(word)) or 'нет'}")
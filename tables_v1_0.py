@@ -0,0 +1,216 @@
+import os
+import csv
+
+from keeper_v1_0 import atomic_write
+
+# Единая точка чтения и записи таблиц reports/ и refined/.
+# Формат определяется расширением файла: ".csv" (разделитель ';', как раньше) или ".parquet"
+# (столбцовый формат: можно читать только нужные столбцы, списки эффектов хранятся как list<string>).
+# Формат новых таблиц задаётся переменной окружения BIOLOCK_TABLE_FORMAT=csv|parquet (по умолчанию csv);
+# для Parquet нужен pyarrow, без него таблицы пишутся в CSV.
+CSV_EXT = ".csv"
+PARQUET_EXT = ".parquet"
+TABLE_EXTS = (CSV_EXT, PARQUET_EXT)
+FORMAT_ENV = "BIOLOCK_TABLE_FORMAT"
+LIST_SEPARATOR = ", "
+
+# Столбцы со списками значений (в CSV — строка через запятую)
+REPORT_LIST_COLUMNS = ("Side Effects", "NER Entities")
+REFINED_LIST_COLUMNS = ("side effects",)
+
+_warned = False
+
+
+def normalize_column(name):
+    return name.strip().lower().replace(" ", "").replace("_", "")
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def output_ext():
+    global _warned
+    if os.environ.get(FORMAT_ENV, "csv").strip().lower() != "parquet":
+        return CSV_EXT
+    if parquet_available():
+        return PARQUET_EXT
+    if not _warned:
+        print(f"{FORMAT_ENV}=parquet, но pyarrow не установлен: таблицы сохраняются в CSV")
+        _warned = True
+    return CSV_EXT
+
+
+def table_path(directory, base):
+    # Путь для новой таблицы в текущем формате, например reports/aspirin_17_02_2025_table.parquet
+    return os.path.join(directory, base + output_ext())
+
+
+def table_base(filename):
+    # Имя таблицы без расширения или None, если файл не таблица
+    base, ext = os.path.splitext(os.path.basename(filename))
+    return base if ext.lower() in TABLE_EXTS else None
+
+
+def list_tables(directory):
+    # Имя таблицы -> путь. Если таблица есть в обоих форматах, берётся более новый файл
+    tables = {}
+    try:
+        filenames = os.listdir(directory)
+    except FileNotFoundError:
+        return tables
+    for filename in sorted(filenames):
+        base = table_base(filename)
+        if base is None:
+            continue
+        path = os.path.join(directory, filename)
+        if base in tables and os.path.getmtime(tables[base]) >= os.path.getmtime(path):
+            continue
+        tables[base] = path
+    return tables
+
+
+def find_table(directory, base):
+    # Путь к существующей таблице base в любом формате (более новый файл) или None
+    found = None
+    for ext in TABLE_EXTS:
+        path = os.path.join(directory, base + ext)
+        if os.path.isfile(path) and (found is None or os.path.getmtime(path) > os.path.getmtime(found)):
+            found = path
+    return found
+
+
+def is_parquet(path):
+    return path.lower().endswith(PARQUET_EXT)
+
+
+def resolve_columns(available, columns):
+    # Сопоставление запрошенных столбцов с реальными без учёта регистра, пробелов и "_"
+    if columns is None:
+        return None
+    wanted = {normalize_column(column) for column in columns}
+    return [name for name in available if normalize_column(name) in wanted]
+
+
+def join_value(value):
+    return "" if value is None else str(value)
+
+
+def read_parquet_table(path, columns=None):
+    # Чтение только нужных столбцов; списки склеиваются через ", " средствами Arrow,
+    # чтобы разбор ниже не зависел от формата
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    names = pq.read_schema(path).names
+    table = pq.read_table(path, columns=resolve_columns(names, columns))
+    for index, field in enumerate(table.schema):
+        if pa.types.is_list(field.type):
+            table = table.set_column(index, field.name, pc.binary_join(table.column(index), LIST_SEPARATOR))
+    return table
+
+
+def read_rows(path, columns=None):
+    # (заголовки, список строк-словарей со строковыми значениями), как csv.DictReader(delimiter=';')
+    if is_parquet(path):
+        table = read_parquet_table(path, columns)
+        rows = [{key: join_value(value) for key, value in row.items()} for row in table.to_pylist()]
+        return table.column_names, rows
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter=';')
+        rows = list(reader)
+        return reader.fieldnames or [], rows
+
+
+def read_frame(path, columns=None):
+    # pandas.DataFrame с тем же содержимым, что даёт pd.read_csv(path, delimiter=';')
+    import pandas as pd
+    if is_parquet(path):
+        df = read_parquet_table(path, columns).to_pandas()
+        # В CSV пустое поле читается как NaN
+        return df.replace("", float("nan"))
+    if columns is None:
+        return pd.read_csv(path, delimiter=';')
+    wanted = {normalize_column(column) for column in columns}
+    return pd.read_csv(path, delimiter=';', usecols=lambda name: normalize_column(name) in wanted)
+
+
+def split_list(value):
+    return [item.strip() for item in str(value).split(",") if item.strip()] if value else []
+
+
+def write_parquet(path, columns, list_columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    arrays = {}
+    for name, values in columns.items():
+        if name in list_columns:
+            arrays[name] = pa.array([split_list(value) for value in values], type=pa.list_(pa.string()))
+        else:
+            arrays[name] = pa.array([None if value is None else str(value) for value in values], type=pa.string())
+    with atomic_write(path, mode="wb") as f:
+        pq.write_table(pa.table(arrays), f, compression="zstd")
+
+
+def remove_other_formats(path):
+    # Таблица с тем же именем в другом формате устарела: удаляем, чтобы читатели не видели дубль
+    base, ext = os.path.splitext(path)
+    for other in TABLE_EXTS:
+        if other != ext.lower():
+            try:
+                os.remove(base + other)
+            except FileNotFoundError:
+                pass
+
+
+def write_rows(path, fieldnames, rows, list_columns=()):
+    # Запись строк-словарей в формате по расширению path (атомарно, под блокировкой)
+    if is_parquet(path):
+        columns = {name: [row.get(name) for row in rows] for name in fieldnames}
+        write_parquet(path, columns, list_columns)
+    else:
+        with atomic_write(path, newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
+            writer.writeheader()
+            writer.writerows(rows)
+    remove_other_formats(path)
+    return path
+
+
+def write_frame(path, df, list_columns=()):
+    if is_parquet(path):
+        columns = {name: [None if value != value else value for value in df[name].tolist()] for name in df.columns}
+        write_parquet(path, columns, list_columns)
+    else:
+        with atomic_write(path, newline='') as f:
+            df.to_csv(f, sep=';', index=False)
+    remove_other_formats(path)
+    return path
+
+
+def convert(directory, ext=PARQUET_EXT):
+    # Перевод всех таблиц папки в указанный формат
+    list_columns = REPORT_LIST_COLUMNS + REFINED_LIST_COLUMNS
+    converted = 0
+    for base, path in list_tables(directory).items():
+        if path.lower().endswith(ext):
+            continue
+        fieldnames, rows = read_rows(path)
+        write_rows(os.path.join(directory, base + ext), fieldnames, rows,
+                   [name for name in fieldnames if name in list_columns])
+        converted += 1
+    return converted
+
+
+if __name__ == "__main__":
+    import sys
+    # python tables_v1_0.py [папки] — в Parquet; с ключом --csv — обратно в CSV
+    target_ext = CSV_EXT if "--csv" in sys.argv else PARQUET_EXT
+    if target_ext == PARQUET_EXT and not parquet_available():
+        raise SystemExit("Для Parquet нужен pyarrow: pip install pyarrow")
+    for folder in [arg for arg in sys.argv[1:] if not arg.startswith("--")] or ["reports", "refined"]:
+        print(f"{folder}: преобразовано таблиц: {convert(folder, target_ext)}")
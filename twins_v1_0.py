@@ -0,0 +1,351 @@
+import os
+import re
+import math
+import zlib
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+
+import numpy as np
+
+import librarian_v1_0 as librarian
+
+# Близкие дубликаты и похожие статьи. Отзывы Amazon, Drugs.com и Uppsala — склейки отзывов или страниц,
+# и при малейшем изменении склейки статья получает новый article_id (MD5 названия и результатов).
+#   MinHash/LSH — текст статьи режется на шинглы по SHINGLE_SIZE слов, подпись — NUM_PERM минимумов
+#                 хэшей шинглов; доля совпадающих минимумов оценивает сходство Жаккара. Подпись делится
+#                 на BANDS полос по ROWS значений, статьи с одинаковой полосой — кандидаты в дубликаты
+#                 (при сходстве 0,8 пара находится с вероятностью 95%), кандидаты проверяются по подписи.
+#   TF-IDF      — "похожие статьи": из текста статьи берутся слова с наибольшим tf·idf (df — из
+#                 полнотекстового индекса librarian_v1_0), и по ним выполняется запрос BM25.
+# Подписи, полосы и кэш результатов NLP анализатора хранятся в index/twins.sqlite: анализатор не
+# запускает модель для статьи, которую уже анализировал, а для её близкого дубликата запускает только
+# на участках текста с шинглами, которых нет в дубликате (дописанные отзывы), и объединяет результаты
+INDEX_PATH = os.path.join("index", "twins.sqlite")
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DUPLICATE_THRESHOLD = 0.8
+SIMILAR_TERMS = 20     # слов в запросе "похожие статьи"
+TERM_CANDIDATES = 60   # самых частых слов статьи, для которых запрашивается df
+
+# Хэш-функции подписи: ((x ^ b) · a mod 2^64) >> 32 с нечётным 64-битным a (умножение со сдвигом).
+# Линейная функция (a·x + b) mod p с небольшим a не годится: при a·x < p порядок хэшей у всех функций
+# почти одинаковый, и минимум почти всегда даёт шингл с наименьшим crc32
+_random = np.random.RandomState(20250217)
+PERM_A = (_random.randint(0, 1 << 62, NUM_PERM, dtype=np.int64).astype(np.uint64) << np.uint64(2)) | np.uint64(1)
+PERM_B = _random.randint(0, 1 << 62, NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+WORD = re.compile(r"\w+")
+STOPWORDS = {
+    "the", "and", "for", "with", "was", "were", "are", "this", "that", "from", "have", "has", "had", "not",
+    "but", "all", "been", "their", "they", "which", "who", "its", "into", "than", "then", "also", "after",
+    "before", "these", "those", "there", "our", "you", "your", "his", "her", "she", "him", "can", "may",
+    "will", "would", "could", "should", "between", "during", "about", "each", "more", "most", "other",
+    "some", "such", "only", "both", "any", "one", "two", "per", "via", "does", "did", "what", "when",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (article_id TEXT PRIMARY KEY, signature BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    article_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, article_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS buckets_by_article ON buckets (article_id);
+CREATE TABLE IF NOT EXISTS analyses (
+    article_id TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    ner_entities TEXT,
+    semantic TEXT,
+    shingles BLOB,
+    twin_of TEXT
+);
+"""
+
+_local = threading.local()
+
+
+def connect():
+    # Одно соединение на поток, как в ledger_v1_0
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        connection = sqlite3.connect(INDEX_PATH, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+    return connection
+
+
+def article_text(article):
+    return " ".join(librarian.field_text(article.get(name)) for name in librarian.TEXT_FIELDS)
+
+
+def shingles(text):
+    # Слова текста (re.Match) и crc32 шинглов по SHINGLE_SIZE слов без учёта регистра: i-й шингл
+    # начинается с i-го слова. Склейки отзывов и страниц соединяют части пробелом, без знака
+    # препинания, поэтому граница дописанного отзыва видна только по словам
+    words = list(WORD.finditer(text or ""))
+    if not words:
+        return words, np.zeros(0, dtype=np.uint32)
+    size = min(SHINGLE_SIZE, len(words))
+    lowered = [word.group().lower() for word in words]
+    hashes = np.fromiter((zlib.crc32(" ".join(lowered[i:i + size]).encode("utf-8"))
+                          for i in range(len(words) - size + 1)), dtype=np.uint32, count=len(words) - size + 1)
+    return words, hashes
+
+
+def signature(text):
+    # MinHash-подпись (NUM_PERM значений uint32) или None для текста без слов
+    words, hashes = shingles(text)
+    if not words:
+        return None
+    hashes = np.unique(hashes).astype(np.uint64)
+    values = ((hashes[None, :] ^ PERM_B[:, None]) * PERM_A[:, None]) >> np.uint64(32)
+    return values.min(axis=1).astype(np.uint32)
+
+
+def covered_words(flags, size=SHINGLE_SIZE):
+    # Для последовательности шинглов: покрыто ли каждое слово хотя бы одним шинглом с флагом
+    return np.convolve(flags.astype(np.int64), np.ones(size, dtype=np.int64)) > 0
+
+
+def new_fragments(text, words, hashes, known):
+    # Участки text из слов, покрытых шинглами не из known (отрезки разделены переводом строки)
+    covered = covered_words(~np.isin(hashes, known), len(words) - len(hashes) + 1)
+    fragments = []
+    start = None
+    for position, flag in enumerate(covered):
+        if flag and start is None:
+            start = position
+        elif not flag and start is not None:
+            fragments.append(text[words[start].start():words[position - 1].end()])
+            start = None
+    if start is not None:
+        fragments.append(text[words[start].start():words[-1].end()])
+    return "\n".join(fragments)
+
+
+def similarity(first, second):
+    # Оценка сходства Жаккара по двум подписям
+    return float(np.count_nonzero(first == second)) / NUM_PERM
+
+
+def band_keys(sig):
+    return [(band, zlib.crc32(sig[band * ROWS:(band + 1) * ROWS].tobytes())) for band in range(BANDS)]
+
+
+def add_signature(connection, article_id, sig):
+    connection.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?)", (article_id, sig.tobytes()))
+    connection.executemany("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                           ((band, bucket, article_id) for band, bucket in band_keys(sig)))
+
+
+def remove_signatures(connection, article_ids):
+    rows = [(article_id,) for article_id in article_ids]
+    connection.executemany("DELETE FROM buckets WHERE article_id = ?", rows)
+    connection.executemany("DELETE FROM signatures WHERE article_id = ?", rows)
+
+
+def load_signature(connection, article_id):
+    row = connection.execute("SELECT signature FROM signatures WHERE article_id = ?", (article_id,)).fetchone()
+    return np.frombuffer(row[0], dtype=np.uint32) if row else None
+
+
+def twins_of(connection, sig, threshold=DUPLICATE_THRESHOLD, model=None, exclude=None):
+    # [(article_id, сходство)] по убыванию сходства; при model — только статьи с результатами NLP этой модели
+    keys = band_keys(sig)
+    values = ", ".join("(?, ?)" for _ in keys)
+    params = [value for key in keys for value in key]
+    sql = (f"SELECT DISTINCT s.article_id, s.signature FROM buckets b JOIN signatures s ON s.article_id = b.article_id "
+           f"WHERE (b.band, b.bucket) IN (VALUES {values})")
+    if model is not None:
+        sql += " AND b.article_id IN (SELECT article_id FROM analyses WHERE model = ?)"
+        params.append(model)
+    found = []
+    for article_id, blob in connection.execute(sql, params):
+        if article_id == exclude:
+            continue
+        score = similarity(sig, np.frombuffer(blob, dtype=np.uint32))
+        if score >= threshold:
+            found.append((article_id, score))
+    found.sort(key=lambda item: (-item[1], item[0]))
+    return found
+
+
+# ===== Кэш результатов NLP для анализатора =====
+
+def lookup_analysis(article_id, sig, model, text):
+    # (NER-сущности, семантический анализ, ID близкого дубликата или None, новый текст) для статьи,
+    # уже проанализированной моделью model (новый текст None), или для её близкого дубликата;
+    # None — нужен полный анализ. text — текст, который анализирует модель. Результаты дубликата
+    # годятся, только если каждое его слово покрыто шинглом, который есть в статье (вставка отзыва
+    # ломает лишь шинглы на стыке, удаление — все шинглы удалённых слов); новый текст — участки статьи
+    # с шинглами, которых нет в дубликате: модель запускается на них, и результаты объединяются
+    connection = connect()
+    if article_id:
+        row = connection.execute("SELECT ner_entities, semantic, twin_of FROM analyses "
+                                 "WHERE article_id = ? AND model = ?", (article_id, model)).fetchone()
+        if row:
+            return row[0], row[1], row[2], None
+    if sig is None:
+        return None
+    words, hashes = shingles(text)
+    for twin_id, score in twins_of(connection, sig, model=model, exclude=article_id):
+        ner_entities, semantic, blob = connection.execute(
+            "SELECT ner_entities, semantic, shingles FROM analyses WHERE article_id = ?", (twin_id,)).fetchone()
+        twin_hashes = np.frombuffer(blob, dtype=np.uint32)
+        if not covered_words(np.isin(twin_hashes, hashes)).all():
+            continue  # Часть текста дубликата из статьи удалена: его сущности могут быть лишними
+        return ner_entities, semantic, twin_id, new_fragments(text, words, hashes, twin_hashes)
+    return None
+
+
+def store_analysis(article_id, sig, model, ner_entities, semantic, text, twin_id=None):
+    if not article_id:
+        return
+    connection = connect()
+    with connection:
+        if sig is not None:
+            add_signature(connection, article_id, sig)
+        connection.execute("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?)",
+                           (article_id, model, ner_entities, semantic, shingles(text)[1].tobytes(),
+                            twin_id))
+
+
+# ===== Индекс по всему архиву =====
+
+def refresh():
+    # Подписи для новых статей полнотекстового индекса; подписи статей, которых больше нет ни в одном
+    # снимке (и нет в кэше анализа), удаляются. Возвращает (добавлено, удалено)
+    librarian.refresh()
+    source = librarian.connect()
+    documents = dict(source.execute("SELECT article_id, id FROM documents"))
+    connection = connect()
+    known = {row[0] for row in connection.execute("SELECT article_id FROM signatures")}
+    missing = [article_id for article_id in documents if article_id not in known]
+    analysed = {row[0] for row in connection.execute("SELECT article_id FROM analyses")}
+    orphans = [article_id for article_id in known if article_id not in documents and article_id not in analysed]
+    with connection:
+        for article_id in missing:
+            row = source.execute("SELECT title, methods, results, figures_tables FROM texts WHERE rowid = ?",
+                                 (documents[article_id],)).fetchone()
+            sig = signature(" ".join(value or "" for value in row)) if row else None
+            if sig is not None:
+                add_signature(connection, article_id, sig)
+        remove_signatures(connection, orphans)
+    return len(missing), len(orphans)
+
+
+def near_duplicates(article_id, threshold=DUPLICATE_THRESHOLD):
+    # Близкие дубликаты статьи архива: [(article_id, сходство)]
+    refresh()
+    connection = connect()
+    sig = load_signature(connection, article_id)
+    if sig is None:
+        return []
+    return twins_of(connection, sig, threshold, exclude=article_id)
+
+
+def duplicate_groups(threshold=DUPLICATE_THRESHOLD):
+    # Группы близких дубликатов по всему архиву: списки ID (самые большие группы первыми)
+    refresh()
+    connection = connect()
+    parent = {}
+
+    def find(item):
+        while parent.setdefault(item, item) != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    checked = set()
+    signatures = {}
+    buckets = connection.execute(
+        "SELECT group_concat(article_id, char(9)) FROM buckets GROUP BY band, bucket HAVING COUNT(*) > 1")
+    for (members,) in buckets:
+        members = sorted(members.split("\t"))
+        for position, first in enumerate(members):
+            for second in members[position + 1:]:
+                if (first, second) in checked or find(first) == find(second):
+                    continue
+                checked.add((first, second))
+                for article_id in (first, second):
+                    if article_id not in signatures:
+                        signatures[article_id] = load_signature(connection, article_id)
+                if similarity(signatures[first], signatures[second]) >= threshold:
+                    parent[find(second)] = find(first)
+    groups = {}
+    for article_id in parent:
+        groups.setdefault(find(article_id), []).append(article_id)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda group: (-len(group), group))
+
+
+def similar_articles(article_id, drug=None, top=10):
+    # "Похожие статьи": запрос BM25 из SIMILAR_TERMS слов статьи с наибольшим tf·idf.
+    # У каждой найденной статьи — оценка сходства Жаккара по подписям и признак близкого дубликата
+    refresh()
+    source = librarian.connect()
+    row = source.execute("SELECT t.title, t.methods, t.results, t.figures_tables FROM texts t "
+                         "JOIN documents d ON d.id = t.rowid WHERE d.article_id = ?", (article_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"Статья {article_id} не найдена в полнотекстовом индексе")
+    words = [word for word in WORD.findall(" ".join(value or "" for value in row).lower())
+             if len(word) > 2 and not word.isdigit() and word not in STOPWORDS]
+    total = source.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    weights = {}
+    for word, count in Counter(words).most_common(TERM_CANDIDATES):
+        df = source.execute("SELECT COUNT(*) FROM texts WHERE texts MATCH ?", ('"' + word + '"',)).fetchone()[0]
+        if 1 < df < total:
+            weights[word] = count * math.log(total / df)
+    terms = sorted(weights, key=lambda word: -weights[word])[:SIMILAR_TERMS]
+    if not terms:
+        return []
+    hits = [hit for hit in librarian.match_hits(" OR ".join('"' + word + '"' for word in terms), drug, top + 1)
+            if hit["article_id"] != article_id][:top]
+    connection = connect()
+    sig = load_signature(connection, article_id)
+    for hit in hits:
+        other = load_signature(connection, hit["article_id"])
+        hit["similarity"] = round(similarity(sig, other), 3) if sig is not None and other is not None else None
+        hit["near_duplicate"] = hit["similarity"] is not None and hit["similarity"] >= DUPLICATE_THRESHOLD
+    return hits
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Близкие дубликаты и похожие статьи в архиве drug_data")
+    arg_parser.add_argument("article_id", nargs="?", help="ID статьи: вывести её дубликаты и похожие статьи")
+    arg_parser.add_argument("--drug", help="похожие статьи только этого препарата")
+    arg_parser.add_argument("--top", type=int, default=10, help="сколько похожих статей вывести")
+    arg_parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD, help="порог сходства Жаккара")
+    arg_parser.add_argument("--workdir", default=".", help="папка проекта с drug_data/")
+    args = arg_parser.parse_args()
+    os.chdir(args.workdir)
+
+    added, removed = refresh()
+    print(f"Подписей добавлено: {added}, удалено: {removed}")
+    if not args.article_id:
+        groups = duplicate_groups(args.threshold)
+        print(f"Групп близких дубликатов: {len(groups)}")
+        for group in groups:
+            print(", ".join(group))
+        return
+    for twin_id, score in near_duplicates(args.article_id, args.threshold):
+        print(f"Дубликат {twin_id}: сходство {score:.2f}")
+    try:
+        hits = similar_articles(args.article_id, args.drug, args.top)
+    except ValueError as e:
+        print(e)
+        return
+    for hit in hits:
+        similarity_str = "н/д" if hit["similarity"] is None else f"{hit['similarity']:.2f}"
+        print(f"{hit['score']:.2f}  {hit['article_id']}  {hit['title']} (сходство {similarity_str}; "
+              f"{', '.join(hit['drugs'])})")
+
+
+if __name__ == "__main__":
+    main()
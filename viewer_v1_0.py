@@ -0,0 +1,140 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Постраничные представления результатов для GUI. В виджет попадает только видимая часть данных:
+#   LazyTree  — ttk.Treeview по вложенному словарю (эффект -> препарат -> ID источников): верхний
+#               уровень добавляется страницами, дочерние узлы создаются при раскрытии;
+#   PagedText — текстовое поле, которое показывает по одной странице строк с навигацией.
+PAGE_SIZE = 200
+MORE_TAG = "more"
+PLACEHOLDER_TEXT = "…"
+
+
+class LazyTree:
+    def __init__(self, parent, height=10, page_size=PAGE_SIZE, font=None):
+        self.page_size = page_size
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=("count",), height=height)
+        self.tree.heading("#0", text="Запись")
+        self.tree.heading("count", text="Количество")
+        self.tree.column("#0", width=620)
+        self.tree.column("count", width=110, anchor="center")
+        scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+        if font:
+            ttk.Style().configure("Treeview", font=font)
+        self.tree.tag_configure(MORE_TAG, foreground="#C13E70")
+        self.tree.bind("<<TreeviewOpen>>", self.on_open)
+        self.tree.bind("<Double-1>", self.on_double_click)
+        self.nodes = {}  # элемент дерева -> (значение, сколько дочерних уже показано)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self.nodes = {}
+
+    def show_message(self, text):
+        self.clear()
+        self.tree.insert("", tk.END, text=text)
+
+    def show(self, data):
+        self.clear()
+        self.nodes[""] = (data, 0)
+        self.add_page("")
+
+    def children_of(self, value):
+        if isinstance(value, dict):
+            return list(value.items())
+        if isinstance(value, (list, tuple)):
+            return [(item, None) for item in value]
+        return []
+
+    def add_page(self, parent):
+        # Следующая страница дочерних элементов parent; в конце — строка "показать ещё"
+        value, shown = self.nodes[parent]
+        children = self.children_of(value)
+        for key, child in children[shown:shown + self.page_size]:
+            size = len(child) if isinstance(child, (dict, list, tuple)) else ""
+            item = self.tree.insert(parent, tk.END, text=str(key), values=(size,))
+            if size:
+                self.nodes[item] = (child, 0)
+                # Заглушка, чтобы у узла был значок раскрытия; реальные дети создаются в on_open
+                self.tree.insert(item, tk.END, text=PLACEHOLDER_TEXT)
+        shown = min(len(children), shown + self.page_size)
+        self.nodes[parent] = (value, shown)
+        if shown < len(children):
+            self.tree.insert(parent, tk.END, text=f"Показать ещё (осталось {len(children) - shown})",
+                             tags=(MORE_TAG,))
+
+    def on_open(self, event):
+        item = self.tree.focus()
+        if item not in self.nodes or self.nodes[item][1]:
+            return
+        self.tree.delete(*self.tree.get_children(item))
+        self.add_page(item)
+
+    def on_double_click(self, event):
+        item = self.tree.identify_row(event.y)
+        if item and MORE_TAG in self.tree.item(item, "tags"):
+            parent = self.tree.parent(item)
+            self.tree.delete(item)
+            self.add_page(parent)
+
+
+class PagedText:
+    def __init__(self, parent, width=80, height=10, page_size=PAGE_SIZE, **text_options):
+        self.page_size = page_size
+        self.lines = []
+        self.page = 0
+        self.frame = tk.Frame(parent, bg=text_options.get("bg"))
+        self.text = tk.Text(self.frame, width=width, height=height, state="disabled", **text_options)
+        scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        self.text.grid(row=0, column=0, columnspan=3, sticky="nsew")
+        scrollbar.grid(row=0, column=3, sticky="ns")
+        self.prev_button = tk.Button(self.frame, text="<", width=3, command=lambda: self.go(self.page - 1))
+        self.next_button = tk.Button(self.frame, text=">", width=3, command=lambda: self.go(self.page + 1))
+        self.page_label = tk.Label(self.frame, bg=text_options.get("bg"), fg=text_options.get("fg"))
+        self.prev_button.grid(row=1, column=0, sticky="e")
+        self.page_label.grid(row=1, column=1)
+        self.next_button.grid(row=1, column=2, sticky="w")
+        self.frame.columnconfigure(1, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def page_count(self):
+        return max(1, -(-len(self.lines) // self.page_size))
+
+    def show(self, content):
+        # content — строка или список строк
+        self.lines = content.split("\n") if isinstance(content, str) else list(content)
+        self.go(0)
+
+    def clear(self):
+        self.show([])
+
+    def go(self, page):
+        self.page = max(0, min(page, self.page_count() - 1))
+        start = self.page * self.page_size
+        self.text.configure(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, "\n".join(self.lines[start:start + self.page_size]))
+        self.text.configure(state="disabled")
+        self.text.yview_moveto(0)
+        self.page_label.configure(text=f"Страница {self.page + 1} из {self.page_count()} (строк: {len(self.lines)})")
+        self.prev_button.configure(state="normal" if self.page > 0 else "disabled")
+        self.next_button.configure(state="normal" if self.page < self.page_count() - 1 else "disabled")
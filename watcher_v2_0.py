@@ -1,6 +1,9 @@
 import json
+from bisect import bisect_left
 from datetime import datetime
 
+from recall_v1_0 import get_index
+
 
 with open("dictionary.json", "r", encoding="utf-8") as f:
     TRANSLATIONS = json.load(f)
@@ -22,6 +25,41 @@ def translate_effects(effects_list):
     return translated
 
 
+def build_first_met_index(data):
+    # Строки (дата первого обнаружения, порядок препарата, порядок эффекта, препарат, эффект, перевод),
+    # отсортированные по дате. Даты разбираются и эффекты переводятся один раз при построении
+    translations = {}
+    rows = []
+    for drug_rank, (drug, entries) in enumerate(data.items()):
+        position = 0
+        for entry in entries:
+            side_effects = entry.get("side effects", [])
+            first_met_dates = entry.get("first met", [])
+            for effect, date_str in zip(side_effects, first_met_dates):
+                try:
+                    effect_date = datetime.strptime(date_str, "%d_%m_%Y")
+                except ValueError:
+                    continue
+                if effect not in translations:
+                    translations[effect] = translate_effects([effect])[0]
+                rows.append((effect_date, drug_rank, position, drug, effect, translations[effect]))
+                position += 1
+    rows.sort()
+    dates = [row[0] for row in rows]
+    return dates, rows
+
+
+def effects_since(user_date, translated=False):
+    # Эффекты, впервые обнаруженные не ранее user_date: бинарный поиск и срез отсортированного индекса.
+    # Возвращает словарь препарат -> список эффектов в порядке базы данных
+    dates, rows = get_index().cached("first_met", build_first_met_index)
+    hits = sorted(rows[bisect_left(dates, user_date):], key=lambda row: (row[1], row[2]))
+    filtered_data = {}
+    for _, _, _, drug, effect, translation in hits:
+        filtered_data.setdefault(drug, []).append(translation if translated else effect)
+    return filtered_data
+
+
 def main():
     user_date_str = input("Введите дату (в формате dd_mm_yyyy): ")
     watch(user_date_str)
@@ -35,29 +73,11 @@ def watch(user_date_str):
         return
 
     try:
-        with open("side_effects_database.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
+        filtered_data = effects_since(user_date)
     except FileNotFoundError:
         print("Файл side_effects_database.json не найден.")
         return
 
-    filtered_data = {}
-
-    for drug, entries in data.items():
-        for entry in entries:
-            side_effects = entry.get("side effects", [])
-            first_met_dates = entry.get("first met", [])
-            filtered_side_effects = []
-            for effect, date_str in zip(side_effects, first_met_dates):
-                try:
-                    effect_date = datetime.strptime(date_str, "%d_%m_%Y")
-                except ValueError:
-                    continue
-                if effect_date >= user_date:
-                    filtered_side_effects.append(effect)
-            if filtered_side_effects:
-                filtered_data[drug] = filtered_side_effects
-
     if filtered_data:
         print(f"\nПобочные эффекты, обнаруженные не ранее {user_date_str}:")
         for drug, effects in filtered_data.items():
@@ -74,33 +94,11 @@ def watch_gui(user_date_str):
         return "Неверный формат даты. Пожалуйста, введите дату в формате dd_mm_yyyy."
 
     try:
-        with open("side_effects_database.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
+        # Эффекты сразу на русском: перевод выполнен при построении индекса
+        filtered_data = effects_since(user_date, translated=True)
     except FileNotFoundError:
         return "Файл side_effects_database.json не найден."
 
-    filtered_data = {}
-
-    for drug, entries in data.items():
-        for entry in entries:
-            side_effects = entry.get("side effects", [])
-            first_met_dates = entry.get("first met", [])
-            filtered_side_effects = []
-            for effect, date_str in zip(side_effects, first_met_dates):
-                try:
-                    effect_date = datetime.strptime(date_str, "%d_%m_%Y")
-                except ValueError:
-                    continue
-                if effect_date >= user_date:
-                    filtered_side_effects.append(effect)
-
-            # Перевод эффектов на русский
-            translated_effects = translate_effects(filtered_side_effects)
-            if translated_effects:
-                filtered_data[drug] = translated_effects
-
-    translated_effects = translate_effects(filtered_side_effects)
-
     if filtered_data:
         result_lines = [f"Побочные эффекты, обнаруженные не ранее {user_date_str}:"]
         for drug, effects in filtered_data.items():